@@ -10,6 +10,7 @@ setup(name="singer-tap-tester",
       classifiers=['Programming Language :: Python :: 3 :: Only'],
       url="http://singer.io",
       install_requires=[
+          'jsonschema',
       ],
       extras_require={
           'test': [
@@ -19,7 +20,13 @@ setup(name="singer-tap-tester",
               'tap-github',
           ]
       },
-      # packages=find_packages(),
+      packages=find_packages(exclude=['tests']),
+      entry_points={
+          'console_scripts': [
+              # Offline tap for testing and benchmarking the harness itself
+              'tap-synthetic=singer_tap_tester.synthetic_tap:main',
+          ]
+      },
       # package_data = {
       #     'singer': [
       #         'logging.conf'
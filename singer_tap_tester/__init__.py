@@ -1,3 +1,22 @@
 # Hoist Important Classes and functions for convenience
-from . import user
-from .base import BaseTapTest, StandardTests
+# These are imported on first access, which keeps `import singer_tap_tester`
+# (and test collection) from paying for `unittest` and the tap runner up front.
+import importlib
+
+__lazy_attributes = {
+    "user": ("singer_tap_tester.user", None),
+    "BaseTapTest": ("singer_tap_tester.base", "BaseTapTest"),
+    "StandardTests": ("singer_tap_tester.base", "StandardTests"),
+}
+
+def __getattr__(name):
+    if name not in __lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = __lazy_attributes[name]
+    module = importlib.import_module(module_name)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(__lazy_attributes))
@@ -1,7 +1,8 @@
+import json
 import unittest
 import os
 
-from .standard_tests import test_sync_canary#, test_catalog_standards # TODO
+from .standard_tests import test_sync_canary, test_primary_key_integrity, test_bookmark_efficiency#, test_catalog_standards # TODO
 
 class EnableSubTests(type):
     """
@@ -29,6 +30,71 @@ class BaseTapTest(unittest.TestCase, metaclass=EnableSubTests):
     # Required for a fully formed tap-test to be implemented
     subclass_requirements = ["config_environment", "tap_name", "get_config"]
 
+    # Optional, set to a `singer_tap_tester.cache.DiscoveryCache` to reuse
+    # catalogs across test cases instead of running discovery every time
+    discovery_cache = None
+
+    # Optional, path to write the canary's JSON summary report to. The report
+    # is also available as `summary_report` once the canary has run
+    summary_report_path = None
+    summary_report = None
+
+    # Optional, path to write the `metrics.RunMetrics` of every standard
+    # test to as JSON. The results are also available as `metrics_by_test`
+    metrics_path = None
+    metrics = None
+
+    # Optional, stop syncs once every stream has this many records or after
+    # this many seconds, see `singer_tap_tester.sampling.Sample`. With
+    # `sample_split_streams`, each stream is sampled by its own tap run
+    sample_records_per_stream = None
+    sample_time_budget = None
+    sample_split_streams = False
+
+    # Optional, memory for the primary key integrity test to check keys in
+    # before spilling to disk. Its report is available as `key_integrity_report`
+    key_check_memory_budget = 64 * 1024 * 1024
+    key_integrity_report = None
+
+    # Optional, the fraction of each stream's records a sync from the previous
+    # sync's final state may emit again. Its report is available as `bookmark_report`
+    bookmark_max_resync_fraction = 0.1
+    bookmark_report = None
+
+    # Set by the canary when it synced everything: its catalog, metrics and
+    # final state, which later standard tests reuse instead of syncing again
+    canary_sync = None
+
+    # Optional, stop tap runs that write nothing for this many seconds, write
+    # fewer messages per second than the floor for a whole minute, or run
+    # longer than the budget, see `singer_tap_tester.watchdog.Watchdog`
+    watchdog_stall_seconds = None
+    watchdog_min_messages_per_second = None
+    watchdog_time_budget = None
+
+    # Optional, run the tap in children forked from a server that imported it
+    # once, see `singer_tap_tester.forkserver`
+    use_fork_server = False
+
+    def get_sample(self):
+        "A new `Sample` for a sync if sampling is configured, otherwise None."
+        if self.sample_records_per_stream is None and self.sample_time_budget is None:
+            return None
+        from .sampling import Sample
+        return Sample(records_per_stream=self.sample_records_per_stream,
+                      time_budget=self.sample_time_budget,
+                      split_streams=self.sample_split_streams)
+
+    def get_watchdog(self):
+        "A new `Watchdog` for a tap run if any of its limits is set, otherwise None."
+        if (self.watchdog_stall_seconds is None and self.watchdog_min_messages_per_second is None
+                and self.watchdog_time_budget is None):
+            return None
+        from .watchdog import Watchdog
+        return Watchdog(stall_seconds=self.watchdog_stall_seconds,
+                        min_messages_per_second=self.watchdog_min_messages_per_second,
+                        time_budget=self.watchdog_time_budget)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.check_subclass_requirements()
@@ -46,10 +112,13 @@ class BaseTapTest(unittest.TestCase, metaclass=EnableSubTests):
         if missing_envs:
             raise Exception(f"Missing environment variables required to run the tap for this test: {missing_envs}")
 
-standard_test_functions = {
+# In order, later tests reuse what the canary found on its sync
+standard_test_functions = [
     test_sync_canary,
+    test_primary_key_integrity,
+    test_bookmark_efficiency,
     #test_catalog_standards, # TODO
-    }
+    ]
 
 class StandardTests(BaseTapTest):
     """
@@ -59,8 +128,25 @@ class StandardTests(BaseTapTest):
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.metrics_by_test = {}
 
     def runTest(self):
+        from . import metrics
+        if self.use_fork_server:
+            # Kept running for the other test cases of the same tap
+            from . import forkserver
+            forkserver.serve(self.tap_name)
+
         for test_fun in standard_test_functions:
             with self.subTest(test_fun.__name__):
-                test_fun(self)
+                # Standard tests record their tap runs in `self.metrics`
+                self.metrics = metrics.RunMetrics(f"{self.__class__.__name__}.{test_fun.__name__}")
+                try:
+                    test_fun(self)
+                finally:
+                    self.metrics.finish()
+                    self.metrics_by_test[test_fun.__name__] = self.metrics.to_dict()
+
+        if self.metrics_path:
+            with open(self.metrics_path, 'w') as f:
+                json.dump(self.metrics_by_test, f, indent=2)
@@ -0,0 +1,201 @@
+"""
+Benchmarks of the harness itself, run against the offline `tap-synthetic`.
+
+Times discovery, syncing (streamed with `cli.iter_sync`, and collected with
+`cli.run_sync` up to `--max-collected` records), `PatchStdOut` capture
+(along with the `inspect.stack()` capture it replaced), the
+`user` selection functions and the `target` helpers at each of the given
+scales, where a scale is a total number of records.
+
+Results are saved as JSON along with the commit they were measured on, and
+can be compared to an earlier results file to catch regressions:
+
+    python -m singer_tap_tester.benchmark --scales 1000,100000 --output before.json
+    python -m singer_tap_tester.benchmark --scales 1000,100000 --output after.json --compare before.json
+"""
+
+import argparse
+import inspect
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from singer_tap_tester import cli, metrics, target, user
+
+SYNTHETIC_TAP = "tap-synthetic"
+FIELDS = 10
+STREAMS = 10
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def synthetic_config(records, streams=STREAMS, fields=FIELDS):
+    return {"streams": streams,
+            "fields": fields,
+            "records": max(1, records // streams),
+            "record_size": 10,
+            "start_date": "2021-01-01T00:00:00Z",
+            "state_every": 10000}
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def bench_discovery(scale):
+    seconds, _ = timed(cli.run_discovery, SYNTHETIC_TAP, synthetic_config(scale))
+    return {'seconds': seconds}
+
+def bench_iter_sync(scale):
+    config = synthetic_config(scale)
+    catalog = user.select_all_streams_and_fields(cli.run_discovery(SYNTHETIC_TAP, config))
+    run_metrics = metrics.RunMetrics()
+    seconds, count = timed(lambda: sum(1 for _ in cli.iter_sync(SYNTHETIC_TAP, config, catalog, {}, metrics=run_metrics)))
+    results = run_metrics.to_dict()
+    return {'seconds': seconds,
+            'messages': count,
+            'messages_per_second': count / seconds,
+            'bytes_per_second': results['bytes_per_second'],
+            'parse_seconds': results['parse_seconds'],
+            'waiting_for_tap_seconds': results['waiting_for_tap_seconds'],
+            'tap_blocked_on_harness_seconds': results['tap_blocked_on_harness_seconds'],
+            'peak_rss_bytes': results['peak_rss_bytes']}
+
+def bench_run_sync(scale):
+    config = synthetic_config(scale)
+    catalog = user.select_all_streams_and_fields(cli.run_discovery(SYNTHETIC_TAP, config))
+    seconds, messages = timed(cli.run_sync, SYNTHETIC_TAP, config, catalog, {})
+    return {'seconds': seconds, 'messages': len(messages), 'messages_per_second': len(messages) / seconds,
+            'peak_rss_bytes': metrics.peak_rss_bytes()}
+
+class LegacyPatchStdOut(cli.PatchStdOut):
+    "The capture as it was before `debugger_active`, kept as the baseline of `bench_capture`."
+    def __init__(self):
+        super().__init__(io.StringIO())
+
+    def stdout_dispatcher(self, text):
+        pdb_frames = [f.filename for f in inspect.stack() if f.filename.endswith('pdb.py')]
+        if pdb_frames:
+            sys.__stdout__.write(text)
+        else:
+            self.out.write(text)
+
+def writes_per_second(patched_io, writes):
+    line = json.dumps({"type": "RECORD", "stream": "stream_0", "record": {"id": 1, "field_0": "x" * 10}})
+    def write_lines():
+        with patched_io:
+            for _ in range(writes):
+                sys.stdout.write(line)
+                sys.stdout.write('\n')
+    seconds, _ = timed(write_lines)
+    return seconds, 2 * writes / seconds
+
+def bench_capture(scale):
+    # Reading the source of every frame is slow enough to only sample the legacy capture
+    _, legacy = writes_per_second(LegacyPatchStdOut(), max(1, scale // 100))
+    seconds, current = writes_per_second(cli.PatchStdOut(), scale)
+    return {'seconds': seconds, 'writes_per_second': current, 'legacy_writes_per_second': legacy,
+            'speedup': current / legacy}
+
+def bench_selection(scale):
+    # One stream per thousand records, like a wide database tap
+    config = synthetic_config(scale, streams=max(1, scale // 1000), fields=20)
+    catalog = cli.run_discovery(SYNTHETIC_TAP, config)
+    seconds, _ = timed(user.select_all_streams_and_fields, catalog)
+    return {'seconds': seconds, 'streams': config['streams']}
+
+def bench_target(scale):
+    batch_size = 1000
+    def batches():
+        for start in range(0, scale, batch_size):
+            yield {'table_name': f"stream_{start // batch_size % STREAMS}",
+                   'schema': {},
+                   'key_names': ['id'],
+                   'messages': [{'action': 'upsert', 'data': {'id': i, 'field_0': 'x'}}
+                                for i in range(start, min(scale, start + batch_size))]}
+    seconds, _ = timed(target.examine_target_output_file, batches())
+    return {'seconds': seconds, 'records_per_second': scale / seconds}
+
+BENCHMARKS = {
+    'run_discovery': bench_discovery,
+    'iter_sync': bench_iter_sync,
+    'run_sync': bench_run_sync,
+    'patch_std_out': bench_capture,
+    'select_all_streams_and_fields': bench_selection,
+    'examine_target_output_file': bench_target,
+}
+
+def run(scales, benchmarks=None, max_collected=1000000):
+    results = {}
+    for name in benchmarks or BENCHMARKS:
+        results[name] = {}
+        for scale in scales:
+            if name == 'run_sync' and scale > max_collected:
+                continue
+            sys.stderr.write(f"Benchmarking {name} at {scale:,} records...{os.linesep}")
+            results[name][str(scale)] = BENCHMARKS[name](scale)
+    return {'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'results': results}
+
+def compare(previous, current, threshold=0.1):
+    """
+    Returns the benchmarks that got slower by more than `threshold` (a
+    fraction) since `previous`, as `(name, scale, previous_seconds,
+    current_seconds)`.
+    """
+    regressions = []
+    for name, by_scale in current['results'].items():
+        for scale, result in by_scale.items():
+            before = previous['results'].get(name, {}).get(scale)
+            if before and result['seconds'] > before['seconds'] * (1 + threshold):
+                regressions.append((name, scale, before['seconds'], result['seconds']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the harness against the offline tap-synthetic.")
+    parser.add_argument('--scales', default='1000,10000,100000',
+                        help="Comma separated total record counts, e.g., 1000,100000,10000000")
+    parser.add_argument('--benchmarks', default=None, help=f"Comma separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--max-collected', type=int, default=1000000,
+                        help="Largest scale to run `run_sync` at, since it holds every message in memory")
+    parser.add_argument('--output', help="File to save the results to (default: stdout)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Slowdown that counts as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    # Keep the tap's per-run log lines out of the way
+    logging.getLogger("singer_tap_tester.cli").setLevel(logging.WARNING)
+    logging.getLogger("singer_tap_tester.user").setLevel(logging.WARNING)
+
+    scales = [int(s) for s in args.scales.split(',')]
+    benchmarks = args.benchmarks.split(',') if args.benchmarks else None
+    results = run(scales, benchmarks, max_collected=args.max_collected)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write(os.linesep)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(previous, results, args.threshold)
+        for name, scale, before, after in regressions:
+            sys.stderr.write(f"REGRESSION {name} at {scale} records: {before:.3f}s -> {after:.3f}s ({after / before - 1:+.0%}){os.linesep}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Opt-in, on-disk cache of discovered catalogs.
+
+Discovery usually gives the same catalog for the same tap version and config,
+but can take minutes against slow APIs. Entries are keyed by the tap's
+command name, the installed version of the tap and a hash of its config (the
+config itself is never written to disk). Entries expire after `ttl` seconds,
+and the least recently used entries are evicted to keep the cache under
+`max_entries` files and `max_bytes` bytes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+class DiscoveryCache():
+    """
+    Pass an instance to `cli.run_discovery(..., cache=...)`, or set it as
+    the `discovery_cache` attribute of a `StandardTests` subclass.
+
+    When `skip_check` is set, a cache hit also skips the run that validates
+    the config, since the same config was already validated when the
+    catalog was cached less than `ttl` seconds ago.
+    """
+    def __init__(self, directory=None, ttl=24 * 60 * 60, max_entries=256, max_bytes=256 * 1024 * 1024, skip_check=True):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'singer-tap-tester-discovery-cache')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.skip_check = skip_check
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(tap_entry_point, tap_version, config):
+        config_hash = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        key_source = json.dumps([tap_entry_point, tap_version, config_hash])
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        "Returns the cached catalog for `key`, or None if missing or expired."
+        path = self.__path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry['created_at'] > self.ttl:
+            self.__remove(path)
+            return None
+
+        # Mark as recently used for eviction
+        os.utime(path)
+        return entry['catalog']
+
+    def put(self, key, catalog, tap_entry_point=None, tap_version=None):
+        entry = {'created_at': time.time(),
+                 'tap': tap_entry_point,
+                 'tap_version': tap_version,
+                 'catalog': catalog}
+        # Write then rename, so concurrent runs never read a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, self.__path(key))
+        self.evict()
+
+    def evict(self):
+        "Removes expired entries, then the least recently used ones until under the size limits."
+        entries = []
+        now = time.time()
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                self.__remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self.__remove(path)
+            total_bytes -= size
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,12 +1,15 @@
-import io
-import inspect
 import logging
 import os
 import json
+import queue
+import shutil
 import sys
-import unittest.mock
-import tempfile
-from contextlib import contextmanager, ExitStack
+import threading
+import time
+from contextlib import contextmanager, nullcontext, ExitStack
+
+# The other subsystems are imported where they are used, so that importing
+# the harness stays fast for test suites that don't need them
 
 # TODO: Make this easier to work with?
 # FIXME: It's doubling logs now, likely due to singer-python's logger existing...
@@ -17,103 +20,675 @@ handler = logging.StreamHandler(sys.stderr)
 handler.setFormatter(formatter)
 LOGGER.addHandler(handler)
 
+# How long to wait for an aborted tap to unwind before giving up on it
+ABORT_TIMEOUT_SECONDS = 30
+
+# How often to check on time budgets while the tap writes nothing
+IDLE_INTERVAL_SECONDS = 0.5
+
+class ChunkedBuffer():
+    """
+    Append-only text buffer that keeps every write as its own chunk and only
+    joins them when the value is asked for. Unlike `io.StringIO`, appending
+    never has to grow and copy one contiguous buffer.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+        return len(text)
+
+    def getvalue(self):
+        value = ''.join(self.chunks)
+        self.chunks = [value]
+        return value
+
+def debugger_active():
+    """
+    Returns True if the current write to stdout is coming from a `pdb`
+    session (this includes `ipdb` and `breakpoint()`, which drive `pdb`).
+
+    If `pdb` was never imported there can't be a session. Otherwise only the
+    code objects of the live frames are checked, which is far cheaper than
+    `inspect.stack()` since no source context has to be read.
+    """
+    if 'pdb' not in sys.modules:
+        return False
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_filename.endswith('pdb.py'):
+            return True
+        frame = frame.f_back
+    return False
+
 class PatchStdOut():
     """
     Context Manager that will take stdout and patch it such that any tap
-    output is captured by the StringIO object associated with this context
+    output is captured by the buffer associated with this context
     manager's instance, while still letting PDB prompt output through to
     the terminal.
 
-    Any time an attempt occurs to write text to stdout, the stack frames will
-    be inspected. If `pdb.py` shows up, this is taken as a debugger session
-    and will pass through, otherwise, the output is assumed to be tap output
-    and will pass on to the StringIO object stored on this object.
+    Writes from every thread are captured, including threads the tap starts
+    itself, except for the `consumer` thread reading the buffer while the
+    tap runs, e.g., a consumer printing while it iterates over `iter_sync`,
+    whose writes pass through to the real stdout. If runs are nested, the
+    innermost one captures.
+
+    A tap thread that was given up on with `abandon` is refused instead: its
+    writes raise `TapRunAborted`, rather than ending up on the terminal or in
+    another run, and stdout stays patched for as long as it might write.
+
+    Any time the tap writes text to stdout, the stack frames will be checked
+    with `debugger_active`. If `pdb.py` shows up, this is taken as a debugger
+    session and will pass through, otherwise, the output is assumed to be tap
+    output and will pass on to the buffer stored on this object.
     """
     __old_std_out_write = sys.stdout.write
+    # The buffers of the runs in progress, innermost last
+    runs = []
+    # How many runs each consumer thread is reading, by thread ident
+    consumers = {}
+    # Tap threads left running after their run was over, by thread ident
+    abandoned = {}
+    lock = threading.Lock()
 
-    def __init__(self):
-        self.out = io.StringIO()
+    def __init__(self, out=None, consumer=None):
+        # Anything with a `write(text)` method can receive the tap output
+        self.out = out if out is not None else ChunkedBuffer()
+        self.consumer = consumer
 
-    def stdout_dispatcher(self, text):
-        pdb_frames = [f.filename for f in inspect.stack() if f.filename.endswith('pdb.py')]
-        if pdb_frames:
-            self.__old_std_out_write(text)
-        else:
-            self.out.write(text)
+    @classmethod
+    def abandon(cls, thread):
+        "Refuses the writes of `thread`, a tap that didn't stop when it was aborted."
+        with cls.lock:
+            cls.abandoned[thread.ident] = thread
+
+    @classmethod
+    def stdout_dispatcher(cls, text):
+        ident = threading.get_ident()
+        if ident in cls.consumers:
+            return cls.__old_std_out_write(text)
+        if cls.abandoned and cls.abandoned.get(ident) is threading.current_thread():
+            raise TapRunAborted("The tap run was given up on, aborting the tap.")
+        runs = cls.runs
+        if not runs or debugger_active():
+            return cls.__old_std_out_write(text)
+        return runs[-1].write(text)
 
     def __enter__(self):
-        sys.stdout.write = self.stdout_dispatcher
+        with self.lock:
+            self.runs.append(self.out)
+            if self.consumer is not None:
+                self.consumers[self.consumer.ident] = self.consumers.get(self.consumer.ident, 0) + 1
+            sys.stdout.write = self.stdout_dispatcher
 
     def __exit__(self, _tp, _v, _tb):
-        sys.stdout.write = self.__old_std_out_write
+        with self.lock:
+            self.runs.remove(self.out)
+            if self.consumer is not None:
+                self.consumers[self.consumer.ident] -= 1
+                if not self.consumers[self.consumer.ident]:
+                    del self.consumers[self.consumer.ident]
+            for ident, thread in list(self.abandoned.items()):
+                if not thread.is_alive():
+                    del self.abandoned[ident]
+            if not self.runs and not self.abandoned:
+                sys.stdout.write = self.__old_std_out_write
+
+class TapRunAborted(Exception):
+    """
+    Raised inside of the tap's thread on its next write to stdout once the
+    consumer of a streaming run has stopped listening, so that the tap
+    unwinds instead of running to completion with nobody reading.
+    """
+
+class LineQueue():
+    """
+    File-like sink for `PatchStdOut` that splits the tap output into lines
+    and hands them over to a consumer on another thread in batches.
+
+    The queue is bounded, so a tap that writes faster than its output is
+    consumed will block on `write` until the consumer catches up. This keeps
+    the memory used by a streaming run at roughly `max_batches * batch_size`
+    lines, regardless of how long the sync is.
+
+    The time the tap spends blocked on the consumer and the time the consumer
+    spends waiting on the tap are added up in `blocked_seconds` and
+    `waiting_seconds`.
+
+    With an `idle_interval`, iterating yields None every `idle_interval`
+    seconds that the tap writes nothing, so the consumer gets a chance to
+    check on time budgets even when the tap is silent. Lines still waiting
+    for their batch to fill up are handed over first, so a slow tap's
+    output is never held back for longer than that.
+    """
+    __done = object()
+    __idle = (None,)
+
+    def __init__(self, max_batches=64, batch_size=100, idle_interval=None):
+        self.idle_interval = idle_interval
+        self.queue = queue.Queue(maxsize=max_batches)
+        # Guards the batch being filled, which the consumer takes when idle
+        self.lock = threading.Lock()
+        self.batch_size = batch_size
+        self.batch = []
+        self.partial = ''
+        self.error = None
+        self.aborted = False
+        self.blocked_seconds = 0.0
+        self.waiting_seconds = 0.0
+
+    def __put(self, item):
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        # Only time the slow path, where the consumer is behind
+        start = time.perf_counter()
+        try:
+            while not self.aborted:
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.blocked_seconds += time.perf_counter() - start
+
+    def __get(self):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        start = time.perf_counter()
+        try:
+            return self.queue.get(timeout=self.idle_interval)
+        except queue.Empty:
+            with self.lock:
+                batch, self.batch = self.batch, []
+            return batch or self.__idle
+        finally:
+            self.waiting_seconds += time.perf_counter() - start
+
+    def write(self, text):
+        if self.aborted:
+            raise TapRunAborted("Consumer of the tap output stopped reading, aborting the tap run.")
+        *lines, self.partial = (self.partial + text).split(os.linesep)
+        with self.lock:
+            self.batch.extend(lines)
+            if len(self.batch) >= self.batch_size:
+                # Queued while holding the lock, so that the consumer can't
+                # take a later partial batch ahead of this one
+                batch, self.batch = self.batch, []
+                if not self.__put(batch):
+                    raise TapRunAborted("Consumer of the tap output stopped reading, aborting the tap run.")
+        return len(text)
+
+    def close(self, error=None):
+        "Called by the producer once the tap has returned or raised `error`."
+        self.error = error
+        with self.lock:
+            if self.partial:
+                self.batch.append(self.partial)
+                self.partial = ''
+            if self.batch:
+                self.__put(self.batch)
+                self.batch = []
+            self.__put(self.__done)
+
+    def abort(self):
+        "Called by the consumer to stop listening and unblock the producer."
+        self.aborted = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def __iter__(self):
+        while True:
+            batch = self.__get()
+            if batch is self.__done:
+                break
+            yield from batch
+        if self.error is not None:
+            raise self.error
 
 def __call_entry_point(run_command):
-    # Find Main Entry Point through package resources
-    entry_maps = [a.get_entry_map() for a in __import__('pkg_resources').working_set if 'tap-' in a.project_name]
-    found_entry_points = [fun
-                          for entry_map in entry_maps
-                          for fun in entry_map.get('console_scripts',{}).values()
-                          if fun.name == run_command]
-    if not found_entry_points:
-        raise Exception(f"No entrypoints found in current (virtual) environment to run tap using command: '{run_command}'")
-    if len(found_entry_points) > 1:
-        raise Exception(f"Ambiguous entry_point - {len(found_entry_points)} entrypoints found in current (virtual) environment to run tap using command: '{run_command}'")
-    discovered_main = found_entry_points[0].resolve()
+    from singer_tap_tester import entry_points
+    discovered_main = entry_points.find(run_command).resolve()
     return discovered_main()
 
+@contextmanager
+def workspace(tap_entry_point):
+    """
+    Creates a private temporary directory for a single tap run and removes it
+    once the run is over, so that concurrent runs never share input files.
+    """
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix=f"{tap_entry_point}-") as directory:
+        yield directory
+
+def __write_input_file(directory, name, content):
+    file_name = os.path.join(directory, name)
+    with open(file_name, 'w') as f:
+        json.dump(content, f)
+    return file_name
 
-def __run_tap(tap_entry_point,config=None,catalog=None,state=None,discover=False):
-    patched_io = PatchStdOut()
-    context_managers = [patched_io]
-    argvs = [tap_entry_point]
-
-    if config:
-        file_name = '/tmp/tap_config.json'
-        with open('/tmp/tap_config.json', 'w') as f:
-            json.dump(config, f)
-        argvs.extend(['--config', file_name])
-
-    if catalog:
-        file_name = '/tmp/tap_catalog.json'
-        with open(file_name, 'w') as f:
-            json.dump(catalog, f)
-        argvs.extend(['--catalog', file_name])
-
-    if state:
-        file_name = '/tmp/tap_state.json'
-        with open(file_name, 'w') as f:
-            json.dump(state, f)
-        argvs.extend(['--state', file_name])
-
-    if discover:
-        argvs.append('--discover')
-
-    LOGGER.info(f"CLI command to reproduce: {' '.join(argvs)}")
-    context_managers.append(unittest.mock.patch('sys.argv', argvs))
+def __running_fork_server(tap_entry_point):
+    # Only a process that imported `forkserver` can have a server running
+    forkserver = sys.modules.get('singer_tap_tester.forkserver')
+    return forkserver.running(tap_entry_point) if forkserver is not None else None
 
+@contextmanager
+def __tap_invocation(tap_entry_point, out, config=None, catalog=None, state=None, discover=False, consumer=None):
+    """
+    Writes the tap's input files to a fresh workspace and prepares to run the
+    tap as if from the command line, with all of its output going to `out`.
+
+    Yields a function that runs the tap. If a `forkserver.ForkServer` is
+    running for the tap, the run happens in a child forked from it,
+    otherwise stdout and argv are patched and the tap runs in this process,
+    where the writes of the `consumer` thread reading `out` are let through
+    (see `PatchStdOut`). The workspace is deleted on exit.
+    """
     with ExitStack() as stack:
+        directory = stack.enter_context(workspace(tap_entry_point))
+        argvs = [tap_entry_point]
+
+        if config:
+            argvs.extend(['--config', __write_input_file(directory, 'tap_config.json', config)])
+
+        if catalog:
+            argvs.extend(['--catalog', __write_input_file(directory, 'tap_catalog.json', catalog)])
+
+        if state:
+            argvs.extend(['--state', __write_input_file(directory, 'tap_state.json', state)])
+
+        if discover:
+            argvs.append('--discover')
+
+        LOGGER.info(f"CLI command to reproduce: {' '.join(argvs)}")
+
+        server = __running_fork_server(tap_entry_point)
+        if server is not None:
+            error_file = os.path.join(directory, 'tap_error.txt')
+            yield lambda: server.run(argvs, out, error_file)
+            return
+
+        # Deferred since unittest.mock pulls in asyncio, which is slow to import
+        import unittest.mock
+        context_managers = [PatchStdOut(out, consumer=consumer), unittest.mock.patch('sys.argv', argvs)]
+
         # Dynamically enter all contexts and register with stack to __exit__
         # properly
         for cm in context_managers:
             stack.enter_context(cm)
 
-        __call_entry_point(tap_entry_point)
-        return patched_io.out.getvalue()
+        yield lambda: __call_entry_point(tap_entry_point)
+
+def __run_tap(tap_entry_point,config=None,catalog=None,state=None,discover=False):
+    out = ChunkedBuffer()
+    with __tap_invocation(tap_entry_point, out, config=config, catalog=catalog, state=state, discover=discover) as run_tap:
+        run_tap()
+        return out.getvalue()
+
+def __run_watched_tap(tap_entry_point, watchdog, metrics=None, config=None, discover=False):
+    """
+    Like `__run_tap`, but runs the tap on a background thread so that
+    `watchdog` can stop it, raising `watchdog.TapStalled`.
+    """
+    lines = LineQueue(idle_interval=IDLE_INTERVAL_SECONDS)
+    tap_lines = __iter_tap(tap_entry_point, lines, config=config, discover=discover)
+    watchdog.begin()
+    output = []
+    try:
+        for line in tap_lines:
+            if line is None:
+                expired = watchdog.expired()
+            else:
+                output.append(line)
+                expired = watchdog.progress()
+            if expired:
+                LOGGER.warning(f"Stopping tap, {watchdog.reason}.")
+                raise watchdog.error(metrics)
+    finally:
+        tap_lines.close()
+    return os.linesep.join(output)
+
+def __iter_tap(tap_entry_point, lines, config=None, catalog=None, state=None, discover=False):
+    """
+    Runs the tap on a background thread and yields its output line by line
+    from the `LineQueue` it writes to while it is still running.
+
+    If the consumer stops iterating early, the tap is aborted by raising
+    `TapRunAborted` from its next write to stdout. A tap that doesn't stop
+    within `ABORT_TIMEOUT_SECONDS` is abandoned, see `PatchStdOut.abandon`.
+    """
+
+    def produce(run_tap):
+        try:
+            run_tap()
+        except TapRunAborted:
+            lines.close()
+        except BaseException as ex: # Forward everything, including SystemExit
+            lines.close(ex)
+        else:
+            lines.close()
+
+    with __tap_invocation(tap_entry_point, lines, config=config, catalog=catalog, state=state, discover=discover,
+                          consumer=threading.current_thread()) as run_tap:
+        producer = threading.Thread(target=produce, args=(run_tap,), name=f"{tap_entry_point}-sync", daemon=True)
+        producer.start()
+        try:
+            yield from lines
+        finally:
+            if producer.is_alive():
+                # Stopped early, the tap unwinds on its next write
+                lines.abort()
+                server = __running_fork_server(tap_entry_point)
+                if server is not None:
+                    # A forked tap can just be killed instead
+                    server.cancel()
+                producer.join(timeout=ABORT_TIMEOUT_SECONDS)
+                if producer.is_alive():
+                    PatchStdOut.abandon(producer)
+                    LOGGER.warning(f"Tap {tap_entry_point} did not stop within {ABORT_TIMEOUT_SECONDS} seconds of being aborted, leaving it behind.")
+            else:
+                producer.join()
+
+def run_discovery(tap_entry_point, config, cache=None, metrics=None, watchdog=None):
+    """
+    Runs the tap in discovery mode and returns the catalog, then runs it
+    again without a catalog to validate the config.
+
+    With a `cache.DiscoveryCache`, a fresh catalog cached for the same tap
+    version and config is returned without running the tap, and the check
+    run is skipped too if the cache allows it.
+
+    With a `metrics.RunMetrics`, both runs are timed as the `discovery` and
+    `check` phases.
+
+    With a `watchdog.Watchdog`, both runs are watched like a sync, and
+    `watchdog.TapStalled` is raised if either one stalls, slows down below a
+    floor or runs out of time.
+    """
+    def phase(name):
+        return metrics.phase(name) if metrics is not None else nullcontext()
+
+    def run_tap(discover=False):
+        if watchdog is None:
+            return __run_tap(tap_entry_point, config=config, discover=discover)
+        return __run_watched_tap(tap_entry_point, watchdog, metrics=metrics, config=config, discover=discover)
+
+    if cache is not None:
+        from singer_tap_tester import entry_points
+        tap_version = entry_points.find(tap_entry_point).version
+        cache_key = cache.key(tap_entry_point, tap_version, config)
+        catalog = cache.get(cache_key)
+        if catalog is not None:
+            LOGGER.info(f"Using cached catalog for {tap_entry_point} {tap_version}.")
+            if not cache.skip_check:
+                LOGGER.info("Running sync without catalog to validate config.")
+                with phase('check'):
+                    run_tap()
+            return catalog
 
-def run_discovery(tap_entry_point, config):
     # Call it with mocks and temp files to simulate CLI
     LOGGER.info("Running discovery...")
-    catalog = __run_tap(tap_entry_point, config=config, discover=True)
+    with phase('discovery'):
+        catalog = run_tap(discover=True)
 
     # Run check mode so we can validate the creds. Should not sync any records
     LOGGER.info("Running sync without catalog to validate config.")
-    __run_tap(tap_entry_point, config=config)
+    with phase('check'):
+        run_tap()
+
+    catalog = json.loads(catalog)
+    if cache is not None:
+        cache.put(cache_key, catalog, tap_entry_point=tap_entry_point, tap_version=tap_version)
+    return catalog
+
+def __parse_lines(lines, metrics, lazy, sample, watchdog):
+    """
+    Parses the tap's output lines into messages, counting them in `metrics`
+    and stopping once the `sample` is complete or the `watchdog` trips.
+    Returns True if the watchdog tripped.
+    """
+    if lazy:
+        from singer_tap_tester import messages
+        parse = messages.parse_line
+    else:
+        parse = json.loads
+
+    line_separator_size = len(os.linesep)
+    perf_counter = time.perf_counter
+    for line in lines:
+        if line is None:
+            # The tap has been quiet for a while
+            if watchdog is not None and watchdog.expired():
+                return True
+            if sample is not None and sample.expired():
+                return False
+            continue
+        if not line.strip():
+            continue
+
+        if metrics is None:
+            message = parse(line)
+        else:
+            start = perf_counter()
+            message = parse(line)
+            metrics.parse_seconds += perf_counter() - start
+            metrics.observe(message, len(line) + line_separator_size)
+        yield message
 
-    return json.loads(catalog)
+        if watchdog is not None and watchdog.observe(message):
+            return True
+        if sample is not None and sample.observe(message):
+            LOGGER.info(f"Stopping sync early, {sample.reason}.")
+            return False
+    return False
 
-def run_sync(tap_entry_point, config, catalog, state):
+def __begin(catalog, metrics, sample, watchdog):
+    if sample is not None:
+        sample.begin(sample.selected_streams(catalog))
+    if watchdog is not None:
+        watchdog.begin()
+    return metrics.phase('sync') if metrics is not None else nullcontext()
 
+def __count_waiting(lines, metrics):
+    if metrics is not None:
+        metrics.waiting_for_tap_seconds += lines.waiting_seconds
+        metrics.tap_blocked_seconds += lines.blocked_seconds
+
+def __iter_sync(tap_entry_point, config, catalog, state, max_buffered_batches, metrics, lazy, sample, watchdog):
+    idle_interval = IDLE_INTERVAL_SECONDS if sample is not None or watchdog is not None else None
+    lines = LineQueue(max_batches=max_buffered_batches, idle_interval=idle_interval)
+    tap_lines = __iter_tap(tap_entry_point, lines, config=config, catalog=catalog, state=state)
+    try:
+        with __begin(catalog, metrics, sample, watchdog):
+            try:
+                stalled = yield from __parse_lines(tap_lines, metrics, lazy, sample, watchdog)
+            finally:
+                __count_waiting(lines, metrics)
+        if stalled:
+            LOGGER.warning(f"Stopping sync, {watchdog.reason}.")
+            raise watchdog.error(metrics)
+    finally:
+        # Aborts the tap if it is still running
+        tap_lines.close()
+
+def __collect_sync(tap_entry_point, config, catalog, state, metrics, lazy, sample, result):
+    """
+    Runs the tap on this thread and parses its output into `result` on a
+    worker thread while it runs, so that the tap runs just like it would
+    from the command line, e.g., it can install signal handlers.
+    """
+    lines = LineQueue(idle_interval=IDLE_INTERVAL_SECONDS if sample is not None else None)
+    errors = []
+    def consume():
+        try:
+            result.extend(__parse_lines(lines, metrics, lazy, sample, None))
+        except BaseException as ex: # Raised on this thread once the tap is done
+            errors.append(ex)
+        # Aborts the tap on its next write if it is still running
+        lines.abort()
+
+    consumer = threading.Thread(target=consume, name=f"{tap_entry_point}-consumer", daemon=True)
+    with __begin(catalog, metrics, sample, None):
+        consumer.start()
+        try:
+            with __tap_invocation(tap_entry_point, lines, config=config, catalog=catalog, state=state,
+                                  consumer=consumer) as run_tap:
+                try:
+                    run_tap()
+                except TapRunAborted:
+                    # The sample is complete, or parsing the output failed
+                    pass
+        finally:
+            lines.close()
+            consumer.join()
+            __count_waiting(lines, metrics)
+    if errors:
+        raise errors[0]
+
+def __sampled_catalogs(catalog, sample):
+    """
+    The catalog for every tap run of a sync, which is just `catalog` unless
+    the `sample` splits streams.
+    """
+    groups = sample.stream_groups(catalog) if sample is not None and sample.split_streams else []
+    if len(groups) < 2:
+        yield catalog
+        return
+
+    # Sync each stream (with its children) on its own, so that reaching the
+    # quota of one stream doesn't have to wait for the tap to finish syncing it
+    from singer_tap_tester import user
+    indexed_catalog = user.Catalog(catalog)
+    for group in groups:
+        if sample.started is not None and sample.expired():
+            LOGGER.info(f"Stopping sync early, {sample.reason}.")
+            break
+        LOGGER.info(f"Sampling {', '.join(group)}...")
+        yield indexed_catalog.only(group)
+
+def iter_sync(tap_entry_point, config, catalog, state, max_buffered_batches=64, metrics=None, lazy=False, sample=None,
+              watchdog=None):
+    """
+    Runs the tap in sync mode and yields each Singer message as soon as the
+    tap has written it.
+
+    The tap runs on a background thread while the messages are consumed on
+    the calling one, so a tap that needs the main thread, e.g., to install
+    a signal handler, can't be streamed. `run_sync` runs it on the calling
+    thread unless it is watched.
+
+    At most `max_buffered_batches` batches of lines are held in memory
+    between the tap and the consumer at any point, so memory stays bounded
+    no matter how long the sync is. Breaking out of the loop aborts the tap.
+
+    With a `metrics.RunMetrics`, the run is timed as the `sync` phase and
+    every message is counted, along with the time spent parsing them.
+
+    With `lazy`, messages are yielded as `messages.Message`s that only decode
+    their `type` and `stream` up front, instead of as dicts.
+
+    With a `sampling.Sample`, the tap is stopped once every selected stream
+    has emitted enough records or the sample's time budget runs out, in
+    which case `sample.stopped_early` is set.
+
+    With a `watchdog.Watchdog`, the tap is stopped and `watchdog.TapStalled`
+    is raised if it stalls, slows down below a floor or runs out of time.
+    """
     LOGGER.info("Running sync...")
-    raw_singer_messages = __run_tap(tap_entry_point, config=config, catalog=catalog, state=state)
+    for run_catalog in __sampled_catalogs(catalog, sample):
+        yield from __iter_sync(tap_entry_point, config, run_catalog, state, max_buffered_batches, metrics, lazy,
+                               sample, watchdog)
+
+def __spill_sync(tap_entry_point, config, catalog, state, spill, metrics):
+    from singer_tap_tester import store
+    owned_directory = None
+    if spill is True:
+        import tempfile
+        owned_directory = tempfile.mkdtemp(prefix=f"{tap_entry_point}-output-")
+        path = os.path.join(owned_directory, 'tap_output.jsonl')
+    else:
+        path = spill
+
+    LOGGER.info(f"Running sync, writing output to {path}...")
+    writer = store.SpillWriter(path, metrics=metrics)
+    try:
+        with metrics.phase('sync') if metrics is not None else nullcontext():
+            try:
+                with __tap_invocation(tap_entry_point, writer, config=config, catalog=catalog, state=state) as run_tap:
+                    run_tap()
+            finally:
+                index = writer.close()
+    except BaseException:
+        if owned_directory:
+            shutil.rmtree(owned_directory, ignore_errors=True)
+        raise
+    return store.SyncResult(path, index, owned_directory=owned_directory)
+
+def run_sync(tap_entry_point, config, catalog, state, metrics=None, lazy=False, spill=None, sample=None,
+             shards=None, max_workers=None, watchdog=None):
+    """
+    Runs the tap in sync mode and returns all of its messages as a
+    `messages.MessageList`, which is marked as `sampled` if a `sample`
+    stopped the sync early. See `iter_sync` for the options. Unless it is
+    watched, the tap runs on the calling thread, as it would from the
+    command line. If a `watchdog` stops the sync, the messages captured
+    until then are the `partial_output` of the `watchdog.TapStalled` it
+    raises.
+
+    With `spill`, the output is written to disk instead and a memory-mapped
+    `store.SyncResult` is returned. Pass a path to keep the output (it can be
+    reopened with `store.SyncResult.open`), or True to write it to a
+    temporary directory that is removed when the result is closed. A
+    spilled sync can't be sampled or watched.
+
+    With `shards`, the selected streams are synced by several tap runs at
+    once in up to `max_workers` processes, see `sharding`. Their output is
+    always spilled, to `spill` if it is a path, so a sharded sync can't be
+    sampled or watched either.
+    """
+    if shards and watchdog is not None:
+        raise Exception("A watchdog can't watch a sharded sync, run it without `shards`.")
+    if shards and sample is not None:
+        raise Exception("A sample can't stop a sharded sync, run it without `shards`.")
+    if shards:
+        # Deferred since sharding runs its shards through this module
+        from singer_tap_tester import sharding
+        return sharding.run_sharded_sync(tap_entry_point, config, catalog, state, shards=shards,
+                                         max_workers=max_workers, metrics=metrics, spill=spill or True)
+    if watchdog is not None and spill:
+        raise Exception("A watchdog can't watch a sync that is spilled to disk, run it without `spill`.")
+    if sample is not None and spill:
+        raise Exception("A sample can't stop a sync that is spilled to disk, run it without `spill`.")
+    if spill:
+        return __spill_sync(tap_entry_point, config, catalog, state, spill, metrics)
+    from singer_tap_tester import messages
+    result = messages.MessageList()
+    if watchdog is None:
+        LOGGER.info("Running sync...")
+        for run_catalog in __sampled_catalogs(catalog, sample):
+            __collect_sync(tap_entry_point, config, run_catalog, state, metrics, lazy, sample, result)
+        result.sampled = sample is not None and sample.stopped_early
+        return result
 
-    return list(map(json.loads, raw_singer_messages.strip().split(os.linesep)))
+    # A watched tap has to run on a thread of its own, to be left behind if it hangs
+    try:
+        result.extend(iter_sync(tap_entry_point, config, catalog, state,
+                                metrics=metrics, lazy=lazy, sample=sample, watchdog=watchdog))
+    except Exception as ex:
+        # A `watchdog.TapStalled` keeps what was captured until it was raised
+        if hasattr(ex, 'partial_output'):
+            ex.partial_output = result
+        raise
+    result.sampled = sample is not None and sample.stopped_early
+    return result
@@ -0,0 +1,257 @@
+"""
+Comparison of two taps, e.g., the version in production and the candidate
+upgrade, installed under different entry points, on the same scenario.
+
+`compare_taps` syncs the same config, catalog and state with both taps, each
+in a freshly spawned worker process, with the output spilled to disk. The
+worker starts from a new interpreter rather than a fork of this one, so its
+peak RSS is that of the tap alone, not of whatever this process had grown
+to. It then compares their `metrics.RunMetrics` (sync time, time to first
+record, peak RSS, throughput and bytes per stream) and diffs their records,
+matched on the streams' key properties.
+
+The diff is a hash join that scales past memory: the records of both sides
+are partitioned on disk by key, and only one partition of the baseline is
+held in memory at a time. Keys that occur more than once on a side are
+counted as `baseline_duplicate_keys` and `candidate_duplicate_keys`, and
+their records are matched up one to one.
+
+    python -m singer_tap_tester.comparison tap-foo tap-foo-next --config config.json --output report.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from singer_tap_tester import cli, integrity, metrics, sharding, store, user
+
+LOGGER = logging.getLogger(__name__)
+
+def run_side(tap_entry_point, config, catalog, state, path):
+    """
+    Syncs one side of a comparison, writing its output to `path`. This is
+    what each worker process executes, so it returns the run's metrics.
+    """
+    run_metrics = metrics.RunMetrics(tap_entry_point)
+    cli.run_sync(tap_entry_point, config, catalog, state, metrics=run_metrics, spill=path).close()
+    run_metrics.finish()
+    return run_metrics.to_dict()
+
+def __run_isolated(tap_entry_point, config, catalog, state, path):
+    # Spawned rather than forked: a forked child starts with the parent's
+    # peak RSS, which would be reported as the tap's
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=sharding.init_worker) as executor:
+        return executor.submit(run_side, tap_entry_point, config, catalog, state, path).result()
+
+def __change(before, after, lower_is_better, threshold):
+    if before is None or after is None or before == 0:
+        return None
+    change = after / before - 1
+    regressed = change > threshold if lower_is_better else change < -threshold
+    return {'baseline': before, 'candidate': after, 'change': change, 'regression': regressed}
+
+def compare_performance(baseline, candidate, threshold=0.1):
+    """
+    Compares the results of two `RunMetrics`. Every measure has the baseline
+    and candidate values, the relative `change` and whether it is a
+    `regression` of more than `threshold`.
+    """
+    def sync_seconds(results):
+        return sum(p['wall_seconds'] for p in results['phases'] if p['name'] == 'sync')
+
+    performance = {'sync_seconds': __change(sync_seconds(baseline), sync_seconds(candidate), True, threshold),
+                   'time_to_first_record_seconds': __change(baseline['time_to_first_record_seconds'],
+                                                            candidate['time_to_first_record_seconds'], True, threshold),
+                   'peak_rss_bytes': __change(baseline['peak_rss_bytes'], candidate['peak_rss_bytes'], True, threshold),
+                   'bytes': __change(baseline['bytes'], candidate['bytes'], True, threshold),
+                   'streams': {}}
+    for stream in sorted(set(baseline['streams']) | set(candidate['streams'])):
+        before = baseline['streams'].get(stream, {})
+        after = candidate['streams'].get(stream, {})
+        performance['streams'][stream] = {
+            'records': __change(before.get('records'), after.get('records'), True, threshold),
+            'bytes': __change(before.get('bytes'), after.get('bytes'), True, threshold),
+            'messages_per_second': __change(before.get('messages_per_second'), after.get('messages_per_second'), False, threshold)}
+    return performance
+
+def __partition_records(path, key_properties, partition_paths):
+    files = [open(p, 'w', encoding='utf-8') for p in partition_paths]
+    try:
+        with store.SyncResult.open(path) as result:
+            for message in result.of_type('RECORD'):
+                stream = message.stream
+                record = json.dumps(message['record'], sort_keys=True, default=str)
+                keys = key_properties.get(stream)
+                # Without key properties the whole record is the key
+                key = [message['record'].get(k) for k in keys] if keys else record
+                payload = json.dumps([stream, key], default=str)
+                partition = hashlib.blake2b(payload.encode('utf-8'), digest_size=8).digest()[0] % len(files)
+                files[partition].write(f"{payload}\t{record}\n")
+    finally:
+        for f in files:
+            f.close()
+
+def __field_changes(before, after):
+    return {field: [before.get(field), after.get(field)]
+            for field in sorted(set(before) | set(after)) if before.get(field) != after.get(field)}
+
+def diff_records(baseline_path, candidate_path, key_properties, partitions=64, max_samples=10, directory=None):
+    """
+    Diffs the records of two spilled sync outputs (see `cli.run_sync`),
+    matching records of each stream on `key_properties`. Returns per stream
+    the records of both sides, the records `added`, `removed`, `changed` and
+    `unchanged` in the candidate, and samples of each. Records that share a
+    key are matched one to one, identical records first, and the extra
+    records per key are counted as `baseline_duplicate_keys` and
+    `candidate_duplicate_keys`.
+    """
+    streams = {}
+    def stream_diff(stream):
+        if stream not in streams:
+            streams[stream] = {'baseline_records': 0, 'candidate_records': 0, 'added': 0, 'removed': 0,
+                               'changed': 0, 'unchanged': 0, 'baseline_duplicate_keys': 0,
+                               'candidate_duplicate_keys': 0, 'sample_added': [], 'sample_removed': [],
+                               'sample_changed': []}
+        return streams[stream]
+
+    def sample(diff, name, value):
+        if len(diff[name]) < max_samples:
+            diff[name].append(value)
+
+    work_directory = tempfile.mkdtemp(prefix='tap-diff-', dir=directory)
+    try:
+        baseline_partitions = [os.path.join(work_directory, f"baseline_{i}") for i in range(partitions)]
+        candidate_partitions = [os.path.join(work_directory, f"candidate_{i}") for i in range(partitions)]
+        __partition_records(baseline_path, key_properties, baseline_partitions)
+        __partition_records(candidate_path, key_properties, candidate_partitions)
+
+        for baseline_partition, candidate_partition in zip(baseline_partitions, candidate_partitions):
+            # The baseline's records per key, more than one if the key repeats
+            baseline = {}
+            with open(baseline_partition, encoding='utf-8') as f:
+                for line in f:
+                    payload, _, record = line.rstrip('\n').partition('\t')
+                    diff = stream_diff(json.loads(payload)[0])
+                    diff['baseline_records'] += 1
+                    if payload in baseline:
+                        diff['baseline_duplicate_keys'] += 1
+                        baseline[payload].append(record)
+                    else:
+                        baseline[payload] = [record]
+
+            seen = set()
+            with open(candidate_partition, encoding='utf-8') as f:
+                for line in f:
+                    payload, _, record = line.rstrip('\n').partition('\t')
+                    stream, key = json.loads(payload)
+                    diff = stream_diff(stream)
+                    diff['candidate_records'] += 1
+                    if payload in seen:
+                        diff['candidate_duplicate_keys'] += 1
+                    seen.add(payload)
+                    before = None
+                    records = baseline.get(payload)
+                    if records:
+                        before = record if record in records else records[0]
+                        records.remove(before)
+                    if before is None:
+                        diff['added'] += 1
+                        sample(diff, 'sample_added', json.loads(record))
+                    elif before == record:
+                        diff['unchanged'] += 1
+                    else:
+                        diff['changed'] += 1
+                        sample(diff, 'sample_changed', {'key': key, 'fields': __field_changes(json.loads(before), json.loads(record))})
+
+            for payload, records in baseline.items():
+                diff = stream_diff(json.loads(payload)[0])
+                for record in records:
+                    diff['removed'] += 1
+                    sample(diff, 'sample_removed', json.loads(record))
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+    return streams
+
+def compare_taps(baseline_tap, candidate_tap, config, catalog, state=None, candidate_config=None,
+                 threshold=0.1, partitions=64, max_samples=10):
+    """
+    Syncs the scenario with both taps and returns the report: the metrics
+    of both runs, their `performance` comparison (see
+    `compare_performance`), the `data` diff per stream (see
+    `diff_records`), and the lists of performance `regressions` and
+    streams with `data_changes`.
+    """
+    directory = tempfile.mkdtemp(prefix='tap-comparison-')
+    try:
+        baseline_path = os.path.join(directory, 'baseline.jsonl')
+        candidate_path = os.path.join(directory, 'candidate.jsonl')
+        LOGGER.info(f"Syncing baseline {baseline_tap}...")
+        baseline = __run_isolated(baseline_tap, config, catalog, state or {}, baseline_path)
+        LOGGER.info(f"Syncing candidate {candidate_tap}...")
+        candidate = __run_isolated(candidate_tap, candidate_config or config, catalog, state or {}, candidate_path)
+
+        LOGGER.info("Diffing records...")
+        data = diff_records(baseline_path, candidate_path, integrity.key_properties(catalog),
+                            partitions=partitions, max_samples=max_samples, directory=directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    performance = compare_performance(baseline, candidate, threshold)
+    regressions = [name for name, change in performance.items()
+                   if name != 'streams' and change and change['regression']]
+    regressions += [f"{stream}.{name}" for stream, changes in performance['streams'].items()
+                    for name, change in changes.items() if change and change['regression']]
+    return {'baseline': baseline,
+            'candidate': candidate,
+            'performance': performance,
+            'data': data,
+            'regressions': regressions,
+            'data_changes': sorted(stream for stream, diff in data.items()
+                                   if diff['added'] or diff['removed'] or diff['changed'])}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the performance and output of two taps on the same scenario.")
+    parser.add_argument('baseline', help="Entry point of the baseline tap, e.g., the version in production")
+    parser.add_argument('candidate', help="Entry point of the candidate tap")
+    parser.add_argument('--config', required=True, help="Config file for both taps")
+    parser.add_argument('--catalog', help="Catalog file with the streams to sync selected (default: everything the baseline discovers)")
+    parser.add_argument('--state', help="State file to start both syncs from")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Change that counts as a regression (default: 0.1)")
+    parser.add_argument('--output', help="File to save the report to (default: stdout)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+
+    def load(path, default=None):
+        if path is None:
+            return default
+        with open(path) as f:
+            return json.load(f)
+
+    config = load(args.config)
+    catalog = load(args.catalog) or user.select_all_streams_and_fields(cli.run_discovery(args.baseline, config))
+    report = compare_taps(args.baseline, args.candidate, config, catalog, load(args.state, {}), threshold=args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+    else:
+        json.dump(report, sys.stdout, indent=2, default=str)
+        sys.stdout.write(os.linesep)
+
+    for regression in report['regressions']:
+        sys.stderr.write(f"REGRESSION {regression}{os.linesep}")
+    for stream in report['data_changes']:
+        diff = report['data'][stream]
+        sys.stderr.write(f"DATA CHANGED {stream}: {diff['added']} added, {diff['removed']} removed, {diff['changed']} changed{os.linesep}")
+    sys.exit(1 if report['regressions'] or report['data_changes'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Index of the `console_scripts` entry points of the taps installed in the
+current (virtual) environment.
+
+Scanning every installed distribution is slow in big environments, so the
+index is built once per process and only rebuilt when something on
+`sys.path` changes, e.g. a tap getting installed or upgraded.
+"""
+
+import os
+import sys
+
+def environment_fingerprint():
+    """
+    Cheap summary of the environment. Installing or removing a distribution
+    adds or removes its `.dist-info` directory, which changes the
+    modification time of the directory on `sys.path` it lives in.
+    """
+    fingerprint = []
+    for path in sys.path:
+        try:
+            fingerprint.append((path, os.stat(path or '.').st_mtime_ns))
+        except OSError:
+            fingerprint.append((path, None))
+    return tuple(fingerprint)
+
+class TapEntryPoint():
+    "A `console_scripts` entry point and the distribution that provides it."
+    __slots__ = ('name', 'value', 'project_name', 'version', 'entry_point')
+
+    def __init__(self, entry_point, project_name, version):
+        self.name = entry_point.name
+        self.value = entry_point.value
+        self.project_name = project_name
+        self.version = version
+        self.entry_point = entry_point
+
+    def resolve(self):
+        return self.entry_point.load()
+
+    def __repr__(self):
+        return f"TapEntryPoint({self.name}={self.value} from {self.project_name}=={self.version})"
+
+class EntryPointIndex():
+    """
+    Maps command names to the `console_scripts` entry points of installed
+    taps (distributions with `tap-` in their name).
+    """
+    def __init__(self):
+        self.fingerprint = None
+        self.by_command = {}
+
+    def build(self):
+        # Deferred since importing importlib.metadata is not free either
+        from importlib import metadata
+
+        by_command = {}
+        seen_projects = set()
+        for dist in metadata.distributions():
+            project_name = (dist.metadata['Name'] or '').replace('_', '-')
+            # Only the first distribution found on sys.path is importable
+            if 'tap-' not in project_name or project_name.lower() in seen_projects:
+                continue
+            seen_projects.add(project_name.lower())
+            for entry_point in dist.entry_points:
+                if entry_point.group == 'console_scripts':
+                    by_command.setdefault(entry_point.name, []).append(
+                        TapEntryPoint(entry_point, project_name, dist.version))
+        return by_command
+
+    def refresh(self):
+        "Rebuilds the index if the environment has changed since it was built."
+        fingerprint = environment_fingerprint()
+        if fingerprint != self.fingerprint:
+            self.by_command = self.build()
+            self.fingerprint = fingerprint
+
+    def find(self, run_command):
+        self.refresh()
+        found_entry_points = self.by_command.get(run_command, [])
+        if not found_entry_points:
+            raise Exception(f"No entrypoints found in current (virtual) environment to run tap using command: '{run_command}'")
+        if len(found_entry_points) > 1:
+            raise Exception(f"Ambiguous entry_point - {len(found_entry_points)} entrypoints found in current (virtual) environment to run tap using command: '{run_command}'")
+        return found_entry_points[0]
+
+INDEX = EntryPointIndex()
+
+def find(run_command):
+    "Returns the `TapEntryPoint` installed for `run_command`."
+    return INDEX.find(run_command)
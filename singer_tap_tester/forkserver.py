@@ -0,0 +1,244 @@
+"""
+Warm fork server that imports a tap once and forks a fresh child for every
+run of it.
+
+By default a tap runs in the test's own process with `sys.stdout` and
+`sys.argv` patched, so every discovery, check and sync pays for the tap's
+startup again, and whatever module level state one run leaves behind is
+seen by the next. A `ForkServer` instead starts a separate server process
+that resolves and imports the tap's entry point once. Each run is then a
+child forked from that preloaded server, which starts in a few milliseconds,
+writes to a pipe instead of a patched stdout, and takes its changes to the
+tap's modules with it when it exits.
+
+While a server is running for a tap (see `serve`), every `cli` function
+that runs that tap goes through it, so nothing else has to change:
+
+    forkserver.serve("tap-github")
+    catalog = cli.run_discovery("tap-github", config)
+
+`StandardTests` do this on their own when `use_fork_server` is set. Forking
+requires a POSIX system.
+"""
+
+import atexit
+import codecs
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import traceback
+
+LOGGER = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+
+# Running servers, by tap entry point
+SERVERS = {}
+
+class TapProcessError(Exception):
+    "Raised when a tap run in a forked child exits with an error."
+    def __init__(self, message, exit_code, tap_traceback=None):
+        super().__init__(message)
+        self.exit_code = exit_code
+        self.tap_traceback = tap_traceback
+
+def __send(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+def __receive_request(sock):
+    "Reads a request along with the file descriptors sent with it."
+    data, fds, _flags, _address = socket.recv_fds(sock, READ_SIZE, 1)
+    if not data:
+        return None, fds
+    while not data.endswith(b'\n'):
+        more = sock.recv(READ_SIZE)
+        if not more:
+            return None, fds
+        data += more
+    return json.loads(data), fds
+
+def __run_child(main, argv, out_fd, error_file):
+    "Runs the tap in a freshly forked child, never returns."
+    exit_code = 1
+    try:
+        os.dup2(out_fd, 1)
+        os.close(out_fd)
+        sys.argv = argv
+        try:
+            main()
+            exit_code = 0
+        except SystemExit as ex:
+            if ex.code is None or isinstance(ex.code, int):
+                exit_code = ex.code or 0
+            else:
+                sys.stderr.write(f"{ex.code}{os.linesep}")
+        except BaseException: # Report everything, the parent raises it
+            with open(error_file, 'w') as f:
+                f.write(traceback.format_exc())
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+def serve_forever(tap_entry_point, sock):
+    """
+    The server's main loop. Imports the tap's entry point, then forks a
+    child for every request until the client hangs up.
+    """
+    from singer_tap_tester import entry_points
+    try:
+        main = entry_points.find(tap_entry_point).resolve()
+    except Exception as ex:
+        __send(sock, {'error': str(ex)})
+        return
+    __send(sock, {'ready': True})
+
+    while True:
+        request, fds = __receive_request(sock)
+        if request is None:
+            break
+        out_fd = fds[0]
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            __run_child(main, request['argv'], out_fd, request['error_file'])
+        # Only the child writes, so the client sees EOF once it exits
+        os.close(out_fd)
+        __send(sock, {'pid': pid})
+        _, status = os.waitpid(pid, 0)
+        __send(sock, {'exit_code': os.waitstatus_to_exitcode(status)})
+
+class ForkServer():
+    """
+    Server process that keeps `tap_entry_point` imported and runs it in a
+    forked child per invocation. Runs are one at a time, in the order they
+    are asked for.
+    """
+    def __init__(self, tap_entry_point):
+        if not hasattr(os, 'fork'):
+            raise Exception("The fork server requires os.fork, which is not available on this platform.")
+        self.tap_entry_point = tap_entry_point
+        self.lock = threading.Lock()
+        self.sock, server_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.process = subprocess.Popen([sys.executable, '-m', 'singer_tap_tester.forkserver',
+                                             tap_entry_point, str(server_sock.fileno())],
+                                            pass_fds=[server_sock.fileno()])
+        finally:
+            server_sock.close()
+        self.replies = self.sock.makefile('rb')
+        self.child_pid = None
+
+        reply = self.__reply()
+        if 'error' in reply:
+            self.close()
+            raise Exception(f"Fork server for {tap_entry_point} failed to start: {reply['error']}")
+        LOGGER.info(f"Started fork server for {tap_entry_point} (pid {self.process.pid}).")
+
+    def __reply(self):
+        line = self.replies.readline()
+        if not line:
+            raise Exception(f"Fork server for {self.tap_entry_point} exited unexpectedly.")
+        return json.loads(line)
+
+    def run(self, argv, out, error_file):
+        """
+        Runs the tap with `argv` in a new child and writes its stdout to
+        `out`, raising `TapProcessError` if it fails. If writing to `out`
+        raises, the child is killed and the error is raised.
+        """
+        with self.lock:
+            read_fd, write_fd = os.pipe()
+            try:
+                socket.send_fds(self.sock, [json.dumps({'argv': argv, 'error_file': error_file}).encode('utf-8') + b'\n'],
+                                [write_fd])
+            finally:
+                os.close(write_fd)
+
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            with os.fdopen(read_fd, 'rb', buffering=0) as output:
+                self.child_pid = self.__reply()['pid']
+                try:
+                    while True:
+                        data = output.read(READ_SIZE)
+                        if not data:
+                            break
+                        text = decoder.decode(data)
+                        if text:
+                            out.write(text)
+                    text = decoder.decode(b'', final=True)
+                    if text:
+                        out.write(text)
+                except BaseException:
+                    self.cancel()
+                    self.__reply()
+                    raise
+                finally:
+                    self.child_pid = None
+
+            exit_code = self.__reply()['exit_code']
+            if exit_code != 0:
+                tap_traceback = None
+                if os.path.exists(error_file):
+                    with open(error_file) as f:
+                        tap_traceback = f.read()
+                message = f"Tap {self.tap_entry_point} exited with code {exit_code}."
+                if tap_traceback:
+                    message += f"{os.linesep}{tap_traceback}"
+                raise TapProcessError(message, exit_code, tap_traceback)
+
+    def cancel(self):
+        "Kills the child of the current run, if there is one."
+        try:
+            os.kill(self.child_pid, signal.SIGKILL)
+        except (ProcessLookupError, TypeError):
+            pass
+
+    def close(self):
+        "Stops the server, which exits once its current child does."
+        if SERVERS.get(self.tap_entry_point) is self:
+            del SERVERS[self.tap_entry_point]
+        self.replies.close()
+        self.sock.close()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def __enter__(self):
+        SERVERS[self.tap_entry_point] = self
+        return self
+
+    def __exit__(self, _tp, _v, _tb):
+        self.close()
+
+def serve(tap_entry_point):
+    """
+    Returns the running fork server for a tap, starting one if there is
+    none. It keeps running, and serving every run of the tap in this
+    process, until it is closed or the process exits.
+    """
+    server = SERVERS.get(tap_entry_point)
+    if server is None or server.process.poll() is not None:
+        server = SERVERS[tap_entry_point] = ForkServer(tap_entry_point)
+    return server
+
+def running(tap_entry_point):
+    "The running fork server for a tap, if any."
+    return SERVERS.get(tap_entry_point)
+
+@atexit.register
+def close_all():
+    for server in list(SERVERS.values()):
+        server.close()
+
+if __name__ == '__main__':
+    serve_forever(sys.argv[1], socket.socket(fileno=int(sys.argv[2])))
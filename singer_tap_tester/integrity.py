@@ -0,0 +1,191 @@
+"""
+Primary key integrity checks of sync output, which find records emitted
+more than once, e.g., because of pagination bugs.
+
+`KeyChecker` takes the records of every stream in a single pass and keeps
+a 16 byte digest of each `(stream, key)` rather than the keys themselves.
+Digests are held in memory until they would take more than `memory_budget`
+bytes, then spilled to partition files on disk by digest and finished one
+partition at a time. A partition that turns out too big for the budget is
+split further when it is finished, so the check never needs much more than
+the budget regardless of the size of the sync.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Estimated memory of a digest held in a set: the bytes object plus its slot
+BYTES_PER_KEY = 100
+
+DIGEST_SIZE = 16
+
+def key_properties(catalog):
+    "The key properties of each stream of a catalog, from its metadata or the older top-level field."
+    keys = {}
+    for stream in catalog.get('streams', []):
+        mdata = next((m['metadata'] for m in stream.get('metadata', []) if m['breadcrumb'] == []), {})
+        keys[stream['tap_stream_id']] = mdata.get('table-key-properties') or stream.get('key_properties') or []
+    return keys
+
+def digest(payload):
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+class StreamKeys():
+    __slots__ = ('records', 'duplicates', 'missing_keys', 'sample_duplicates')
+
+    def __init__(self):
+        self.records = 0
+        self.duplicates = 0
+        self.missing_keys = 0
+        self.sample_duplicates = []
+
+class KeyChecker():
+    """
+    Finds records with the same key properties as an earlier record of their
+    stream. Call `process` with every message of a sync, or with the records
+    and the stream's key properties through `add`, then `finish` for the
+    report of every stream.
+
+    `stream_key_properties` maps streams to their key properties (see
+    `key_properties`), otherwise they are read from SCHEMA messages.
+    """
+    def __init__(self, stream_key_properties=None, memory_budget=64 * 1024 * 1024, partitions=64,
+                 max_samples=10, directory=None):
+        self.key_properties = dict(stream_key_properties or {})
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.max_samples = max_samples
+        self.directory = directory
+        self.streams = {}
+        self.digests = set()
+        self.spill_directory = None
+        self.spill_files = None
+        self.spill_counts = None
+
+    def __stream(self, stream):
+        stream_keys = self.streams.get(stream)
+        if stream_keys is None:
+            stream_keys = self.streams[stream] = StreamKeys()
+        return stream_keys
+
+    def __duplicate(self, stream_keys, payload):
+        stream_keys.duplicates += 1
+        if len(stream_keys.sample_duplicates) < self.max_samples:
+            stream_keys.sample_duplicates.append(json.loads(payload)[1])
+
+    def __spill(self):
+        self.spill_directory = tempfile.mkdtemp(prefix='key-check-', dir=self.directory)
+        self.spill_files = [open(os.path.join(self.spill_directory, f"partition_{i}"), 'w', encoding='utf-8')
+                            for i in range(self.partitions)]
+        self.spill_counts = [0] * self.partitions
+        # Digests already checked in memory only need to be found again
+        for item_digest in self.digests:
+            partition = item_digest[0] % self.partitions
+            self.spill_files[partition].write(f"{item_digest.hex()}\n")
+            self.spill_counts[partition] += 1
+        self.digests = set()
+
+    def add(self, stream, record, key_properties):
+        stream_keys = self.__stream(stream)
+        stream_keys.records += 1
+        key = [record.get(k) for k in key_properties]
+        if all(value is None for value in key):
+            stream_keys.missing_keys += 1
+            return
+        payload = json.dumps([stream, key], sort_keys=True, default=str)
+        item_digest = digest(payload)
+
+        if self.spill_files is not None:
+            # Checked once the partition is read back in `finish`
+            partition = item_digest[0] % self.partitions
+            self.spill_files[partition].write(f"{item_digest.hex()} {payload}\n")
+            self.spill_counts[partition] += 1
+        elif item_digest in self.digests:
+            self.__duplicate(stream_keys, payload)
+        else:
+            self.digests.add(item_digest)
+            if len(self.digests) * BYTES_PER_KEY > self.memory_budget:
+                self.__spill()
+
+    def process(self, message):
+        message_type = message.get('type')
+        if message_type == 'RECORD':
+            key_properties = self.key_properties.get(message['stream'])
+            if key_properties:
+                self.add(message['stream'], message['record'], key_properties)
+        elif message_type == 'SCHEMA' and message.get('key_properties') and not self.key_properties.get(message['stream']):
+            self.key_properties[message['stream']] = message['key_properties']
+
+    def check(self, messages):
+        "Passes every message through, checking the keys of records on the way."
+        for message in messages:
+            self.process(message)
+            yield message
+
+    def __finish_partition(self, path, keys, level=1):
+        # Split a partition that wouldn't fit the budget on the next byte of
+        # the digest, into as many parts as it takes
+        parts = -(-keys * BYTES_PER_KEY // self.memory_budget)
+        if parts > 1 and level < DIGEST_SIZE:
+            part_paths = [f"{path}_{i}" for i in range(parts)]
+            part_files = [open(part_path, 'w', encoding='utf-8') for part_path in part_paths]
+            part_counts = [0] * parts
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        part = int(line[2 * level:2 * level + 2], 16) % parts
+                        part_files[part].write(line)
+                        part_counts[part] += 1
+            finally:
+                for part_file in part_files:
+                    part_file.close()
+            os.remove(path)
+            for part_path, part_keys in zip(part_paths, part_counts):
+                self.__finish_partition(part_path, part_keys, level + 1)
+            return
+
+        seen = set()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                hex_digest, _, payload = line.rstrip('\n').partition(' ')
+                item_digest = bytes.fromhex(hex_digest)
+                if item_digest in seen:
+                    self.__duplicate(self.__stream(json.loads(payload)[0]), payload)
+                else:
+                    seen.add(item_digest)
+        os.remove(path)
+
+    def __finish_spilled(self):
+        try:
+            for spill_file in self.spill_files:
+                spill_file.close()
+            for spill_file, keys in zip(self.spill_files, self.spill_counts):
+                self.__finish_partition(spill_file.name, keys)
+        finally:
+            shutil.rmtree(self.spill_directory, ignore_errors=True)
+            self.spill_files = None
+            self.spill_counts = None
+
+    def finish(self):
+        """
+        Returns the report of every stream: its record count, duplicates,
+        duplicate rate, records without a key and sample duplicate keys.
+        """
+        spilled = self.spill_files is not None
+        if spilled:
+            self.__finish_spilled()
+        self.digests = set()
+
+        report = {}
+        for stream, stream_keys in self.streams.items():
+            report[stream] = {'records': stream_keys.records,
+                              'duplicates': stream_keys.duplicates,
+                              'duplicate_rate': stream_keys.duplicates / stream_keys.records if stream_keys.records else 0.0,
+                              'records_without_key': stream_keys.missing_keys,
+                              'sample_duplicate_keys': stream_keys.sample_duplicates,
+                              'key_properties': self.key_properties.get(stream),
+                              'spilled_to_disk': spilled}
+        return report
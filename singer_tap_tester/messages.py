@@ -0,0 +1,155 @@
+"""
+Compact, lazily decoded Singer messages.
+
+Most assertions only need a message's `type` and `stream`, so only those are
+read up front, from the start of the raw line. The rest of the line stays
+raw bytes until the message is accessed for anything else, and then gets
+decoded once. Messages use `__slots__`, so a message that was never accessed
+takes little more memory than its raw JSON.
+
+Messages are read-only mappings, so `message['record']`, `message.get(...)`
+and comparisons to plain dicts keep working, and `to_dict` converts them.
+"""
+
+from collections.abc import Mapping
+import json
+import re
+
+# Singer libraries write `type` first and `stream` second
+HEADER = re.compile(rb'\s*\{\s*"type"\s*:\s*"([A-Z_]+)"\s*(?:,\s*"stream"\s*:\s*"((?:[^"\\]|\\.)*)")?')
+
+# Message types that always have a stream
+STREAM_TYPES = {'RECORD', 'SCHEMA', 'ACTIVATE_VERSION', 'BATCH'}
+
+class Message(Mapping):
+    __slots__ = ('raw', 'type', 'stream', '_decoded')
+
+    def __init__(self, raw, message_type, stream, decoded=None):
+        self.raw = raw
+        self.type = message_type
+        self.stream = stream
+        self._decoded = decoded
+
+    def to_dict(self):
+        "The fully decoded message, as `json.loads` would return it."
+        if self._decoded is None:
+            self._decoded = json.loads(self.raw)
+        return self._decoded
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return self.type
+        if key == 'stream' and self.stream is None and self._decoded is None and self.type not in STREAM_TYPES:
+            # Don't decode e.g. every STATE just to find it has no stream
+            raise KeyError(key)
+        if key == 'stream' and self.stream is not None:
+            return self.stream
+        return self.to_dict()[key]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __repr__(self):
+        stream = f", stream={self.stream!r}" if self.stream is not None else ''
+        return f"{self.__class__.__name__}(type={self.type!r}{stream}, {len(self.raw)} bytes)"
+
+class RecordMessage(Message):
+    __slots__ = ()
+
+    @property
+    def record(self):
+        return self.to_dict()['record']
+
+    @property
+    def version(self):
+        return self.to_dict().get('version')
+
+    @property
+    def time_extracted(self):
+        return self.to_dict().get('time_extracted')
+
+class SchemaMessage(Message):
+    __slots__ = ()
+
+    @property
+    def schema(self):
+        return self.to_dict()['schema']
+
+    @property
+    def key_properties(self):
+        return self.to_dict().get('key_properties')
+
+    @property
+    def bookmark_properties(self):
+        return self.to_dict().get('bookmark_properties')
+
+class StateMessage(Message):
+    __slots__ = ()
+
+    @property
+    def value(self):
+        return self.to_dict()['value']
+
+MESSAGE_CLASSES = {'RECORD': RecordMessage,
+                   'SCHEMA': SchemaMessage,
+                   'STATE': StateMessage}
+
+def parse_line(line):
+    """
+    Returns the `Message` for a line of tap output, given as `str` or
+    `bytes`, only decoding the `type` and `stream` of the message.
+    """
+    raw = line.encode('utf-8') if isinstance(line, str) else line
+    match = HEADER.match(raw)
+    if match is not None:
+        message_type = match.group(1).decode('ascii')
+        stream = match.group(2)
+        if stream is not None:
+            stream = json.loads(b'"' + stream + b'"') if b'\\' in stream else stream.decode('utf-8')
+        if stream is not None or message_type not in STREAM_TYPES:
+            return MESSAGE_CLASSES.get(message_type, Message)(raw, message_type, stream)
+
+    # Written in some other order, fall back to decoding all of it
+    decoded = json.loads(raw)
+    message_type = decoded.get('type')
+    return MESSAGE_CLASSES.get(message_type, Message)(raw, message_type, decoded.get('stream'), decoded)
+
+class MessageList(list):
+    """
+    List of the messages of a sync, either plain dicts or `Message`s, with
+    helpers to filter and count them. With `Message`s, these only look at
+    the already decoded `type` and `stream`.
+
+    `sampled` is True when a `sampling.Sample` stopped the sync early.
+    """
+    sampled = False
+
+    def of_type(self, message_type):
+        return MessageList(m for m in self if m.get('type') == message_type)
+
+    def by_stream(self, stream):
+        return MessageList(m for m in self if m.get('stream') == stream)
+
+    def records(self, stream=None):
+        return MessageList(m for m in self
+                           if m.get('type') == 'RECORD' and (stream is None or m.get('stream') == stream))
+
+    def count_by_type(self):
+        counts = {}
+        for m in self:
+            counts[m.get('type')] = counts.get(m.get('type'), 0) + 1
+        return counts
+
+    def count_by_stream(self, message_type='RECORD'):
+        counts = {}
+        for m in self:
+            if m.get('type') == message_type:
+                counts[m.get('stream')] = counts.get(m.get('stream'), 0) + 1
+        return counts
+
+    def to_dicts(self):
+        "Plain dicts of all the messages, as `json.loads` would return them."
+        return [m.to_dict() if isinstance(m, Message) else m for m in self]
@@ -0,0 +1,165 @@
+"""
+Instrumentation for tap runs, to tell where the time of a test goes: the
+tap's discovery, its config check, the sync itself, parsing its output or
+the harness's own work.
+
+A `RunMetrics` collects wall and CPU time per phase, messages and bytes per
+second overall and per stream, time to first record and peak RSS. Pass it
+as `metrics` to `cli.run_discovery`, `cli.iter_sync` or `cli.run_sync`.
+`StandardTests` does this for every standard test and keeps the results on
+the test case as `metrics_by_test`.
+
+Functions registered with `register_hook` are called with the results of
+every run once it is finished, e.g., to send them to a metrics system.
+"""
+
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError: # pragma: no cover
+    # Not available on Windows
+    resource = None
+
+LOGGER = logging.getLogger(__name__)
+
+HOOKS = []
+
+def register_hook(hook):
+    "Calls `hook(results)` with the dict of every `RunMetrics` that finishes."
+    HOOKS.append(hook)
+    return hook
+
+def unregister_hook(hook):
+    HOOKS.remove(hook)
+
+def peak_rss_bytes():
+    "Peak resident set size of this process so far, or None if unknown."
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes everywhere else
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class StreamCounter():
+    __slots__ = ('messages', 'records', 'bytes')
+
+    def __init__(self):
+        self.messages = 0
+        self.records = 0
+        self.bytes = 0
+
+class RunMetrics():
+    """
+    Timings and throughput of the tap runs made while collecting into this
+    object. Each call to `phase` adds a phase, and messages of sync phases
+    are counted with `observe`.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.phases = []
+        self.streams = {}
+        self.messages = 0
+        self.bytes = 0
+        self.parse_seconds = 0.0
+        self.waiting_for_tap_seconds = 0.0
+        self.tap_blocked_seconds = 0.0
+        self.sync_started = None
+        self.time_to_first_record = None
+        self.finished = False
+
+    @contextmanager
+    def phase(self, name):
+        "Times the wall clock and process CPU time spent within the context."
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if name == 'sync' and self.sync_started is None:
+            self.sync_started = wall_start
+        try:
+            yield self
+        finally:
+            self.phases.append({'name': name,
+                                'wall_seconds': time.perf_counter() - wall_start,
+                                'cpu_seconds': time.process_time() - cpu_start,
+                                'peak_rss_bytes': peak_rss_bytes()})
+
+    def observe(self, message, size):
+        "Counts a message of the sync that took `size` bytes of tap output."
+        self.messages += 1
+        self.bytes += size
+        stream = message.get('stream')
+        counter = self.streams.get(stream)
+        if counter is None:
+            counter = self.streams[stream] = StreamCounter()
+        counter.messages += 1
+        counter.bytes += size
+        if message.get('type') == 'RECORD':
+            counter.records += 1
+            if self.time_to_first_record is None and self.sync_started is not None:
+                self.time_to_first_record = time.perf_counter() - self.sync_started
+
+    def add_run(self, results, started_after=0.0):
+        """
+        Adds the messages counted by another `RunMetrics`, e.g., one that
+        timed a shard in a worker process, given its `to_dict` results and
+        how many seconds into this run's sync it started.
+        """
+        self.messages += results['messages']
+        self.bytes += results['bytes']
+        self.parse_seconds += results['parse_seconds']
+        for stream, counts in results['streams'].items():
+            counter = self.streams.get(stream)
+            if counter is None:
+                counter = self.streams[stream] = StreamCounter()
+            counter.messages += counts['messages']
+            counter.records += counts['records']
+            counter.bytes += counts['bytes']
+        if results['time_to_first_record_seconds'] is not None:
+            first_record = started_after + results['time_to_first_record_seconds']
+            if self.time_to_first_record is None or first_record < self.time_to_first_record:
+                self.time_to_first_record = first_record
+
+    def sync_seconds(self):
+        return sum(p['wall_seconds'] for p in self.phases if p['name'] == 'sync')
+
+    def to_dict(self):
+        sync_seconds = self.sync_seconds()
+        def rate(amount):
+            return amount / sync_seconds if sync_seconds else None
+
+        return {'name': self.name,
+                'phases': self.phases,
+                'messages': self.messages,
+                'bytes': self.bytes,
+                'messages_per_second': rate(self.messages),
+                'bytes_per_second': rate(self.bytes),
+                'time_to_first_record_seconds': self.time_to_first_record,
+                'parse_seconds': self.parse_seconds,
+                'waiting_for_tap_seconds': self.waiting_for_tap_seconds,
+                'tap_blocked_on_harness_seconds': self.tap_blocked_seconds,
+                'peak_rss_bytes': peak_rss_bytes(),
+                'streams': {str(stream): {'messages': counter.messages,
+                                          'records': counter.records,
+                                          'bytes': counter.bytes,
+                                          'messages_per_second': rate(counter.messages),
+                                          'bytes_per_second': rate(counter.bytes)}
+                            for stream, counter in self.streams.items()}}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def finish(self):
+        "Marks the run as done and passes the results to the registered hooks."
+        if self.finished:
+            return
+        self.finished = True
+        results = self.to_dict()
+        for hook in HOOKS:
+            try:
+                hook(results)
+            except Exception as ex:
+                LOGGER.warning(f"Metrics hook {hook!r} failed: {ex!r}")
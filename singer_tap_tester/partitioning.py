@@ -0,0 +1,215 @@
+"""
+Date-window partitioned syncs, which split the history of incremental
+streams into windows and sync the windows at the same time.
+
+Sharding by stream (see `sharding`) doesn't help when one huge incremental
+stream takes most of the time. A partitioned sync splits the range from
+`start_date` (or a given `start`) to `end_date` (or now) into windows, and
+runs the tap once per window in a bounded pool of worker processes. Each
+run gets the window's start as `start_date`, its end as `end_date` (or
+whatever `end_date_key` the tap uses) and its own state, without bookmarks
+for the selected streams so that the tap starts from `start_date`.
+
+The windows are merged in order. Runs overlap at the window edges, since
+most taps include records at their start bookmark, some also at their end
+date, and some look back a little before their start. Records that are
+clearly outside of the window that emitted them are dropped, and the ones
+within `lookback_seconds` of an edge, which both neighbouring windows can
+emit, are deduplicated on the stream's key properties. The merged output is
+spilled to disk as a `store.SyncResult` and only the keys of records near an
+edge are held in memory, so streams of any size can be partitioned.
+
+Records are placed in windows by the stream's replication key, so the tap
+must sync by one, and must honour `end_date_key` (otherwise every window
+syncs to the end, and the extra records are dropped).
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+from singer_tap_tester import messages, sampling, sharding, store, user
+
+LOGGER = logging.getLogger(__name__)
+
+def parse_datetime(value):
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def format_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def date_windows(start, end, windows):
+    """
+    Splits `[start, end)` into `windows` windows of about equal length, as
+    datetimes. Edges fall on whole seconds, so that they are the same in
+    the config passed to the tap.
+    """
+    seconds = int((end - start).total_seconds())
+    edges = [start + timedelta(seconds=seconds * i // windows) for i in range(windows)] + [end]
+    return [(a, b) for a, b in zip(edges, edges[1:]) if a < b]
+
+def stream_keys(catalog):
+    """
+    Returns the `(key_properties, replication_key)` of every selected stream
+    of a catalog, from its metadata or the older top-level fields. The
+    replication key must be a `date-time` string in the stream's schema.
+    """
+    indexed_catalog = user.Catalog(catalog)
+    keys = {}
+    for tap_stream_id in sampling.Sample.selected_streams(catalog):
+        stream = indexed_catalog.streams[tap_stream_id]
+        mdata = indexed_catalog.get_metadata(tap_stream_id) or {}
+        key_properties = mdata.get('table-key-properties') or stream.get('key_properties') or []
+        replication_key = (mdata.get('replication-key') or stream.get('replication_key')
+                           or (mdata.get('valid-replication-keys') or [None])[0])
+        if replication_key is None:
+            raise Exception(f"Stream {tap_stream_id} has no replication key, so it can't be partitioned by date.")
+        replication_schema = stream.get('schema', {}).get('properties', {}).get(replication_key, {})
+        types = replication_schema.get('type', [])
+        if replication_schema.get('format') != 'date-time' or 'string' not in ([types] if isinstance(types, str) else types):
+            raise Exception(f"Stream {tap_stream_id}'s replication key {replication_key} isn't a date-time string, "
+                            "so it can't be partitioned by date.")
+        keys[tap_stream_id] = (key_properties, replication_key)
+    return keys
+
+def window_state(state, tap_stream_ids):
+    "The state of a window's run, which must start from the window's `start_date`."
+    if not state:
+        return {}
+    bookmarks = {s: b for s, b in state.get('bookmarks', {}).items() if s not in tap_stream_ids}
+    return {**state, 'bookmarks': bookmarks, 'currently_syncing': None}
+
+class EdgeDeduplicator():
+    """
+    Decides which records of the windows, merged in order, to keep. Tracks
+    the keys of records within `lookback` of the current window's end, and
+    drops the records of the next window that were already emitted.
+    """
+    def __init__(self, stream_keys, lookback):
+        self.stream_keys = stream_keys
+        self.lookback = lookback
+        self.previous_edge_keys = {}
+        self.edge_keys = {}
+        self.outside_window = 0
+        self.duplicates = 0
+
+    def start_window(self):
+        self.previous_edge_keys, self.edge_keys = self.edge_keys, {}
+
+    def keep(self, record_message, window_start, window_end, first, last):
+        stream = record_message['stream']
+        key_properties, replication_key = self.stream_keys.get(stream, ([], None))
+        record = record_message['record']
+        value = record.get(replication_key)
+        if value is None:
+            return True
+        value = parse_datetime(value)
+
+        # Emitted by a neighbour's run but only ever belongs to the neighbour
+        if (not first and value < window_start - self.lookback) or (not last and value > window_end):
+            self.outside_window += 1
+            return False
+
+        key = tuple(record.get(k) for k in key_properties)
+        if not first and value <= window_start and key_properties:
+            if key in self.previous_edge_keys.get(stream, ()):
+                self.duplicates += 1
+                return False
+        if not last and value >= window_end - self.lookback and key_properties:
+            self.edge_keys.setdefault(stream, set()).add(key)
+        return True
+
+def run_partitioned_sync(tap_entry_point, config, catalog, state, windows, start=None, end=None,
+                         end_date_key='end_date', lookback_seconds=0, max_workers=None, metrics=None, spill=True):
+    """
+    Syncs the selected streams in `windows` date windows at once, in at most
+    `max_workers` processes (defaults to the number of CPUs), and returns
+    the merged, deduplicated output as a `store.SyncResult`. It is written
+    to the path `spill` or, by default, to a temporary directory that is
+    removed when the result is closed. The final state of each window is in
+    its `shard_states`. The `metrics` are those of the windows' runs, so
+    they include the records that are dropped in the merge.
+
+    The range defaults to the config's `start_date` up to its `end_date`, or
+    now. `lookback_seconds` is how far before its `start_date` the tap
+    syncs, if it does.
+    """
+    keys = stream_keys(catalog)
+    start = parse_datetime(start or config['start_date'])
+    end = parse_datetime(end or config.get(end_date_key) or format_datetime(datetime.now(timezone.utc)))
+    ranges = date_windows(start, end, windows)
+    max_workers = max_workers or os.cpu_count() or 1
+    deduplicator = EdgeDeduplicator(keys, timedelta(seconds=lookback_seconds))
+    run_state = window_state(state, keys)
+
+    directory = tempfile.mkdtemp(prefix=f"{tap_entry_point}-windows-")
+    path = os.path.join(directory, 'tap_output.jsonl') if spill is True else spill
+    try:
+        with metrics.phase('sync') if metrics is not None else nullcontext():
+            started_at = time.time()
+            LOGGER.info(f"Running sync of {len(ranges)} date windows from {format_datetime(start)} to "
+                        f"{format_datetime(end)} with up to {max_workers} workers...")
+            paths = [os.path.join(directory, f"window_{i}.jsonl") for i in range(len(ranges))]
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(ranges)), initializer=sharding.init_worker) as executor:
+                futures = []
+                for (window_start, window_end), window_path in zip(ranges, paths):
+                    window_config = {**config, 'start_date': format_datetime(window_start)}
+                    if end_date_key:
+                        window_config[end_date_key] = format_datetime(window_end)
+                    futures.append(executor.submit(sharding.run_shard, tap_entry_point, window_config, catalog,
+                                                   run_state, window_path))
+                window_runs = [future.result() for future in futures]
+
+            writer = store.SpillWriter(path)
+            shard_states = []
+            seen_schemas = set()
+            try:
+                for i, ((window_start, window_end), window_path, window_run) in enumerate(zip(ranges, paths, window_runs)):
+                    LOGGER.info(f"Window {format_datetime(window_start)} to {format_datetime(window_end)} synced in {window_run['seconds']:.1f}s")
+                    if metrics is not None:
+                        metrics.add_run(window_run['metrics'], started_after=window_run['started_at'] - started_at)
+                    deduplicator.start_window()
+                    first, last = i == 0, i == len(ranges) - 1
+                    final_state = None
+                    with open(window_path, encoding='utf-8') as f:
+                        for line in f:
+                            if not line.strip():
+                                continue
+                            message = messages.parse_line(line)
+                            if message.type == 'RECORD':
+                                if not deduplicator.keep(message, window_start, window_end, first, last):
+                                    continue
+                            elif message.type == 'SCHEMA':
+                                # Every window starts with the same schemas
+                                schema = (message.stream, json.dumps(message['schema'], sort_keys=True))
+                                if schema in seen_schemas:
+                                    continue
+                                seen_schemas.add(schema)
+                            elif message.type == 'STATE':
+                                final_state = message['value']
+                            writer.write(line.rstrip('\n') + os.linesep)
+                    shard_states.append(final_state)
+                    os.remove(window_path)
+                    os.remove(window_path + store.INDEX_SUFFIX)
+            finally:
+                index = writer.close()
+        result = store.SyncResult(path, index, owned_directory=directory if spill is True else None)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    if spill is not True:
+        shutil.rmtree(directory, ignore_errors=True)
+    result.shard_states = shard_states
+
+    LOGGER.info(f"Dropped {deduplicator.outside_window} records outside of their window and "
+                f"{deduplicator.duplicates} duplicates at window edges.")
+    return result
@@ -0,0 +1,183 @@
+"""
+Summary report of a sync, meant to gauge how useful the data available to a
+test is for exercising the tap.
+
+The report is built incrementally from the message stream and never keeps
+records around. Per stream it takes a fixed amount of memory: at most
+`max_fields` field profiles and one HyperLogLog sketch, so its cost grows
+linearly with the record count and its memory doesn't grow at all.
+"""
+
+import hashlib
+import json
+import math
+
+class HyperLogLog():
+    """
+    Approximate distinct counter using `2 ** precision` one-byte registers.
+    The standard error is about `1.04 / sqrt(2 ** precision)`, so ~1.6% with
+    the default of 4 KiB of registers.
+    """
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = bytearray(2 ** precision)
+
+    def add(self, value):
+        "Adds anything `json.dumps` can serialize."
+        digest = hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        # Position of the leftmost 1 bit in what's left of the hash
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+def json_type(value):
+    "Name of the JSON type of a decoded value."
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    return 'object'
+
+class FieldProfile():
+    __slots__ = ('present', 'non_null', 'types')
+
+    def __init__(self):
+        self.present = 0
+        self.non_null = 0
+        self.types = {}
+
+    def add(self, value):
+        self.present += 1
+        if value is not None:
+            self.non_null += 1
+        value_type = json_type(value)
+        self.types[value_type] = self.types.get(value_type, 0) + 1
+
+    def to_dict(self, record_count):
+        return {'non_null': self.non_null,
+                'null_or_missing': record_count - self.non_null,
+                'non_null_rate': self.non_null / record_count if record_count else None,
+                'types': dict(sorted(self.types.items()))}
+
+class StreamProfile():
+    def __init__(self, stream, max_fields, precision):
+        self.stream = stream
+        self.max_fields = max_fields
+        self.record_count = 0
+        self.fields = {}
+        self.fields_not_profiled = set()
+        self.key_properties = []
+        self.replication_key = None
+        self.replication_key_min = None
+        self.replication_key_max = None
+        self.distinct_keys = HyperLogLog(precision)
+
+    def add_schema(self, message):
+        self.key_properties = message.get('key_properties') or []
+        bookmark_properties = message.get('bookmark_properties') or []
+        if bookmark_properties:
+            self.replication_key = bookmark_properties[0]
+
+    def add_record(self, record):
+        self.record_count += 1
+        fields = self.fields
+        for field, value in record.items():
+            profile = fields.get(field)
+            if profile is None:
+                if len(fields) >= self.max_fields:
+                    # Only the names are kept, and only up to the same budget
+                    if len(self.fields_not_profiled) < self.max_fields:
+                        self.fields_not_profiled.add(field)
+                    continue
+                profile = fields[field] = FieldProfile()
+            profile.add(value)
+
+        if self.replication_key is not None:
+            value = record.get(self.replication_key)
+            if value is not None:
+                try:
+                    if self.replication_key_min is None or value < self.replication_key_min:
+                        self.replication_key_min = value
+                    if self.replication_key_max is None or value > self.replication_key_max:
+                        self.replication_key_max = value
+                except TypeError:
+                    # Mixed types can't be ordered, the type mix shows up in the field profile
+                    pass
+
+        if self.key_properties:
+            self.distinct_keys.add([record.get(k) for k in self.key_properties])
+
+    def to_dict(self):
+        distinct_keys = self.distinct_keys.count() if self.key_properties else None
+        return {'record_count': self.record_count,
+                'key_properties': self.key_properties,
+                'approximate_distinct_keys': distinct_keys,
+                'replication_key': self.replication_key,
+                'replication_key_min': self.replication_key_min,
+                'replication_key_max': self.replication_key_max,
+                'fields': {field: profile.to_dict(self.record_count)
+                           for field, profile in sorted(self.fields.items())},
+                'fields_not_profiled': sorted(self.fields_not_profiled)}
+
+class SummaryReport():
+    """
+    Profiles a stream of Singer messages: per stream record counts, per field
+    null rates and type mixes, the range of the replication key (the first of
+    the SCHEMA's `bookmark_properties`) and the approximate number of
+    distinct primary keys (from the SCHEMA's `key_properties`).
+
+    Call `process` (or iterate over `profile`) for every message, then
+    `to_dict` or `to_json` for the report.
+    """
+    def __init__(self, max_fields=500, precision=12):
+        self.max_fields = max_fields
+        self.precision = precision
+        self.streams = {}
+        self.message_counts = {}
+
+    def __stream(self, stream):
+        if stream not in self.streams:
+            self.streams[stream] = StreamProfile(stream, self.max_fields, self.precision)
+        return self.streams[stream]
+
+    def process(self, message):
+        message_type = message.get('type')
+        self.message_counts[message_type] = self.message_counts.get(message_type, 0) + 1
+        if message_type == 'RECORD':
+            self.__stream(message['stream']).add_record(message['record'])
+        elif message_type == 'SCHEMA':
+            self.__stream(message['stream']).add_schema(message)
+
+    def profile(self, messages):
+        "Passes the messages through while profiling them."
+        for message in messages:
+            self.process(message)
+            yield message
+
+    def to_dict(self):
+        return {'message_counts': dict(sorted(self.message_counts.items())),
+                'streams': {stream: profile.to_dict() for stream, profile in sorted(self.streams.items())}}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), default=str, **kwargs)
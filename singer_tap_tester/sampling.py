@@ -0,0 +1,105 @@
+"""
+Sampling of syncs, to get a few records of every stream in seconds instead
+of syncing everything since `start_date`.
+
+Pass a `Sample` to `cli.iter_sync` or `cli.run_sync`. Records are counted
+per stream as they are captured, and the tap is stopped as soon as every
+selected stream has reached `records_per_stream`, or once `time_budget`
+seconds have passed.
+
+Most taps sync one stream after the other, so a single run would still sync
+all of the first stream before getting to the second. With `split_streams`,
+each selected stream is synced by its own run of the tap, which is stopped
+as soon as that stream's quota is reached. Child streams (with a
+`parent-tap-stream-id` in their metadata) are synced in the same run as
+their selected parent, since most taps only sync them along with it. It is
+off by default, since some taps have streams that depend on each other
+without saying so.
+"""
+
+import time
+
+class Sample():
+    def __init__(self, records_per_stream=None, time_budget=None, split_streams=False):
+        self.records_per_stream = records_per_stream
+        self.time_budget = time_budget
+        self.split_streams = split_streams
+        self.records = {}
+        self.expected_streams = set()
+        self.started = None
+        self.stopped_early = False
+        self.reason = None
+
+    @staticmethod
+    def selected_streams(catalog):
+        "The `tap_stream_id`s of the streams selected in the catalog."
+        if not catalog:
+            return []
+        return [stream['tap_stream_id'] for stream in catalog.get('streams', [])
+                if any(m['breadcrumb'] == [] and m['metadata'].get('selected')
+                       for m in stream.get('metadata', []))]
+
+    @staticmethod
+    def stream_groups(catalog):
+        """
+        The selected streams grouped with their selected parent streams, by
+        `parent-tap-stream-id`, in the order of the catalog.
+        """
+        selected = Sample.selected_streams(catalog)
+        parents = {}
+        for stream in catalog.get('streams', []):
+            mdata = next((m['metadata'] for m in stream.get('metadata', []) if m['breadcrumb'] == []), {})
+            if mdata.get('parent-tap-stream-id') in selected:
+                parents[stream['tap_stream_id']] = mdata['parent-tap-stream-id']
+
+        groups = {}
+        for tap_stream_id in selected:
+            root = tap_stream_id
+            seen = {root}
+            while root in parents and parents[root] not in seen:
+                root = parents[root]
+                seen.add(root)
+            groups.setdefault(root, []).append(tap_stream_id)
+        return list(groups.values())
+
+    def begin(self, tap_stream_ids):
+        "Starts counting a run that syncs the given streams."
+        if self.started is None:
+            self.started = time.monotonic()
+        self.expected_streams = set(tap_stream_ids)
+
+    def stop(self, reason):
+        self.stopped_early = True
+        self.reason = reason
+
+    def expired(self):
+        "Returns True, and stops the sample, once the time budget has run out."
+        if self.time_budget is not None and time.monotonic() - self.started >= self.time_budget:
+            self.stop(f"time budget of {self.time_budget} seconds ran out")
+            return True
+        return False
+
+    def quota_reached(self):
+        if self.records_per_stream is None or not self.expected_streams:
+            return False
+        return all(self.records.get(s, 0) >= self.records_per_stream for s in self.expected_streams)
+
+    def observe(self, message):
+        """
+        Counts a message and returns True if the run should stop now, either
+        because every expected stream has its records or the time is up.
+        """
+        if message.get('type') == 'RECORD':
+            stream = message.get('stream')
+            self.records[stream] = self.records.get(stream, 0) + 1
+            if self.records[stream] == self.records_per_stream and self.quota_reached():
+                self.stop(f"every stream reached {self.records_per_stream} records")
+                return True
+        return self.expired()
+
+    def to_dict(self):
+        return {'sampled': self.stopped_early,
+                'reason': self.reason,
+                'records_per_stream': self.records_per_stream,
+                'time_budget': self.time_budget,
+                'records': dict(self.records)}
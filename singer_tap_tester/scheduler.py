@@ -0,0 +1,127 @@
+"""
+Runs many tap test scenarios (`StandardTests` or `BaseTapTest` subclasses)
+at the same time, each in its own worker process.
+
+Capturing a tap's output patches `sys.stdout` and `sys.argv` for the whole
+process, so scenarios can't share a process while they run. Separate worker
+processes each get their own, and every tap run gets its own workspace (see
+`cli.workspace`), so the only limit to how many run at once is
+`max_workers`.
+
+Usage:
+    python -m singer_tap_tester.scheduler tests.test_my_tap --max-workers 4
+"""
+
+import argparse
+import importlib
+import io
+import logging
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+LOGGER = logging.getLogger(__name__)
+
+class ScenarioResult():
+    "Picklable summary of running one test case class in a worker."
+    def __init__(self, name, tests_run=0, failures=None, errors=None, skipped=0, output='', duration=0.0):
+        self.name = name
+        self.tests_run = tests_run
+        self.failures = failures or []
+        self.errors = errors or []
+        self.skipped = skipped
+        self.output = output
+        self.duration = duration
+
+    def was_successful(self):
+        return not self.failures and not self.errors
+
+    def __repr__(self):
+        status = "ok" if self.was_successful() else f"{len(self.failures)} failures, {len(self.errors)} errors"
+        return f"ScenarioResult({self.name}: {status} in {self.duration:.1f}s)"
+
+def __load_test_case(module_name, qualname):
+    test_case = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        test_case = getattr(test_case, name)
+    return test_case
+
+def run_scenario(module_name, qualname):
+    """
+    Runs every test of a test case class and summarizes the result. This is
+    what each worker process executes, so it only takes and returns things
+    that can be pickled.
+    """
+    name = f"{module_name}.{qualname}"
+    stream = io.StringIO()
+    start = time.monotonic()
+    try:
+        test_case = __load_test_case(module_name, qualname)
+        suite = unittest.defaultTestLoader.loadTestsFromTestCase(test_case)
+        result = unittest.TextTestRunner(stream=stream, verbosity=2).run(suite)
+    except Exception as ex:
+        # E.g., missing subclass requirements or environment variables
+        return ScenarioResult(name, errors=[(name, f"{ex.__class__.__name__}: {ex}")],
+                              output=stream.getvalue(), duration=time.monotonic() - start)
+
+    return ScenarioResult(name,
+                          tests_run=result.testsRun,
+                          failures=[(str(test), trace) for test, trace in result.failures],
+                          errors=[(str(test), trace) for test, trace in result.errors],
+                          skipped=len(result.skipped),
+                          output=stream.getvalue(),
+                          duration=time.monotonic() - start)
+
+def run_scenarios(test_cases, max_workers=None):
+    """
+    Runs the given test case classes concurrently in at most `max_workers`
+    processes (defaults to the number of CPUs) and returns their
+    `ScenarioResult`s in the same order.
+
+    Classes must be importable by module and qualified name from the
+    workers, i.e., defined at the top level of a module.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    LOGGER.info(f"Running {len(test_cases)} scenarios with up to {max_workers} workers")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_scenario, test_case.__module__, test_case.__qualname__)
+                   for test_case in test_cases]
+        results = [future.result() for future in futures]
+
+    for result in results:
+        LOGGER.info(repr(result))
+    return results
+
+def find_test_cases(module_names):
+    "Finds the runnable `BaseTapTest` subclasses defined in the given modules."
+    from singer_tap_tester.base import BaseTapTest
+
+    test_cases = []
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        test_cases.extend(value for value in vars(module).values()
+                          if isinstance(value, type)
+                          and issubclass(value, BaseTapTest)
+                          and value.__module__ == module_name
+                          and getattr(value, '__test__', False))
+    return test_cases
+
+def main():
+    parser = argparse.ArgumentParser(description="Run tap test scenarios in parallel worker processes.")
+    parser.add_argument('modules', nargs='+', help="Modules containing the test cases to run, e.g., tests.test_my_tap")
+    parser.add_argument('--max-workers', type=int, default=None, help="Maximum number of scenarios to run at once (default: number of CPUs)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+
+    results = run_scenarios(find_test_cases(args.modules), max_workers=args.max_workers)
+    for result in results:
+        if not result.was_successful():
+            sys.stderr.write(result.output)
+            for test, trace in result.failures + result.errors:
+                sys.stderr.write(f"{test}{os.linesep}{trace}{os.linesep}")
+    sys.exit(0 if all(r.was_successful() for r in results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Sharded syncs, which run the selected streams of a catalog as several tap
+runs at the same time.
+
+Taps sync their streams one after the other, so a catalog of many
+independent streams takes as long as all of them added up. A sharded sync
+splits the selected streams into shards, each a copy of the catalog with
+only its streams selected (see `user.Catalog.only`), runs every shard as its
+own tap run in a bounded pool of worker processes, and merges their output.
+It then takes about as long as the slowest shard.
+
+Every shard spills its output to disk, and the shards are merged into a
+single spilled `store.SyncResult`, so a sharded sync holds no more of its
+output in memory than a spilled one. Each worker counts its shard's
+messages in its own `metrics.RunMetrics` as the tap writes them, and those
+are added up into the sync's metrics.
+
+Shards are merged in the order of the catalog's streams, and each shard's
+output is kept in the order the tap wrote it, so the messages of every
+stream, including the shard's STATE messages, stay in order. The final
+state of each shard is in `result.shard_states`, and `merged_state` combines
+them into the state a serial sync would have ended with.
+
+`differences` compares a sharded sync to a serial one, to check that a tap
+is safe to shard:
+
+    serial = cli.run_sync(tap, config, catalog, state)
+    sharded = cli.run_sync(tap, config, catalog, state, shards=True)
+    assert not sharding.differences(serial, sharded)
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from singer_tap_tester import cli, forkserver, sampling, store, user
+from singer_tap_tester.metrics import RunMetrics
+
+LOGGER = logging.getLogger(__name__)
+
+def shard_streams(catalog, shards=True):
+    """
+    Splits the selected streams of a catalog into groups of `tap_stream_id`s.
+
+    `shards` is True for one shard per stream, a number of shards to deal
+    the streams out to, or an explicit list of groups of `tap_stream_id`s.
+    Selected streams missing from explicit groups get a shard each.
+    """
+    selected = sampling.Sample.selected_streams(catalog)
+    if shards is True:
+        return [[tap_stream_id] for tap_stream_id in selected]
+    if isinstance(shards, int):
+        groups = [[] for _ in range(min(shards, len(selected)))]
+        for i, tap_stream_id in enumerate(selected):
+            groups[i % len(groups)].append(tap_stream_id)
+        return groups
+
+    grouped = {tap_stream_id for group in shards for tap_stream_id in group}
+    unknown = grouped - set(selected)
+    if unknown:
+        raise Exception(f"Shards contain streams that are not selected in the catalog: {sorted(unknown)}")
+    return [list(group) for group in shards if group] + [[s] for s in selected if s not in grouped]
+
+def shard_state(state):
+    "The input state for a shard, which must not resume a stream of another shard."
+    if state and state.get('currently_syncing'):
+        return {**state, 'currently_syncing': None}
+    return state
+
+def merged_state(result):
+    """
+    Combines the final state of every shard of a sharded sync, taking each
+    stream's bookmark from the shard that synced it.
+    """
+    merged = {}
+    for state in result.shard_states or []:
+        if not state:
+            continue
+        for key, value in state.items():
+            if key == 'bookmarks':
+                merged.setdefault('bookmarks', {}).update(value)
+            elif key == 'currently_syncing':
+                merged[key] = None
+            else:
+                merged[key] = value
+    return merged
+
+def init_worker():
+    # Fork servers belong to the parent, shards run the tap in process
+    forkserver.SERVERS.clear()
+
+def run_shard(tap_entry_point, config, catalog, state, path):
+    """
+    Syncs one shard, writing its output to `path`. This is what each worker
+    process executes, so rather than the output it returns when the sync
+    `started_at` (wall clock), how many `seconds` it took, its
+    `final_state` and the results of its `metrics.RunMetrics`.
+    """
+    run_metrics = RunMetrics(os.path.basename(path))
+    started_at = time.time()
+    start = time.monotonic()
+    with cli.run_sync(tap_entry_point, config, catalog, state, metrics=run_metrics, spill=path) as result:
+        states = result.index.positions.get(('STATE', None))
+        final_state = result[states[-1]]['value'] if states else None
+    return {'started_at': started_at,
+            'seconds': time.monotonic() - start,
+            'final_state': final_state,
+            'metrics': run_metrics.to_dict()}
+
+def run_sharded_sync(tap_entry_point, config, catalog, state, shards=True, max_workers=None, metrics=None, spill=True):
+    """
+    Runs a sharded sync of the selected streams (see `shard_streams` for
+    `shards`) in at most `max_workers` processes (defaults to the number of
+    CPUs) and returns the merged output as a `store.SyncResult`. It is
+    written to the path `spill` or, by default, to a temporary directory
+    that is removed when the result is closed.
+
+    With a `metrics.RunMetrics`, the whole run is timed as the `sync` phase
+    and the messages counted by each shard are added to it.
+    """
+    groups = shard_streams(catalog, shards)
+    max_workers = max_workers or os.cpu_count() or 1
+    indexed_catalog = user.Catalog(catalog)
+
+    directory = tempfile.mkdtemp(prefix=f"{tap_entry_point}-shards-")
+    path = os.path.join(directory, 'tap_output.jsonl') if spill is True else spill
+    try:
+        with metrics.phase('sync') if metrics is not None else nullcontext():
+            LOGGER.info(f"Running sync of {len(groups)} shards with up to {max_workers} workers...")
+            started_at = time.time()
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(groups) or 1), initializer=init_worker) as executor:
+                shard_paths = [os.path.join(directory, f"shard_{i}.jsonl") for i in range(len(groups))]
+                futures = [executor.submit(run_shard, tap_entry_point, config, indexed_catalog.only(group),
+                                           shard_state(state), shard_path)
+                           for group, shard_path in zip(groups, shard_paths)]
+                shard_runs = [future.result() for future in futures]
+
+            writer = store.SpillWriter(path)
+            try:
+                for group, shard_path, shard_run in zip(groups, shard_paths, shard_runs):
+                    LOGGER.info(f"Shard {', '.join(group)} synced in {shard_run['seconds']:.1f}s")
+                    if metrics is not None:
+                        metrics.add_run(shard_run['metrics'], started_after=shard_run['started_at'] - started_at)
+                    with open(shard_path, encoding='utf-8') as f:
+                        for line in f:
+                            writer.write(line.rstrip('\n') + os.linesep)
+                    os.remove(shard_path)
+                    os.remove(shard_path + store.INDEX_SUFFIX)
+            finally:
+                index = writer.close()
+        result = store.SyncResult(path, index, owned_directory=directory if spill is True else None)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    if spill is not True:
+        shutil.rmtree(directory, ignore_errors=True)
+    result.shard_states = [shard_run['final_state'] for shard_run in shard_runs]
+    return result
+
+def differences(serial, sharded, max_differences=20):
+    """
+    Compares the output of a serial sync to a sharded sync of the same
+    catalog and returns up to `max_differences` descriptions of how they
+    differ. Every stream must have the same SCHEMA and RECORD messages in
+    the same order, and the merged final state must match the serial one.
+    """
+    def by_stream(output):
+        streams = {}
+        for message in output:
+            if message.get('type') in ('RECORD', 'SCHEMA'):
+                streams.setdefault(message['stream'], []).append(message)
+        return streams
+
+    found = []
+    serial_streams = by_stream(serial)
+    sharded_streams = by_stream(sharded)
+    for stream in sorted(set(serial_streams) | set(sharded_streams)):
+        expected = serial_streams.get(stream, [])
+        actual = sharded_streams.get(stream, [])
+        if len(expected) != len(actual):
+            found.append(f"Stream {stream} has {len(expected)} messages serially but {len(actual)} sharded")
+        for position, (e, a) in enumerate(zip(expected, actual)):
+            if len(found) >= max_differences:
+                return found
+            if e != a:
+                found.append(f"Stream {stream} message {position} differs: {e} != {a}")
+                break
+
+    serial_states = [m['value'] for m in serial if m.get('type') == 'STATE']
+    serial_final_state = serial_states[-1] if serial_states else {}
+    serial_final_state = {k: v for k, v in serial_final_state.items() if k != 'currently_syncing'}
+    sharded_final_state = {k: v for k, v in merged_state(sharded).items() if k != 'currently_syncing'}
+    if serial_final_state != sharded_final_state and len(found) < max_differences:
+        found.append(f"Final state differs: {serial_final_state} != {sharded_final_state}")
+    return found
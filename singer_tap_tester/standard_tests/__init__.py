@@ -1,2 +1,4 @@
 from .canary import test_sync_canary
+from .integrity import test_primary_key_integrity
+from .bookmarks import test_bookmark_efficiency
 #from .catalog import test_catalog_standards # TODO
@@ -0,0 +1,79 @@
+from singer_tap_tester import cli, metrics, user
+
+def __sync(scenario, catalog, state, name):
+    "Runs a full sync, returning its `metrics.RunMetrics` and final state."
+    run_metrics = metrics.RunMetrics(name)
+    final_state = None
+    tap_output = cli.iter_sync(scenario.tap_name, scenario.get_config(), catalog, state,
+                               metrics=run_metrics, lazy=True, watchdog=scenario.get_watchdog())
+    for message in tap_output:
+        if message.type == 'STATE':
+            final_state = message['value']
+    run_metrics.finish()
+    return run_metrics, final_state
+
+def __full_table_streams(catalog):
+    streams = set()
+    for stream in catalog['streams']:
+        mdata = next((m['metadata'] for m in stream.get('metadata', []) if m['breadcrumb'] == []), {})
+        method = mdata.get('replication-method') or mdata.get('forced-replication-method') or stream.get('replication_method')
+        if method == 'FULL_TABLE':
+            streams.add(stream['tap_stream_id'])
+    return streams
+
+def test_bookmark_efficiency(scenario):
+    """
+    Syncs all streams, then syncs again from the final state of the first
+    sync, to check that the tap's bookmarks actually save work. A broken
+    bookmark turns every scheduled run into a full re-sync. The canary's
+    sync is reused as the first sync when it synced everything (see
+    `test_sync_canary`), and the test is skipped for taps that emit no state.
+
+    Fails when the second sync re-emits more than
+    `scenario.bookmark_max_resync_fraction` of the records of the first for
+    any stream, not counting FULL_TABLE streams, which always re-sync. The records,
+    bytes and time of both syncs, per stream, are available as
+    `scenario.bookmark_report`.
+    """
+    if scenario.canary_sync is not None:
+        new_catalog = scenario.canary_sync['catalog']
+        first, state = scenario.canary_sync['metrics'], scenario.canary_sync['state']
+    else:
+        catalog = cli.run_discovery(scenario.tap_name, scenario.get_config(), cache=scenario.discovery_cache,
+                                    metrics=scenario.metrics, watchdog=scenario.get_watchdog())
+        new_catalog = user.select_all_streams_and_fields(catalog)
+        first, state = __sync(scenario, new_catalog, {}, f"{scenario.__class__.__name__}.first_sync")
+    if state is None:
+        scenario.skipTest("The tap emitted no STATE message, so there is no bookmark to re-sync from.")
+    second, _ = __sync(scenario, new_catalog, state, f"{scenario.__class__.__name__}.second_sync")
+
+    full_table = __full_table_streams(new_catalog)
+    streams = {}
+    for stream, counter in first.streams.items():
+        if stream is None:
+            continue
+        again = second.streams.get(stream)
+        resynced = again.records if again else 0
+        streams[stream] = {'first_records': counter.records,
+                           'second_records': resynced,
+                           'first_bytes': counter.bytes,
+                           'second_bytes': again.bytes if again else 0,
+                           'resync_fraction': resynced / counter.records if counter.records else 0.0,
+                           'full_table': stream in full_table}
+
+    incremental = [s for s in streams.values() if not s['full_table']]
+    first_records = sum(s['first_records'] for s in incremental)
+    second_records = sum(s['second_records'] for s in incremental)
+    scenario.bookmark_report = {'state': state,
+                                'first_seconds': first.sync_seconds(),
+                                'second_seconds': second.sync_seconds(),
+                                'first_bytes': first.bytes,
+                                'second_bytes': second.bytes,
+                                'resync_fraction': second_records / first_records if first_records else 0.0,
+                                'streams': streams}
+    cli.LOGGER.info(f"Bookmark report: {scenario.bookmark_report}")
+
+    resyncing = {stream: f"{s['second_records']} of {s['first_records']} records"
+                 for stream, s in streams.items()
+                 if not s['full_table'] and s['resync_fraction'] > scenario.bookmark_max_resync_fraction}
+    scenario.assertFalse(resyncing, f"Re-syncing from the final state emitted too many records of some streams again: {resyncing}")
@@ -1,4 +1,4 @@
-from singer_tap_tester import cli, user
+from singer_tap_tester import cli, integrity, report, user, validation
 
 def test_sync_canary(scenario):
     """
@@ -10,9 +10,47 @@ def test_sync_canary(scenario):
     streams have data, but is generally enough to provide some
     value.
     """
-    catalog = cli.run_discovery(scenario.tap_name, scenario.get_config())
+    catalog = cli.run_discovery(scenario.tap_name, scenario.get_config(), cache=scenario.discovery_cache,
+                                metrics=scenario.metrics, watchdog=scenario.get_watchdog())
     new_catalog = user.select_all_streams_and_fields(catalog)
-    tap_output = cli.run_sync(scenario.tap_name, scenario.get_config(), new_catalog, {})
-    # TODO: Do assertions on messages and types
-    # TODO: Run through target's validating handler
-    # TODO: Generate a final summary report so that this test can be used to gauge the potential usefulness of the specific data set available to the test author/runner
+    sample = scenario.get_sample()
+    tap_output = cli.iter_sync(scenario.tap_name, scenario.get_config(), new_catalog, {},
+                               metrics=scenario.metrics, sample=sample, watchdog=scenario.get_watchdog())
+
+    # Validate records against their schemas as they stream out of the tap
+    validator = validation.RecordValidator()
+    tap_output = validator.validate(tap_output)
+
+    # Check primary keys on the same pass, see `test_primary_key_integrity`
+    checker = integrity.KeyChecker(integrity.key_properties(new_catalog),
+                                   memory_budget=scenario.key_check_memory_budget)
+    tap_output = checker.check(tap_output)
+
+    summary_report = report.SummaryReport()
+    tap_output = summary_report.profile(tap_output)
+
+    # TODO: Check SCHEMA, STATE and ACTIVATE_VERSION messages against the Singer
+    # spec, `RecordValidator` only checks RECORDs
+    final_state = None
+    for message in tap_output:
+        if message.get('type') == 'STATE':
+            final_state = message['value']
+
+    # A complete sync from scratch is the first sync `test_bookmark_efficiency` needs
+    if scenario.metrics is not None and (sample is None or not sample.stopped_early):
+        scenario.canary_sync = {'catalog': new_catalog, 'metrics': scenario.metrics, 'state': final_state}
+
+    # Summarize the data so the test author/runner can gauge how useful the
+    # data set available to this test is
+    scenario.summary_report = summary_report.to_dict()
+    if sample is not None:
+        scenario.summary_report['sample'] = sample.to_dict()
+    cli.LOGGER.info(f"Summary report: {summary_report.to_json()}")
+    if scenario.summary_report_path:
+        with open(scenario.summary_report_path, 'w') as f:
+            f.write(summary_report.to_json(indent=2))
+
+    scenario.key_integrity_report = checker.finish()
+
+    errors = validator.finish()
+    scenario.assertFalse(errors, f"{validator.error_count} messages failed validation, the first {len(errors)}: {errors}")
@@ -0,0 +1,31 @@
+from singer_tap_tester import cli, integrity, user
+
+def test_primary_key_integrity(scenario):
+    """
+    Checks that no stream emits two records with the same key properties,
+    which usually points to a pagination bug.
+
+    The keys are checked during the canary's sync (see `test_sync_canary`),
+    so this only syncs all streams itself when the canary hasn't run. The
+    check fits within `scenario.key_check_memory_budget` bytes, spilling to
+    disk on bigger syncs. Its report is available as
+    `scenario.key_integrity_report`.
+    """
+    if scenario.key_integrity_report is None:
+        catalog = cli.run_discovery(scenario.tap_name, scenario.get_config(), cache=scenario.discovery_cache,
+                                    metrics=scenario.metrics, watchdog=scenario.get_watchdog())
+        new_catalog = user.select_all_streams_and_fields(catalog)
+        checker = integrity.KeyChecker(integrity.key_properties(new_catalog),
+                                       memory_budget=scenario.key_check_memory_budget)
+        tap_output = cli.iter_sync(scenario.tap_name, scenario.get_config(), new_catalog, {},
+                                   metrics=scenario.metrics, sample=scenario.get_sample(), watchdog=scenario.get_watchdog())
+
+        for message in checker.check(tap_output):
+            pass
+
+        scenario.key_integrity_report = checker.finish()
+    cli.LOGGER.info(f"Key integrity report: {scenario.key_integrity_report}")
+
+    duplicated = {stream: f"{r['duplicates']} of {r['records']} records ({r['duplicate_rate']:.2%}), e.g., {r['sample_duplicate_keys']}"
+                  for stream, r in scenario.key_integrity_report.items() if r['duplicates']}
+    scenario.assertFalse(duplicated, f"Streams emitted records with duplicate keys: {duplicated}")
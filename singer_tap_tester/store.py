@@ -0,0 +1,225 @@
+"""
+On-disk store for the output of syncs that don't fit in memory.
+
+`SpillWriter` receives the tap's output (it is a sink for `cli.PatchStdOut`)
+and writes it straight to a file, while building an index of where every
+message starts and of the positions of the messages of each type and
+stream. `SyncResult` memory-maps that file and decodes messages lazily by
+position, by stream or by type, so asserting on a sync of any size needs
+only memory for the index: 12 bytes per message, an 8 byte offset and a 4
+byte position.
+
+The index is saved next to the output as `<path>.index`, so a result can be
+reopened later with `SyncResult.open(path)` without running the tap again.
+"""
+
+from array import array
+import heapq
+import json
+import mmap
+import os
+import shutil
+
+from singer_tap_tester import messages
+
+INDEX_SUFFIX = '.index'
+
+# Explicit sizes, `array(POSITION_TYPECODE)` is 4 bytes on some platforms and 8 on others
+OFFSET_TYPECODE = 'Q'
+POSITION_TYPECODE = 'I'
+
+class SyncIndex():
+    """
+    Byte offset of every message, in `offsets`, and the positions of the
+    messages of each `(type, stream)` in `positions`.
+    """
+    def __init__(self):
+        self.offsets = array(OFFSET_TYPECODE)
+        self.positions = {}
+
+    def add(self, message_type, stream, offset):
+        key = (message_type, stream)
+        positions = self.positions.get(key)
+        if positions is None:
+            positions = self.positions[key] = array(POSITION_TYPECODE)
+        positions.append(len(self.offsets))
+        self.offsets.append(offset)
+
+    def save(self, path):
+        # A JSON header line describing the arrays, followed by their bytes
+        keys = list(self.positions)
+        header = {'offsets': len(self.offsets),
+                  'positions': [[t, s, len(self.positions[(t, s)])] for t, s in keys],
+                  'itemsize': {'offsets': self.offsets.itemsize, 'positions': array(POSITION_TYPECODE).itemsize}}
+        with open(path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            self.offsets.tofile(f)
+            for key in keys:
+                self.positions[key].tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if header['itemsize'] != {'offsets': index.offsets.itemsize, 'positions': array(POSITION_TYPECODE).itemsize}:
+                raise ValueError(f"Index {path} was written on an incompatible platform")
+            index.offsets.fromfile(f, header['offsets'])
+            for message_type, stream, count in header['positions']:
+                positions = index.positions[(message_type, stream)] = array(POSITION_TYPECODE)
+                positions.fromfile(f, count)
+        return index
+
+    @classmethod
+    def build(cls, path):
+        "Rebuilds the index by scanning an output file."
+        index = cls()
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    message = messages.parse_line(line)
+                    index.add(message.type, message.stream, offset)
+                offset += len(line)
+        return index
+
+class SpillWriter():
+    """
+    File-like sink for `PatchStdOut` that writes the tap's output to `path`
+    as it arrives and indexes every message.
+
+    Optionally counts every message in a `metrics.RunMetrics`.
+    """
+    def __init__(self, path, metrics=None):
+        self.path = path
+        self.file = open(path, 'wb', buffering=1024 * 1024)
+        self.index = SyncIndex()
+        self.offset = 0
+        self.partial = ''
+        self.metrics = metrics
+
+    def __write_line(self, line):
+        raw = line.encode('utf-8') + b'\n'
+        if line.strip():
+            message = messages.parse_line(raw)
+            self.index.add(message.type, message.stream, self.offset)
+            if self.metrics is not None:
+                self.metrics.observe(message, len(raw))
+        self.file.write(raw)
+        self.offset += len(raw)
+
+    def write(self, text):
+        *lines, self.partial = (self.partial + text).split(os.linesep)
+        for line in lines:
+            self.__write_line(line)
+        return len(text)
+
+    def close(self):
+        "Flushes the output and saves the index, returning the index."
+        if self.partial:
+            self.__write_line(self.partial)
+            self.partial = ''
+        self.file.close()
+        self.index.save(self.path + INDEX_SUFFIX)
+        return self.index
+
+class SyncResult():
+    """
+    Read-only, memory-mapped view of a sync's output.
+
+    `result[n]` is the n-th message, `result.stream(name)` and
+    `result.of_type(type)` are the messages of a stream or type, and
+    `result.record(stream, n)` is the n-th record of a stream. Messages are
+    `messages.Message`s that decode lazily.
+
+    Close it (or use it as a context manager) to release the file. Results
+    that own their directory remove it, output included, when closed.
+
+    `shard_states` has the final state of each shard of a sharded sync, or
+    of each window of a partitioned sync.
+    """
+    shard_states = None
+
+    def __init__(self, path, index, owned_directory=None):
+        self.path = path
+        self.index = index
+        self.owned_directory = owned_directory
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        # Empty files can't be mapped
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    @classmethod
+    def open(cls, path):
+        "Reopens saved output, rebuilding its index if it is missing."
+        index_path = path + INDEX_SUFFIX
+        if os.path.exists(index_path):
+            index = SyncIndex.load(index_path)
+        else:
+            index = SyncIndex.build(path)
+            index.save(index_path)
+        return cls(path, index)
+
+    def line(self, position):
+        "Raw bytes of the message at `position`."
+        start = self.index.offsets[position]
+        end = self.map.find(b'\n', start)
+        return self.map[start:end if end != -1 else len(self.map)].rstrip()
+
+    def __len__(self):
+        return len(self.index.offsets)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return messages.parse_line(self.line(position))
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield messages.parse_line(self.line(position))
+
+    def __positions(self, predicate):
+        arrays = [positions for key, positions in self.index.positions.items() if predicate(key)]
+        return heapq.merge(*arrays) if len(arrays) > 1 else iter(arrays[0] if arrays else [])
+
+    def stream(self, stream):
+        "Messages of `stream`, in the order the tap wrote them."
+        for position in self.__positions(lambda key: key[1] == stream):
+            yield messages.parse_line(self.line(position))
+
+    def of_type(self, message_type):
+        for position in self.__positions(lambda key: key[0] == message_type):
+            yield messages.parse_line(self.line(position))
+
+    def records(self, stream):
+        for position in self.index.positions.get(('RECORD', stream), []):
+            yield messages.parse_line(self.line(position))
+
+    def record(self, stream, n):
+        "The n-th record of `stream`."
+        return messages.parse_line(self.line(self.index.positions[('RECORD', stream)][n]))
+
+    def count_by_type(self):
+        counts = {}
+        for (message_type, _), positions in self.index.positions.items():
+            counts[message_type] = counts.get(message_type, 0) + len(positions)
+        return counts
+
+    def count_by_stream(self, message_type='RECORD'):
+        return {stream: len(positions) for (t, stream), positions in self.index.positions.items()
+                if t == message_type}
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+        if self.owned_directory:
+            shutil.rmtree(self.owned_directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _tp, _v, _tb):
+        self.close()
@@ -0,0 +1,158 @@
+"""
+A synthetic tap that runs fully offline, to exercise and measure the harness
+without depending on a real tap and its API.
+
+It is installed as the `tap-synthetic` console script and behaves like any
+other Singer tap, taking `--config`, `--catalog`, `--state` and
+`--discover`. The config controls the shape and volume of the data:
+
+    {
+      "streams": 3,             # number of streams, named stream_0, stream_1, ...
+      "fields": 10,             # string fields per record, besides id and updated_at
+      "records": 1000,          # records per stream
+      "record_size": 10,        # characters in each string field
+      "start_date": "2021-01-01T00:00:00Z",
+      "end_date": null,         # optional, records at or after this are not emitted
+      "epoch": null,            # optional, when record 0 is updated, defaults to start_date
+      "state_every": 1000       # records between STATE messages
+    }
+
+Record `i` of every stream has `id` `i` and `updated_at` `epoch + i
+seconds`, which is also the stream's bookmark. Records updated before
+`start_date` are not emitted, so with a fixed `epoch` the tap serves the same
+data for any `start_date`, like a real API. Without a catalog the tap only
+validates its config, like most taps' check mode.
+"""
+
+import argparse
+import json
+import math
+import sys
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_CONFIG = {
+    "streams": 3,
+    "fields": 10,
+    "records": 1000,
+    "record_size": 10,
+    "start_date": "2021-01-01T00:00:00Z",
+    "end_date": None,
+    "epoch": None,
+    "state_every": 1000,
+}
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc)
+
+def format_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def stream_names(config):
+    return [f"stream_{i}" for i in range(config["streams"])]
+
+def field_names(config):
+    return [f"field_{i}" for i in range(config["fields"])]
+
+def discover(config):
+    streams = []
+    for name in stream_names(config):
+        properties = {"id": {"type": "integer"},
+                      "updated_at": {"type": "string", "format": "date-time"}}
+        properties.update({field: {"type": ["null", "string"]} for field in field_names(config)})
+        metadata = [{"breadcrumb": [],
+                     "metadata": {"table-key-properties": ["id"],
+                                  "valid-replication-keys": ["updated_at"],
+                                  "forced-replication-method": "INCREMENTAL"}},
+                    {"breadcrumb": ["properties", "id"], "metadata": {"inclusion": "automatic"}},
+                    {"breadcrumb": ["properties", "updated_at"], "metadata": {"inclusion": "automatic"}}]
+        metadata += [{"breadcrumb": ["properties", field], "metadata": {"inclusion": "available"}}
+                     for field in field_names(config)]
+        streams.append({"tap_stream_id": name,
+                        "stream": name,
+                        "key_properties": ["id"],
+                        "replication_key": "updated_at",
+                        "replication_method": "INCREMENTAL",
+                        "schema": {"type": "object", "properties": properties},
+                        "metadata": metadata})
+    return {"streams": streams}
+
+def selected_fields(catalog_entry):
+    "Returns the selected fields of a selected stream, or None if it isn't selected."
+    fields = []
+    stream_selected = False
+    for mdata in catalog_entry["metadata"]:
+        if mdata["breadcrumb"] == []:
+            stream_selected = mdata["metadata"].get("selected", False)
+        elif mdata["metadata"].get("inclusion") == "automatic" or mdata["metadata"].get("selected"):
+            fields.append(mdata["breadcrumb"][-1])
+    return fields if stream_selected else None
+
+def sync_stream(config, catalog_entry, fields, state, write):
+    stream = catalog_entry["tap_stream_id"]
+    start = parse_datetime(config["epoch"] or config["start_date"])
+    end = parse_datetime(config["end_date"]) if config.get("end_date") else None
+    bookmark = state.get("bookmarks", {}).get(stream, {}).get("updated_at")
+    # The first record updated at or after start_date
+    first = max(0, math.ceil((parse_datetime(config["start_date"]) - start).total_seconds()))
+    if bookmark:
+        # The bookmarked record was already emitted, resume right after it
+        first = max(first, int((parse_datetime(bookmark) - start).total_seconds()) + 1)
+
+    schema = {"type": "object",
+              "properties": {f: catalog_entry["schema"]["properties"][f] for f in fields}}
+    write({"type": "SCHEMA", "stream": stream, "schema": schema,
+           "key_properties": ["id"], "bookmark_properties": ["updated_at"]})
+
+    payload = "x" * config["record_size"]
+    template = {f: payload for f in fields if f not in ("id", "updated_at")}
+    state_every = config["state_every"]
+    last_updated_at = bookmark
+    for i in range(first, config["records"]):
+        updated_at = start + timedelta(seconds=i)
+        if end is not None and updated_at >= end:
+            break
+        record = {"id": i, "updated_at": format_datetime(updated_at), **template}
+        write({"type": "RECORD", "stream": stream, "record": record})
+        last_updated_at = record["updated_at"]
+        if (i + 1) % state_every == 0:
+            state.setdefault("bookmarks", {})[stream] = {"updated_at": last_updated_at}
+            write({"type": "STATE", "value": state})
+
+    if last_updated_at:
+        state.setdefault("bookmarks", {})[stream] = {"updated_at": last_updated_at}
+    write({"type": "STATE", "value": state})
+
+def sync(config, catalog, state):
+    def write(message):
+        sys.stdout.write(json.dumps(message) + "\n")
+
+    for catalog_entry in catalog["streams"]:
+        fields = selected_fields(catalog_entry)
+        if fields is not None:
+            sync_stream(config, catalog_entry, fields, state, write)
+
+def load(path, default=None):
+    if path is None:
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic Singer tap for testing and benchmarking the harness.")
+    parser.add_argument('-c', '--config')
+    parser.add_argument('--catalog')
+    parser.add_argument('-s', '--state')
+    parser.add_argument('-d', '--discover', action='store_true')
+    args = parser.parse_args()
+
+    config = {**DEFAULT_CONFIG, **load(args.config, {})}
+    # Fail like a tap with bad credentials would
+    parse_datetime(config["start_date"])
+
+    if args.discover:
+        sys.stdout.write(json.dumps(discover(config)) + "\n")
+    elif args.catalog:
+        sync(config, load(args.catalog), load(args.state, {}))
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,62 @@
 "Functions to access the records that were output by the tap and validated by the target."
 
-def get_records_from_target_output(target_output_file):
-    records_by_stream = {}
+from collections import defaultdict
+
+class StreamSummary():
+    """
+    Everything known about one stream of a target's output after a single
+    pass over it. The records themselves are only kept in `messages` when
+    asked for, otherwise this takes the same memory whatever the record
+    count is.
+    """
+    __slots__ = ('count', 'fields', 'schema', 'key_names', 'table_version', 'messages')
+
+    def __init__(self, schema, key_names, table_version, keep_records=False):
+        self.count = 0
+        self.fields = set()
+        self.schema = schema
+        self.key_names = key_names
+        self.table_version = table_version
+        self.messages = [] if keep_records else None
+
+    def add(self, messages):
+        self.count += len(messages)
+        for message in messages:
+            if message['action'] == 'upsert':
+                self.fields.update(message.get("data", {}).keys())
+        if self.messages is not None:
+            self.messages.extend(messages)
+
+def aggregate_target_output(target_output_file, keep_records=False):
+    """
+    Consumes the batches of a target's output once and returns a
+    `StreamSummary` per stream, with the message count, the fields seen in
+    upserts, and the schema, key names and table version of the stream's
+    first batch.
+    """
+    summaries = {}
     for batch in target_output_file:
         stream = batch.get('table_name')
-        if stream not in records_by_stream:
-            records_by_stream[stream] = {'messages': [],
-                                         'schema': batch['schema'],
-                                         'key_names' : batch.get('key_names'),
-                                         'table_version': batch.get('table_version')}
-        records_by_stream[stream]['messages'] += batch['messages']
-    return records_by_stream
+        if stream not in summaries:
+            summaries[stream] = StreamSummary(batch['schema'],
+                                              batch.get('key_names'),
+                                              batch.get('table_version'),
+                                              keep_records=keep_records)
+        summaries[stream].add(batch['messages'])
+    return summaries
+
+def get_records_from_target_output(target_output_file):
+    return {stream: {'messages': summary.messages,
+                     'schema': summary.schema,
+                     'key_names' : summary.key_names,
+                     'table_version': summary.table_version}
+            for stream, summary in aggregate_target_output(target_output_file, keep_records=True).items()}
 
 def examine_target_output_for_fields(target_output_file):
     fields_by_stream = defaultdict(set)
-    for batch in target_output_file:
-        stream = batch.get('table_name')
-        for message in batch.get('messages'):
-            if message['action'] == 'upsert':
-                fields_by_stream[stream].update(set(message.get("data", {}).keys()))
+    for stream, summary in aggregate_target_output(target_output_file).items():
+        fields_by_stream[stream] = summary.fields
     return fields_by_stream
 
 def examine_target_output_file(target_output_file):
-    messages_per_stream = {}
-    fields_by_stream = get_records_from_target_output(target_output_file)
-
-    return {stream: len(value['messages']) for stream, value in fields_by_stream.items() }
+    return {stream: summary.count for stream, summary in aggregate_target_output(target_output_file).items()}
@@ -6,11 +6,14 @@ a user. The most common being selection of fields and streams.
 All functions within this module should not modify the object passed in, but
 copy it and return a new one in order to allow for flexibility in assertions
 for test authors.
+
+Only the parts that change are copied, the rest of the returned object is
+shared with the one passed in and should be treated as read-only.
 """
 
-from copy import deepcopy
-from collections import defaultdict
+from fnmatch import fnmatchcase
 import logging
+import re
 import sys
 
 # TODO: Make this easier to work with?
@@ -22,43 +25,155 @@ handler = logging.StreamHandler(sys.stderr)
 handler.setFormatter(formatter)
 LOGGER.addHandler(handler)
 
+def _selectable(mdata, selected):
+    "Fields that are `unsupported` can't be selected, and `automatic` ones can't be deselected."
+    inclusion = mdata['metadata'].get('inclusion')
+    if selected:
+        return inclusion != 'unsupported'
+    return inclusion != 'automatic'
+
+def _with_selected(mdata, selected=True):
+    "Copies only the parts of a metadata entry that change."
+    return {**mdata, 'metadata': {**mdata['metadata'], 'selected': selected}}
+
+def _field_name(breadcrumb):
+    "['properties', 'a', 'properties', 'b'] -> 'a.b'"
+    return '.'.join(breadcrumb[1::2])
+
+_GLOB_CHARACTERS = set('*?[')
+
+def _matcher(patterns, regex):
+    if patterns is None:
+        return lambda name: False
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    if regex:
+        compiled = [re.compile(p) for p in patterns]
+        return lambda name: any(c.fullmatch(name) for c in compiled)
+    return lambda name: any(fnmatchcase(name, p) for p in patterns)
+
+class Catalog():
+    """
+    Index over a catalog that finds metadata by `(tap_stream_id, breadcrumb)`
+    without scanning, and applies selections to many streams and fields in a
+    single pass.
+
+    Streams without metadata are treated as having none: they are not
+    selected, and selecting them adds their top-level metadata entry.
+
+    Selections return a new catalog and leave the wrapped one untouched.
+    They are copy-on-write: only the streams, metadata lists and metadata
+    entries that change are copied, everything else (e.g., schemas) is shared
+    with the original catalog, so treat it as read-only.
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.streams = {}
+        self.positions = {}
+        self.metadata = {}
+        for position, stream in enumerate(catalog['streams']):
+            self.streams[stream['tap_stream_id']] = stream
+            self.positions[stream['tap_stream_id']] = position
+            for mdata in stream.get('metadata', []):
+                self.metadata[(stream['tap_stream_id'], tuple(mdata['breadcrumb']))] = mdata['metadata']
+
+    def get_metadata(self, tap_stream_id, breadcrumb=()):
+        "Returns the metadata dict at `breadcrumb` of a stream, or None."
+        return self.metadata.get((tap_stream_id, tuple(breadcrumb)))
+
+    def stream_ids(self, patterns='*', regex=False):
+        "Returns the `tap_stream_id`s matching any of the glob (or regex) patterns."
+        if patterns is not None and not regex:
+            names = [patterns] if isinstance(patterns, str) else patterns
+            if not any(_GLOB_CHARACTERS.intersection(name) for name in names):
+                # Exact names are looked up instead of matched against every stream
+                return sorted({name for name in names if name in self.streams}, key=self.positions.get)
+        matches = _matcher(patterns, regex)
+        return [tap_stream_id for tap_stream_id in self.streams if matches(tap_stream_id)]
+
+    def select(self, streams='*', fields='*', regex=False, selected=True):
+        """
+        Returns a new catalog with the streams matching `streams` and, within
+        them, the fields matching `fields` marked as `selected` (or
+        deselected with `selected=False`).
+
+        Patterns are globs by default, or regular expressions with
+        `regex=True`, and can be a single pattern or a list. Stream patterns
+        match the `tap_stream_id`, field patterns match the property name,
+        with nested properties joined by dots. Pass `fields=None` to only
+        change the streams themselves.
+
+        Fields with `"inclusion": "unsupported"` are never selected, and
+        fields with `"inclusion": "automatic"` are never deselected.
+        """
+        field_matches = _matcher(fields, regex)
+
+        # Only the matching streams are visited, the rest are shared as is
+        modified_streams = list(self.catalog['streams'])
+        for tap_stream_id in self.stream_ids(streams, regex):
+            position = self.positions[tap_stream_id]
+            stream = modified_streams[position]
+
+            LOGGER.info(f"{'Selecting' if selected else 'Deselecting'} stream {tap_stream_id}")
+            modified_metadata = []
+            for mdata in stream.get('metadata', []):
+                breadcrumb = mdata['breadcrumb']
+                if breadcrumb == []:
+                    modified_metadata.append(_with_selected(mdata, selected))
+                elif field_matches(_field_name(breadcrumb)) and _selectable(mdata, selected):
+                    modified_metadata.append(_with_selected(mdata, selected))
+                else:
+                    modified_metadata.append(mdata)
+            if self.get_metadata(tap_stream_id) is None:
+                modified_metadata.insert(0, {'breadcrumb': [], 'metadata': {'selected': selected}})
+            modified_streams[position] = {**stream, 'metadata': modified_metadata}
+
+        return {**self.catalog, 'streams': modified_streams}
+
+    def only(self, tap_stream_ids):
+        """
+        Returns a new catalog where only the given streams are still
+        selected, keeping their field selections, e.g., to sync the streams
+        of a catalog separately.
+        """
+        keep = set(tap_stream_ids)
+        modified_streams = []
+        for stream in self.catalog['streams']:
+            selected = self.get_metadata(stream['tap_stream_id']) or {}
+            if stream['tap_stream_id'] in keep or not selected.get('selected'):
+                modified_streams.append(stream)
+                continue
+            modified_streams.append({**stream, 'metadata': [_with_selected(m, False) if m['breadcrumb'] == [] else m
+                                                            for m in stream['metadata']]})
+        return {**self.catalog, 'streams': modified_streams}
+
 def select_stream(catalog_entry):
     "Appends `selected` metadata to the stream's catalog entry."
 
     tap_stream_id = catalog_entry['tap_stream_id']
     LOGGER.info(f'Selecting stream {tap_stream_id}')
 
-    modified_entry = deepcopy(catalog_entry)
-
-    for mdata in modified_entry['metadata']:
-        if mdata['breadcrumb'] == []:
-            mdata['metadata']['selected'] = True
+    modified_metadata = [_with_selected(mdata) if mdata['breadcrumb'] == [] else mdata
+                         for mdata in catalog_entry['metadata']]
 
-    return modified_entry
+    return {**catalog_entry, 'metadata': modified_metadata}
 
 def select_all_streams(catalog):
     """Loop over a catalog and select the streams"""
 
-    modified_catalog = deepcopy(catalog)
-    modified_catalog['streams'] = list(map(select_stream, modified_catalog['streams']))
+    return Catalog(catalog).select(streams='*', fields=None)
 
-    return modified_catalog
-
-# TODO FIXME: This should respect `"inclusion": "unsupported"`
 def select_field(metadata_entry):
-    modified_metadata_entry = deepcopy(metadata_entry)
-    modified_metadata_entry['metadata']['selected'] = True
-    return modified_metadata_entry
+    "Marks a field as `selected`, unless its inclusion is `unsupported`."
+    if not _selectable(metadata_entry, True):
+        return {**metadata_entry, 'metadata': dict(metadata_entry['metadata'])}
+    return _with_selected(metadata_entry)
 
 def select_all_fields(catalog_entry):
-    modified_catalog_entry = deepcopy(catalog_entry)
-
-    modified_catalog_entry['metadata'] = [select_field(m) if m['breadcrumb'] != [] else m
-                                          for m in modified_catalog_entry['metadata']]
+    modified_metadata = [select_field(m) if m['breadcrumb'] != [] else m
+                         for m in catalog_entry['metadata']]
 
-    return modified_catalog_entry
+    return {**catalog_entry, 'metadata': modified_metadata}
 
 def select_all_streams_and_fields(catalog):
-    modified_catalog = select_all_streams(catalog)
-    modified_catalog['streams'] = list(map(select_all_fields, modified_catalog['streams']))
-    return modified_catalog
+    return Catalog(catalog).select(streams='*', fields='*')
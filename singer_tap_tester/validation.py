@@ -0,0 +1,199 @@
+"""
+Validation of the RECORD messages a tap emits against the SCHEMA messages
+that precede them, the same check a validating target would perform.
+
+Validation uses `jsonschema`, which is only imported once a validator is
+created since it is slow to import. Schemas without a `$schema` are
+treated as draft 4, the draft Singer taps are written against.
+"""
+
+from collections import defaultdict
+import json
+
+# `type(True)` is `bool`, so booleans don't pass as integers or numbers
+_PYTHON_TYPES = {
+    'null': {type(None)},
+    'boolean': {bool},
+    'integer': {int},
+    'number': {int, float},
+    'string': {str},
+    'object': {dict},
+    'array': {list},
+}
+
+# The keywords that `compile_fast_check` knows how to check
+_FAST_KEYWORDS = {'type', 'format', 'anyOf', 'properties', 'required', 'additionalProperties', 'items'}
+
+def validator_class_for(schema):
+    "The `jsonschema` validator class for a schema, draft 4 unless it says otherwise."
+    import jsonschema
+    return jsonschema.validators.validator_for(schema, default=jsonschema.Draft4Validator)
+
+def _all(checks):
+    if len(checks) == 1:
+        return checks[0]
+    return lambda v: all(check(v) for check in checks)
+
+def compile_fast_check(schema, validator_class, format_checker):
+    """
+    Compiles the subset of JSON Schema that taps commonly use (types, nested
+    properties and items, anyOf and formats) into plain Python closures.
+
+    The returned check may be stricter than `jsonschema` (e.g., `1.0` is not
+    an integer here), but never more lenient, so a record it passes is valid
+    and only records it fails have to go through `jsonschema` to confirm and
+    explain the failure. Subschemas using other validation keywords are
+    checked by `jsonschema` itself. Returns None when the schema can't be
+    compiled at all, e.g., when it uses `$ref`.
+    """
+    # References need the root schema to resolve, leave those to jsonschema
+    if '"$ref"' in json.dumps(schema):
+        return None
+    unsupported = set(getattr(validator_class, 'VALIDATORS', {})) - _FAST_KEYWORDS
+
+    def compile_subschema(subschema):
+        if not isinstance(subschema, dict) or subschema.keys() & unsupported:
+            return validator_class(subschema, format_checker=format_checker).is_valid
+
+        checks = []
+        if 'type' in subschema:
+            types = subschema['type'] if isinstance(subschema['type'], list) else [subschema['type']]
+            if any(t not in _PYTHON_TYPES for t in types):
+                return validator_class(subschema, format_checker=format_checker).is_valid
+            python_types = frozenset().union(*(_PYTHON_TYPES[t] for t in types))
+            checks.append(lambda v: type(v) in python_types)
+        if 'format' in subschema:
+            schema_format = subschema['format']
+            checks.append(lambda v: format_checker.conforms(v, schema_format))
+        if 'anyOf' in subschema:
+            options = [compile_subschema(s) for s in subschema['anyOf']]
+            checks.append(lambda v: any(option(v) for option in options))
+        if 'required' in subschema:
+            required = subschema['required']
+            checks.append(lambda v: type(v) is not dict or all(k in v for k in required))
+        if 'properties' in subschema or 'additionalProperties' in subschema:
+            properties = {k: compile_subschema(s) for k, s in subschema.get('properties', {}).items()}
+            additional = subschema.get('additionalProperties', True)
+            if additional is True:
+                additional_check = None
+            elif additional is False:
+                additional_check = lambda v: False
+            else:
+                additional_check = compile_subschema(additional)
+
+            def check_properties(v):
+                if type(v) is not dict:
+                    return True
+                for key, value in v.items():
+                    check = properties.get(key, additional_check)
+                    if check is not None and not check(value):
+                        return False
+                return True
+            checks.append(check_properties)
+        if 'items' in subschema:
+            if not isinstance(subschema['items'], dict):
+                return validator_class(subschema, format_checker=format_checker).is_valid
+            item_check = compile_subschema(subschema['items'])
+            checks.append(lambda v: type(v) is not list or all(item_check(x) for x in v))
+
+        return _all(checks) if checks else (lambda v: True)
+
+    return compile_subschema(schema)
+
+class ValidationError():
+    "A message that doesn't conform to what the tap promised."
+    __slots__ = ('stream', 'position', 'message')
+
+    def __init__(self, stream, position, message):
+        self.stream = stream
+        self.position = position
+        self.message = message
+
+    def __repr__(self):
+        return f"{self.stream} message #{self.position}: {self.message}"
+
+class RecordValidator():
+    """
+    Validates the records of a message stream against their stream's schema.
+
+    A validator is compiled once per SCHEMA message and cached per stream,
+    and is only compiled again when the stream gets a new SCHEMA. Each
+    record is first run through the closures built by `compile_fast_check`,
+    and only goes through `jsonschema` if that fails. Records
+    are queued up per stream and validated `batch_size` at a time; records
+    that are still queued when a new SCHEMA arrives are validated against
+    the schema they were emitted under.
+
+    Call `process` (or iterate over `validate`) for every message, then
+    `finish` to validate what is left and get the errors.
+    """
+    def __init__(self, batch_size=1000, max_errors=100):
+        import jsonschema
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.format_checker = jsonschema.FormatChecker()
+        self.validators = {}
+        self.pending = defaultdict(list)
+        self.position = 0
+        self.records_validated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def __error(self, stream, position, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(ValidationError(stream, position, message))
+
+    def __compile(self, stream, schema):
+        import jsonschema
+        try:
+            validator_class = validator_class_for(schema)
+            validator_class.check_schema(schema)
+        except jsonschema.exceptions.SchemaError as ex:
+            self.__error(stream, self.position, f"Invalid SCHEMA: {ex.message}")
+            return None
+        validator = validator_class(schema, format_checker=self.format_checker)
+        fast_check = compile_fast_check(schema, validator_class, self.format_checker)
+        return validator, fast_check or validator.is_valid
+
+    def __flush(self, stream):
+        batch = self.pending.pop(stream, [])
+        if self.validators.get(stream) is None:
+            return
+        validator, fast_check = self.validators[stream]
+        for position, record in batch:
+            # Only dig into why a record is invalid on the rare failure
+            if not fast_check(record) and not validator.is_valid(record):
+                import jsonschema
+                error = jsonschema.exceptions.best_match(validator.iter_errors(record))
+                path = '.'.join(str(p) for p in error.absolute_path)
+                self.__error(stream, position, f"{path or '<record>'}: {error.message}")
+        self.records_validated += len(batch)
+
+    def process(self, message):
+        self.position += 1
+        message_type = message.get('type')
+        if message_type == 'SCHEMA':
+            stream = message['stream']
+            self.__flush(stream)
+            self.validators[stream] = self.__compile(stream, message['schema'])
+        elif message_type == 'RECORD':
+            stream = message['stream']
+            if stream not in self.validators:
+                self.__error(stream, self.position, "RECORD emitted before any SCHEMA for its stream")
+                return
+            pending = self.pending[stream]
+            pending.append((self.position, message['record']))
+            if len(pending) >= self.batch_size:
+                self.__flush(stream)
+
+    def validate(self, messages):
+        "Passes the messages through while validating them."
+        for message in messages:
+            self.process(message)
+            yield message
+
+    def finish(self):
+        for stream in list(self.pending):
+            self.__flush(stream)
+        return self.errors
@@ -0,0 +1,126 @@
+"""
+Watchdog for syncs, which stops a tap that hangs, crawls or runs too long
+instead of letting it tie up a test run indefinitely.
+
+Pass a `Watchdog` to `cli.iter_sync` or `cli.run_sync`, or to
+`cli.run_discovery` to watch the discovery and check runs. It watches the
+tap's output as it is captured, and while the tap writes nothing it is
+checked every `cli.IDLE_INTERVAL_SECONDS`. The tap is stopped and
+`TapStalled` is raised when:
+
+- the tap wrote nothing for `stall_seconds`,
+- the tap wrote fewer than `min_messages_per_second` over a whole window of
+  `slow_seconds`, or
+- the tap has run for more than `time_budget` seconds, counted across
+  every run the same watchdog watches.
+
+The error describes what the tap was doing when it was stopped: how long
+it ran, what it emitted per stream and, with a `metrics.RunMetrics`, the
+timings of every phase. `run_sync` also attaches the output captured so far
+as `partial_output`.
+
+A tap running in this process is aborted on its next write, so one blocked
+in a call that never returns is left behind after `cli.ABORT_TIMEOUT_SECONDS`,
+and `cli.TapRunAborted` is raised if it ever writes again.
+Taps run through a `forkserver.ForkServer` are killed right away.
+"""
+
+import time
+
+class TapStalled(Exception):
+    """
+    Raised when a `Watchdog` stops a sync. Has the `reason`, the watchdog's
+    `diagnosis`, the `metrics` of the run (if any) and, from `run_sync`, the
+    `partial_output`.
+    """
+    def __init__(self, message, reason, diagnosis, metrics=None):
+        super().__init__(message)
+        self.reason = reason
+        self.diagnosis = diagnosis
+        self.metrics = metrics
+        self.partial_output = None
+
+class Watchdog():
+    def __init__(self, stall_seconds=None, min_messages_per_second=None, slow_seconds=60.0, time_budget=None):
+        self.stall_seconds = stall_seconds
+        self.min_messages_per_second = min_messages_per_second
+        self.slow_seconds = slow_seconds
+        self.time_budget = time_budget
+        self.started = None
+        self.last_message = None
+        self.window_started = None
+        self.window_messages = 0
+        self.messages = 0
+        self.records = {}
+        self.reason = None
+
+    def begin(self):
+        "Starts watching, or keeps watching the same budget across several runs."
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+            self.window_started = now
+        self.last_message = now
+
+    def __trip(self, reason):
+        self.reason = reason
+        return True
+
+    def expired(self):
+        "Returns True, and records why, once the sync should be stopped."
+        now = time.monotonic()
+        if self.time_budget is not None and now - self.started > self.time_budget:
+            return self.__trip(f"the sync ran for more than its time budget of {self.time_budget} seconds")
+        if self.stall_seconds is not None and now - self.last_message > self.stall_seconds:
+            return self.__trip(f"the tap wrote nothing for {now - self.last_message:.1f} seconds")
+
+        window = now - self.window_started
+        if self.min_messages_per_second is not None and window >= self.slow_seconds:
+            rate = self.window_messages / window
+            if rate < self.min_messages_per_second:
+                return self.__trip(f"the tap wrote {rate:.2f} messages per second over the last {window:.1f} seconds, "
+                                   f"below the floor of {self.min_messages_per_second}")
+            self.window_started = now
+            self.window_messages = 0
+        return False
+
+    def observe(self, message):
+        "Counts a message and returns True if the sync should be stopped."
+        self.last_message = time.monotonic()
+        self.messages += 1
+        self.window_messages += 1
+        if message.get('type') == 'RECORD':
+            stream = message.get('stream')
+            self.records[stream] = self.records.get(stream, 0) + 1
+        return self.expired()
+
+    def progress(self):
+        """
+        Counts output that isn't a message, like a catalog being written, and
+        returns True if the run should be stopped.
+        """
+        self.last_message = time.monotonic()
+        self.window_messages += 1
+        return self.expired()
+
+    def diagnosis(self):
+        now = time.monotonic()
+        elapsed = now - self.started if self.started is not None else 0.0
+        return {'reason': self.reason,
+                'elapsed_seconds': elapsed,
+                'seconds_since_last_message': now - self.last_message if self.last_message is not None else None,
+                'messages': self.messages,
+                'messages_per_second': self.messages / elapsed if elapsed else None,
+                'records': dict(self.records)}
+
+    def error(self, metrics=None):
+        "The `TapStalled` describing why the sync was stopped."
+        diagnosis = self.diagnosis()
+        results = metrics.to_dict() if metrics is not None else None
+        message = (f"Stopped the tap because {self.reason}. It ran for {diagnosis['elapsed_seconds']:.1f} seconds "
+                   f"and emitted {self.messages} messages, records per stream: {diagnosis['records']}.")
+        if results is not None:
+            phases = ', '.join(f"{p['name']} {p['wall_seconds']:.1f}s" for p in results['phases'])
+            message += (f" Phases: {phases or 'none finished'}. Time waiting for the tap: "
+                        f"{results['waiting_for_tap_seconds']:.1f}s, parsing its output: {results['parse_seconds']:.1f}s.")
+        return TapStalled(message, self.reason, diagnosis, results)
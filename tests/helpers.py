@@ -0,0 +1,41 @@
+"Helpers shared by the test modules."
+
+import unittest
+import unittest.mock
+from singer_tap_tester import entry_points
+
+def synthetic_tap_installed():
+    try:
+        entry_points.find("tap-synthetic")
+        return True
+    except Exception:
+        return False
+
+def patch_entry_point(main):
+    "Runs `main` in place of whatever tap the harness is asked to run."
+    return unittest.mock.patch('singer_tap_tester.cli.__call_entry_point', lambda _: main())
+
+class FakeScenario(unittest.TestCase):
+    "Stands in for a `BaseTapTest` when calling a standard test directly."
+    tap_name = "tap-fake"
+    discovery_cache = None
+    metrics = None
+    summary_report = None
+    summary_report_path = None
+    key_check_memory_budget = 1024 * 1024
+    key_integrity_report = None
+    bookmark_max_resync_fraction = 0.1
+    bookmark_report = None
+    canary_sync = None
+
+    def get_config(self):
+        return {}
+
+    def get_watchdog(self):
+        return None
+
+    def get_sample(self):
+        return None
+
+    def runTest(self):
+        pass
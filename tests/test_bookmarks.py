@@ -0,0 +1,105 @@
+import json
+import sys
+import unittest
+from singer_tap_tester import metrics, standard_tests
+from helpers import FakeScenario, patch_entry_point
+
+CATALOG = {"streams": [{"tap_stream_id": s, "schema": {"properties": {"id": {}}},
+                        "metadata": [{"breadcrumb": [], "metadata": {"forced-replication-method": method}}]}
+                       for s, method in [("events", "INCREMENTAL"), ("lookups", "FULL_TABLE")]]}
+
+def fake_tap(ignore_bookmark):
+    def main():
+        if '--discover' in sys.argv:
+            print(json.dumps(CATALOG))
+            return
+        if '--catalog' not in sys.argv:
+            return
+        state = {}
+        if '--state' in sys.argv and not ignore_bookmark:
+            with open(sys.argv[sys.argv.index('--state') + 1]) as f:
+                state = json.load(f)
+        first = state.get("bookmarks", {}).get("events", -1) + 1
+        for i in range(first, 100):
+            print(json.dumps({"type": "RECORD", "stream": "events", "record": {"id": i}}))
+        for i in range(10):
+            print(json.dumps({"type": "RECORD", "stream": "lookups", "record": {"id": i}}))
+        print(json.dumps({"type": "STATE", "value": {"bookmarks": {"events": 99}}}))
+    return main
+
+class TestBookmarkEfficiency(unittest.TestCase):
+    def test_bookmarks_that_save_work_pass(self):
+        scenario = FakeScenario()
+        with patch_entry_point(fake_tap(False)):
+            standard_tests.test_bookmark_efficiency(scenario)
+
+        report = scenario.bookmark_report
+        self.assertEqual({"bookmarks": {"events": 99}}, report["state"])
+        self.assertEqual(0.0, report["resync_fraction"])
+        self.assertEqual((100, 0), (report["streams"]["events"]["first_records"], report["streams"]["events"]["second_records"]))
+        # Full table streams re-sync by design
+        self.assertTrue(report["streams"]["lookups"]["full_table"])
+        self.assertEqual(1.0, report["streams"]["lookups"]["resync_fraction"])
+
+    def test_ignored_bookmarks_fail(self):
+        scenario = FakeScenario()
+        with patch_entry_point(fake_tap(True)):
+            with self.assertRaises(AssertionError) as context:
+                standard_tests.test_bookmark_efficiency(scenario)
+        self.assertIn("100 of 100 records", str(context.exception))
+        self.assertEqual(1.0, scenario.bookmark_report["resync_fraction"])
+
+    def test_each_stream_must_use_its_bookmark(self):
+        catalog = {"streams": [{"tap_stream_id": s, "schema": {"properties": {"id": {}}},
+                                "metadata": [{"breadcrumb": [], "metadata": {"forced-replication-method": "INCREMENTAL"}}]}
+                               for s in ["events", "settings"]]}
+        def main():
+            if '--discover' in sys.argv:
+                print(json.dumps(catalog))
+                return
+            first = 100 if '--state' in sys.argv else 0
+            for i in range(first, 100):
+                print(json.dumps({"type": "RECORD", "stream": "events", "record": {"id": i}}))
+            # Ignores its bookmark, but is too small to show in the total
+            for i in range(5):
+                print(json.dumps({"type": "RECORD", "stream": "settings", "record": {"id": i}}))
+            print(json.dumps({"type": "STATE", "value": {"bookmarks": {"events": 99, "settings": 4}}}))
+
+        scenario = FakeScenario()
+        with patch_entry_point(main):
+            with self.assertRaises(AssertionError) as context:
+                standard_tests.test_bookmark_efficiency(scenario)
+        self.assertIn("'settings': '5 of 5 records'", str(context.exception))
+        self.assertLess(scenario.bookmark_report["resync_fraction"], scenario.bookmark_max_resync_fraction)
+
+    def test_taps_without_state_are_skipped(self):
+        def main():
+            if '--discover' in sys.argv:
+                print(json.dumps(CATALOG))
+            elif '--catalog' in sys.argv:
+                print(json.dumps({"type": "RECORD", "stream": "events", "record": {"id": 1}}))
+
+        with patch_entry_point(main):
+            with self.assertRaises(unittest.SkipTest):
+                standard_tests.test_bookmark_efficiency(FakeScenario())
+
+    def test_the_canarys_sync_is_the_first_sync(self):
+        runs = []
+        def main():
+            runs.append(list(sys.argv))
+            if '--catalog' in sys.argv:
+                for stream in ("events", "lookups"):
+                    print(json.dumps({"type": "SCHEMA", "stream": stream, "schema": {}, "key_properties": ["id"]}))
+            fake_tap(False)()
+
+        scenario = FakeScenario()
+        scenario.metrics = metrics.RunMetrics()
+        with patch_entry_point(main):
+            standard_tests.test_sync_canary(scenario)
+            standard_tests.test_bookmark_efficiency(scenario)
+
+        # Discovery, check and the canary's sync, then only the second sync
+        self.assertEqual(4, len(runs))
+        self.assertIn('--state', runs[-1])
+        self.assertEqual((100, 0), (scenario.bookmark_report["streams"]["events"]["first_records"],
+                                    scenario.bookmark_report["streams"]["events"]["second_records"]))
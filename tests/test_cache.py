@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+import unittest.mock
+from singer_tap_tester import cli
+from helpers import patch_entry_point
+from singer_tap_tester.cache import DiscoveryCache
+
+CATALOG = {"streams": [{"tap_stream_id": "things", "schema": {}, "metadata": []}]}
+
+class TestDiscoveryCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_key_depends_on_tap_version_and_config(self):
+        key = DiscoveryCache.key("tap-fake", "1.0.0", {"token": "a"})
+        self.assertEqual(key, DiscoveryCache.key("tap-fake", "1.0.0", {"token": "a"}))
+        self.assertNotEqual(key, DiscoveryCache.key("tap-fake", "1.0.1", {"token": "a"}))
+        self.assertNotEqual(key, DiscoveryCache.key("tap-fake", "1.0.0", {"token": "b"}))
+
+    def test_entries_expire_after_ttl(self):
+        cache = DiscoveryCache(self.directory.name, ttl=60)
+        cache.put("key", CATALOG)
+        self.assertEqual(CATALOG, cache.get("key"))
+
+        with unittest.mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(cache.get("key"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = DiscoveryCache(self.directory.name, max_entries=2)
+        for i, key in enumerate(["a", "b"]):
+            cache.put(key, CATALOG)
+            os.utime(os.path.join(self.directory.name, f"{key}.json"), (i, time.time() - 10 + i))
+        cache.get("a")
+        cache.put("c", CATALOG)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(CATALOG, cache.get("a"))
+        self.assertEqual(CATALOG, cache.get("c"))
+
+    def test_config_is_not_written_to_disk(self):
+        cache = DiscoveryCache(self.directory.name)
+        cache.put(cache.key("tap-fake", "1.0.0", {"token": "secret"}), CATALOG)
+        for file_name in os.listdir(self.directory.name):
+            with open(os.path.join(self.directory.name, file_name)) as f:
+                self.assertNotIn("secret", f.read())
+
+class TestCachedDiscovery(unittest.TestCase):
+    def test_cache_hit_skips_running_the_tap(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = DiscoveryCache(directory.name)
+        runs = []
+        def main():
+            runs.append(list(sys.argv))
+            if '--discover' in runs[-1]:
+                print(json.dumps(CATALOG))
+
+        found = unittest.mock.Mock(version="1.0.0")
+        with patch_entry_point(main), \
+             unittest.mock.patch('singer_tap_tester.entry_points.find', return_value=found):
+            first = cli.run_discovery("tap-fake", {"token": "a"}, cache=cache)
+            second = cli.run_discovery("tap-fake", {"token": "a"}, cache=cache)
+            self.assertEqual(2, len(runs))
+
+            cache.skip_check = False
+            cli.run_discovery("tap-fake", {"token": "a"}, cache=cache)
+            self.assertEqual(3, len(runs))
+            self.assertNotIn('--discover', runs[-1])
+
+        self.assertEqual(CATALOG, first)
+        self.assertEqual(CATALOG, second)
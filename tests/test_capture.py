@@ -0,0 +1,48 @@
+import linecache
+import sys
+import unittest
+import unittest.mock
+from singer_tap_tester import benchmark, cli
+
+WRITES = 20000
+LINE = '{"type": "RECORD", "stream": "things", "record": {"id": 1, "name": "a thing"}}'
+
+def writes(patched_io, count):
+    with patched_io:
+        for _ in range(count):
+            sys.stdout.write(LINE)
+            sys.stdout.write('\n')
+
+class TestPatchStdOut(unittest.TestCase):
+    def test_captures_tap_output(self):
+        patched_io = cli.PatchStdOut()
+        with patched_io:
+            print("captured")
+            sys.stdout.write("also captured")
+        self.assertEqual("captured\nalso captured", patched_io.out.getvalue())
+
+    def test_debugger_output_passes_through(self):
+        passed_through = []
+        patched_io = cli.PatchStdOut()
+        # Code compiled as if it lived in pdb.py, like a debugger prompt would
+        fake_pdb = compile("sys.stdout.write('(Pdb) ')", "/usr/lib/python3/pdb.py", "exec")
+        with unittest.mock.patch.object(cli.PatchStdOut, '_PatchStdOut__old_std_out_write', passed_through.append):
+            with patched_io:
+                exec(fake_pdb, {"sys": sys})
+                sys.stdout.write("tap output")
+        self.assertEqual(['(Pdb) '], passed_through)
+        self.assertEqual("tap output", patched_io.out.getvalue())
+
+class TestCaptureCost(unittest.TestCase):
+    def test_capture_never_reads_source_context(self):
+        # Reading the source of every frame on every write is what made
+        # `inspect.stack()` slow, so the capture must not need it at all
+        with unittest.mock.patch('linecache.getlines', wraps=linecache.getlines) as getlines:
+            writes(benchmark.LegacyPatchStdOut(), 1)
+            self.assertTrue(getlines.called)
+
+            getlines.reset_mock()
+            patched_io = cli.PatchStdOut()
+            writes(patched_io, WRITES)
+            self.assertFalse(getlines.called)
+        self.assertEqual(WRITES, patched_io.out.getvalue().count('\n'))
@@ -0,0 +1,130 @@
+import json
+import os
+import signal
+import sys
+import threading
+import unittest
+import unittest.mock
+from singer_tap_tester import cli
+from helpers import patch_entry_point
+
+def fake_tap(record_count):
+    def main():
+        print(json.dumps({"type": "SCHEMA", "stream": "things", "schema": {}, "key_properties": ["id"]}))
+        for i in range(record_count):
+            print(json.dumps({"type": "RECORD", "stream": "things", "record": {"id": i}}))
+        print(json.dumps({"type": "STATE", "value": {"bookmarks": {"things": {"id": record_count}}}}))
+    return main
+
+class TestRunSync(unittest.TestCase):
+    def test_run_sync_parses_all_messages(self):
+        with patch_entry_point(fake_tap(250)):
+            messages = cli.run_sync("tap-fake", {"start_date": "2021-01-01"}, None, {})
+
+        self.assertEqual(252, len(messages))
+        self.assertEqual("SCHEMA", messages[0]["type"])
+        self.assertEqual(list(range(250)), [m["record"]["id"] for m in messages[1:-1]])
+        self.assertEqual({"bookmarks": {"things": {"id": 250}}}, messages[-1]["value"])
+
+    def test_iter_sync_yields_before_tap_finishes(self):
+        # The tap can't run further ahead of the consumer than the buffer allows
+        written = []
+        def main():
+            for i in range(2000):
+                written.append(i)
+                print(json.dumps({"type": "RECORD", "stream": "things", "record": {"id": i}}))
+
+        with patch_entry_point(main):
+            messages = cli.iter_sync("tap-fake", {}, None, {}, max_buffered_batches=2)
+            first = next(messages)
+            self.assertEqual(0, first["record"]["id"])
+            self.assertLess(len(written), 2000)
+            self.assertEqual(1999, sum(1 for _ in messages))
+
+    def test_iter_sync_aborts_tap_when_consumer_stops(self):
+        written = []
+        def main():
+            for i in range(100000):
+                written.append(i)
+                print(json.dumps({"type": "RECORD", "stream": "things", "record": {"id": i}}))
+
+        with patch_entry_point(main):
+            messages = cli.iter_sync("tap-fake", {}, None, {}, max_buffered_batches=2)
+            for message in messages:
+                if message["record"]["id"] == 10:
+                    break
+            messages.close()
+
+        self.assertLess(len(written), 100000)
+
+    def test_consumer_can_print_while_iterating(self):
+        # More than the buffer holds, so the tap blocks on the consumer
+        printed = []
+        with patch_entry_point(fake_tap(1000)):
+            with unittest.mock.patch.object(cli.PatchStdOut, '_PatchStdOut__old_std_out_write', printed.append):
+                ids = []
+                for message in cli.iter_sync("tap-fake", {}, None, {}, max_buffered_batches=2):
+                    if message["type"] == "RECORD":
+                        ids.append(message["record"]["id"])
+                        print(f"consumed {message['record']['id']}")
+
+        self.assertEqual(list(range(1000)), ids)
+        self.assertIn("consumed 999", printed)
+
+    def test_run_sync_runs_the_tap_on_the_calling_thread(self):
+        # Like a tap that times out its requests with SIGALRM
+        def main():
+            previous = signal.signal(signal.SIGALRM, signal.SIG_IGN)
+            signal.signal(signal.SIGALRM, previous)
+            fake_tap(3)()
+
+        with patch_entry_point(main):
+            messages = cli.run_sync("tap-fake", {}, None, {})
+        self.assertEqual(5, len(messages))
+
+    def test_writes_from_threads_the_tap_starts_are_captured(self):
+        def main():
+            workers = [threading.Thread(target=print, args=(json.dumps({"type": "RECORD", "stream": "things", "record": {"id": i}}),))
+                       for i in range(3)]
+            for worker in workers:
+                worker.start()
+                worker.join()
+            print(json.dumps({"type": "STATE", "value": {}}))
+
+        with patch_entry_point(main):
+            collected = cli.run_sync("tap-fake", {}, None, {})
+            streamed = list(cli.iter_sync("tap-fake", {}, None, {}))
+        for messages in (collected, streamed):
+            self.assertEqual(["RECORD"] * 3 + ["STATE"], [m["type"] for m in messages])
+
+    def test_iter_sync_reraises_tap_errors(self):
+        def main():
+            print(json.dumps({"type": "RECORD", "stream": "things", "record": {"id": 1}}))
+            raise RuntimeError("The API went away")
+
+        with patch_entry_point(main):
+            with self.assertRaises(RuntimeError):
+                cli.run_sync("tap-fake", {}, None, {})
+
+    def test_stdout_is_restored_after_sync(self):
+        write = sys.stdout.write
+        with patch_entry_point(fake_tap(1)):
+            cli.run_sync("tap-fake", {}, None, {})
+        self.assertEqual(write, sys.stdout.write)
+
+class TestWorkspace(unittest.TestCase):
+    def test_each_run_gets_its_own_workspace_which_is_removed(self):
+        config_paths = []
+        def main():
+            config_paths.append(sys.argv[sys.argv.index('--config') + 1])
+            with open(config_paths[-1]) as f:
+                print(json.dumps({"type": "STATE", "value": json.load(f)}))
+
+        with patch_entry_point(main):
+            first = cli.run_sync("tap-fake", {"run": 1}, None, {})
+            second = cli.run_sync("tap-fake", {"run": 2}, None, {})
+
+        self.assertEqual({"run": 1}, first[0]["value"])
+        self.assertEqual({"run": 2}, second[0]["value"])
+        self.assertNotEqual(os.path.dirname(config_paths[0]), os.path.dirname(config_paths[1]))
+        self.assertFalse(any(os.path.exists(path) for path in config_paths))
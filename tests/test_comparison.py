@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+from singer_tap_tester import cli, comparison, user
+from helpers import synthetic_tap_installed
+
+CONFIG = {"streams": 2, "fields": 2, "records": 50, "state_every": 10, "start_date": "2021-01-01T00:00:00Z"}
+
+def write_output(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps({"type": "RECORD", "stream": "things", "record": record}) + "\n")
+
+def results(seconds, rss, streams):
+    return {"phases": [{"name": "sync", "wall_seconds": seconds}], "time_to_first_record_seconds": seconds / 10,
+            "peak_rss_bytes": rss, "bytes": 1000, "streams": streams}
+
+class TestDiffRecords(unittest.TestCase):
+    def test_records_are_matched_on_their_keys(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.jsonl")
+            candidate = os.path.join(directory, "candidate.jsonl")
+            write_output(baseline, [{"id": i, "name": f"thing {i}"} for i in range(100)])
+            write_output(candidate, [{"id": i, "name": "renamed" if i == 7 else f"thing {i}"} for i in range(3, 105)])
+
+            diff = comparison.diff_records(baseline, candidate, {"things": ["id"]}, partitions=4)["things"]
+
+        self.assertEqual((100, 102), (diff["baseline_records"], diff["candidate_records"]))
+        self.assertEqual((5, 3, 1, 96), (diff["added"], diff["removed"], diff["changed"], diff["unchanged"]))
+        self.assertEqual([{"key": [7], "fields": {"name": ["thing 7", "renamed"]}}], diff["sample_changed"])
+        self.assertEqual([0, 1, 2], sorted(r["id"] for r in diff["sample_removed"]))
+
+    def test_records_without_keys_are_matched_whole(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.jsonl")
+            candidate = os.path.join(directory, "candidate.jsonl")
+            write_output(baseline, [{"id": 1, "name": "a"}])
+            write_output(candidate, [{"id": 1, "name": "b"}])
+            diff = comparison.diff_records(baseline, candidate, {})["things"]
+        self.assertEqual((1, 1, 0), (diff["added"], diff["removed"], diff["changed"]))
+
+    def test_records_with_duplicate_keys_are_all_matched(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.jsonl")
+            candidate = os.path.join(directory, "candidate.jsonl")
+            write_output(baseline, [{"id": 1, "v": "a"}, {"id": 1, "v": "b"}, {"id": 1, "v": "c"}, {"id": 2, "v": "a"}])
+            write_output(candidate, [{"id": 1, "v": "b"}, {"id": 1, "v": "d"}, {"id": 2, "v": "a"}, {"id": 2, "v": "a"}])
+            diff = comparison.diff_records(baseline, candidate, {"things": ["id"]}, partitions=2)["things"]
+
+        self.assertEqual((2, 2), (diff["baseline_duplicate_keys"], diff["candidate_duplicate_keys"]))
+        # The repeated "b" is unchanged, "d" changed one of the rest, the other is removed
+        self.assertEqual((1, 1, 1, 2), (diff["added"], diff["removed"], diff["changed"], diff["unchanged"]))
+        self.assertEqual([{"id": 1, "v": "c"}], diff["sample_removed"])
+
+class TestComparePerformance(unittest.TestCase):
+    def test_regressions_past_the_threshold(self):
+        baseline = results(10.0, 100, {"things": {"records": 10, "bytes": 100, "messages_per_second": 100.0}})
+        candidate = results(10.5, 200, {"things": {"records": 10, "bytes": 100, "messages_per_second": 50.0}})
+        performance = comparison.compare_performance(baseline, candidate, threshold=0.1)
+
+        self.assertFalse(performance["sync_seconds"]["regression"])
+        self.assertAlmostEqual(0.05, performance["sync_seconds"]["change"])
+        self.assertTrue(performance["peak_rss_bytes"]["regression"])
+        self.assertTrue(performance["streams"]["things"]["messages_per_second"]["regression"])
+        self.assertFalse(performance["streams"]["things"]["records"]["regression"])
+
+@unittest.skipUnless(synthetic_tap_installed(), "tap-synthetic is not installed, run `pip install -e .`")
+class TestCompareTaps(unittest.TestCase):
+    def test_changed_output_is_reported(self):
+        catalog = user.select_all_streams_and_fields(cli.run_discovery("tap-synthetic", CONFIG))
+        candidate_config = {**CONFIG, "records": 60, "record_size": 11}
+        report = comparison.compare_taps("tap-synthetic", "tap-synthetic", CONFIG, catalog,
+                                         candidate_config=candidate_config, threshold=0.1)
+
+        self.assertEqual(["stream_0", "stream_1"], report["data_changes"])
+        diff = report["data"]["stream_0"]
+        self.assertEqual((10, 0, 50, 0), (diff["added"], diff["removed"], diff["changed"], diff["unchanged"]))
+        self.assertEqual(["field_0", "field_1"], sorted(diff["sample_changed"][0]["fields"]))
+        self.assertEqual(60, report["candidate"]["streams"]["stream_0"]["records"])
+        self.assertIsNotNone(report["baseline"]["peak_rss_bytes"])
+        # 20% more records and bytes
+        self.assertIn("stream_0.records", report["regressions"])
+        self.assertIn("bytes", report["regressions"])
+
+    def test_identical_taps_have_no_data_changes(self):
+        catalog = user.Catalog(cli.run_discovery("tap-synthetic", CONFIG)).select("stream_1")
+        report = comparison.compare_taps("tap-synthetic", "tap-synthetic", CONFIG, catalog, threshold=10.0)
+        self.assertEqual([], report["data_changes"])
+        self.assertEqual(50, report["data"]["stream_1"]["unchanged"])
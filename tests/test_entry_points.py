@@ -0,0 +1,38 @@
+import unittest
+import unittest.mock
+from singer_tap_tester import entry_points
+
+class FakeEntryPoint():
+    def __init__(self, name, value, group='console_scripts'):
+        self.name = name
+        self.value = value
+        self.group = group
+
+def tap_entry_point(name, project_name='tap-fake'):
+    return entry_points.TapEntryPoint(FakeEntryPoint(name, 'tap_fake:main'), project_name, '1.0.0')
+
+class TestEntryPointIndex(unittest.TestCase):
+    def test_index_is_only_built_when_the_environment_changes(self):
+        index = entry_points.EntryPointIndex()
+        fingerprint = ((('/site-packages', 1),))
+        with unittest.mock.patch.object(index, 'build', return_value={"tap-fake": [tap_entry_point("tap-fake")]}) as build:
+            with unittest.mock.patch('singer_tap_tester.entry_points.environment_fingerprint', return_value=fingerprint):
+                index.find("tap-fake")
+                index.find("tap-fake")
+                self.assertEqual(1, build.call_count)
+
+            with unittest.mock.patch('singer_tap_tester.entry_points.environment_fingerprint', return_value=(('/site-packages', 2),)):
+                self.assertEqual("tap-fake", index.find("tap-fake").name)
+                self.assertEqual(2, build.call_count)
+
+    def test_missing_and_ambiguous_entry_points_raise(self):
+        index = entry_points.EntryPointIndex()
+        found = {"tap-twice": [tap_entry_point("tap-twice", 'tap-one'), tap_entry_point("tap-twice", 'tap-two')]}
+        with unittest.mock.patch.object(index, 'build', return_value=found):
+            with self.assertRaises(Exception) as missing:
+                index.find("tap-nope")
+            with self.assertRaises(Exception) as ambiguous:
+                index.find("tap-twice")
+
+        self.assertIn("No entrypoints found", str(missing.exception))
+        self.assertIn("Ambiguous entry_point - 2 entrypoints", str(ambiguous.exception))
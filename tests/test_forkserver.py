@@ -0,0 +1,69 @@
+import os
+import unittest
+from singer_tap_tester import StandardTests, cli, forkserver, user
+from helpers import synthetic_tap_installed
+
+CONFIG = {"streams": 2, "fields": 3, "records": 25, "state_every": 10, "start_date": "2021-01-01T00:00:00Z"}
+
+@unittest.skipUnless(synthetic_tap_installed() and hasattr(os, 'fork'), "Needs tap-synthetic and os.fork")
+class TestForkServer(unittest.TestCase):
+    def setUp(self):
+        self.server = forkserver.ForkServer("tap-synthetic").__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_runs_go_through_the_server_while_it_runs(self):
+        self.assertIs(self.server, forkserver.running("tap-synthetic"))
+        catalog = user.select_all_streams_and_fields(cli.run_discovery("tap-synthetic", CONFIG))
+        forked = cli.run_sync("tap-synthetic", CONFIG, catalog, {})
+        self.server.close()
+
+        self.assertIsNone(forkserver.running("tap-synthetic"))
+        in_process = cli.run_sync("tap-synthetic", CONFIG, catalog, {})
+        self.assertEqual(in_process, forked)
+
+    def test_each_run_is_a_new_child(self):
+        pids = []
+        class Out():
+            def write(self, text):
+                pids.append(self_server.child_pid)
+        self_server = self.server
+        for _ in range(2):
+            self.server.run(["tap-synthetic", "--discover"], Out(), "unused")
+        self.assertEqual(2, len(set(pids)))
+        self.assertNotIn(self.server.process.pid, pids)
+
+    def test_tap_errors_are_raised_with_their_traceback(self):
+        with self.assertRaises(forkserver.TapProcessError) as context:
+            cli.run_discovery("tap-synthetic", {**CONFIG, "start_date": "not a date"})
+        self.assertEqual(1, context.exception.exit_code)
+        self.assertIn("ValueError", context.exception.tap_traceback)
+
+    def test_stopping_iteration_kills_the_child(self):
+        catalog = user.select_all_streams_and_fields(cli.run_discovery("tap-synthetic", CONFIG))
+        config = {**CONFIG, "records": 10000000}
+        for count, message in enumerate(cli.iter_sync("tap-synthetic", config, catalog, {})):
+            if count == 100:
+                break
+        # The server is free for the next run
+        self.assertEqual(2, len(cli.run_discovery("tap-synthetic", CONFIG)["streams"]))
+
+    def test_unknown_tap_fails_to_start(self):
+        with self.assertRaises(Exception) as context:
+            forkserver.ForkServer("tap-does-not-exist")
+        self.assertIn("failed to start", str(context.exception))
+
+@unittest.skipUnless(synthetic_tap_installed() and hasattr(os, 'fork'), "Needs tap-synthetic and os.fork")
+class TestSyntheticForkServerStandard(StandardTests):
+    tap_name = "tap-synthetic"
+    use_fork_server = True
+
+    def config_environment(self):
+        return []
+
+    def get_config(self):
+        return CONFIG
+
+    def tearDown(self):
+        forkserver.running(self.tap_name).close()
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+import unittest
+from singer_tap_tester import integrity, standard_tests
+from helpers import FakeScenario, patch_entry_point
+
+def sync_output(ids, stream="things"):
+    yield {"type": "SCHEMA", "stream": stream, "schema": {}, "key_properties": ["id"]}
+    for i in ids:
+        yield {"type": "RECORD", "stream": stream, "record": {"id": i, "name": f"thing {i}"}}
+
+class TestKeyChecker(unittest.TestCase):
+    def test_duplicates_are_reported_per_stream(self):
+        checker = integrity.KeyChecker(max_samples=2)
+        for message in list(sync_output([1, 2, 2, 3, 3, 3])) + list(sync_output([1, 2], "others")):
+            checker.process(message)
+        report = checker.finish()
+
+        self.assertEqual(3, report["things"]["duplicates"])
+        self.assertEqual(0.5, report["things"]["duplicate_rate"])
+        self.assertEqual([[2], [3]], report["things"]["sample_duplicate_keys"])
+        self.assertEqual(0, report["others"]["duplicates"])
+        self.assertFalse(report["things"]["spilled_to_disk"])
+
+    def test_catalog_key_properties_win_over_schema_messages(self):
+        checker = integrity.KeyChecker({"things": ["name"]})
+        for message in checker.check(sync_output([1, 1])):
+            pass
+        self.assertEqual(1, checker.finish()["things"]["duplicates"])
+
+    def test_records_without_keys_are_counted_not_compared(self):
+        checker = integrity.KeyChecker({"things": ["missing"]})
+        for message in checker.check(sync_output([1, 1])):
+            pass
+        report = checker.finish()["things"]
+        self.assertEqual(2, report["records_without_key"])
+        self.assertEqual(0, report["duplicates"])
+
+    def test_spills_to_disk_past_the_memory_budget(self):
+        ids = list(range(5000)) + [10, 4999, 20]
+        in_memory = integrity.KeyChecker()
+        spilled = integrity.KeyChecker(memory_budget=1000 * integrity.BYTES_PER_KEY, partitions=4)
+        for message in sync_output(ids):
+            in_memory.process(message)
+            spilled.process(message)
+        spill_directory = spilled.spill_directory
+
+        report = spilled.finish()["things"]
+        self.assertTrue(report["spilled_to_disk"])
+        self.assertEqual(3, report["duplicates"])
+        self.assertEqual(sorted([[10], [4999], [20]]), sorted(report["sample_duplicate_keys"]))
+        self.assertEqual(in_memory.finish()["things"]["duplicates"], report["duplicates"])
+        self.assertFalse(os.path.exists(spill_directory))
+
+    def test_partitions_too_big_for_the_budget_are_split(self):
+        ids = list(range(5000)) + [10, 4999, 20]
+        checker = integrity.KeyChecker(memory_budget=500 * integrity.BYTES_PER_KEY, partitions=2)
+        for message in checker.check(sync_output(ids)):
+            pass
+        # Each partition holds about 2500 keys, five times what fits
+        self.assertGreater(min(checker.spill_counts) * integrity.BYTES_PER_KEY, 4 * checker.memory_budget)
+
+        report = checker.finish()["things"]
+        self.assertEqual(3, report["duplicates"])
+        self.assertEqual(sorted([[10], [4999], [20]]), sorted(report["sample_duplicate_keys"]))
+
+class TestPrimaryKeyIntegrity(unittest.TestCase):
+    def test_fails_on_duplicate_keys(self):
+        def main():
+            if '--discover' in sys.argv:
+                print(json.dumps({"streams": [{"tap_stream_id": "things", "schema": {"properties": {"id": {}}},
+                                               "metadata": [{"breadcrumb": [], "metadata": {"table-key-properties": ["id"]}}]}]}))
+            elif '--catalog' in sys.argv:
+                for message in sync_output([1, 2, 1]):
+                    print(json.dumps(message))
+
+        scenario = FakeScenario()
+        with patch_entry_point(main):
+            with self.assertRaises(AssertionError) as context:
+                standard_tests.test_primary_key_integrity(scenario)
+        self.assertIn("1 of 3 records", str(context.exception))
+        self.assertEqual([[1]], scenario.key_integrity_report["things"]["sample_duplicate_keys"])
+
+    def test_reuses_the_report_of_the_canarys_sync(self):
+        def main():
+            raise AssertionError("The tap should not run again")
+
+        scenario = FakeScenario()
+        scenario.key_integrity_report = {"things": {"records": 2, "duplicates": 0, "duplicate_rate": 0.0}}
+        with patch_entry_point(main):
+            standard_tests.test_primary_key_integrity(scenario)
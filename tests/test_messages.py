@@ -0,0 +1,65 @@
+import json
+import unittest
+from singer_tap_tester import cli, messages
+from helpers import patch_entry_point
+
+RECORD = {"type": "RECORD", "stream": "things", "record": {"id": 1, "name": "a thing"}, "version": 3}
+SCHEMA = {"type": "SCHEMA", "stream": "things", "schema": {"type": "object"}, "key_properties": ["id"]}
+STATE = {"type": "STATE", "value": {"bookmarks": {}}}
+
+class TestParseLine(unittest.TestCase):
+    def test_only_the_header_is_decoded_up_front(self):
+        message = messages.parse_line(json.dumps(RECORD))
+        self.assertIsInstance(message, messages.RecordMessage)
+        self.assertEqual(("RECORD", "things"), (message.type, message.stream))
+        self.assertEqual("things", message["stream"])
+        self.assertIsNone(message._decoded)
+
+        self.assertEqual({"id": 1, "name": "a thing"}, message.record)
+        self.assertEqual(3, message.version)
+
+    def test_messages_compare_equal_to_and_convert_to_dicts(self):
+        for original in [RECORD, SCHEMA, STATE]:
+            message = messages.parse_line(json.dumps(original))
+            self.assertEqual(original, message)
+            self.assertEqual(original, message.to_dict())
+            self.assertEqual(original, dict(message))
+
+    def test_state_messages_have_no_stream(self):
+        message = messages.parse_line(json.dumps(STATE))
+        self.assertIsInstance(message, messages.StateMessage)
+        self.assertIsNone(message.get("stream"))
+        self.assertIsNone(message._decoded)
+        self.assertEqual({"bookmarks": {}}, message.value)
+
+    def test_escaped_stream_names_and_other_key_orders(self):
+        escaped = messages.parse_line(json.dumps({"type": "RECORD", "stream": "we\"irdé", "record": {}}))
+        self.assertEqual("we\"irdé", escaped.stream)
+
+        reordered = messages.parse_line(json.dumps({"record": {"stream": "nope"}, "stream": "things", "type": "RECORD"}))
+        self.assertEqual(("RECORD", "things"), (reordered.type, reordered.stream))
+
+class TestMessageList(unittest.TestCase):
+    def test_filters_and_counts(self):
+        for parse in [json.loads, messages.parse_line]:
+            other_record = {**RECORD, "stream": "others"}
+            message_list = messages.MessageList(parse(json.dumps(m)) for m in [SCHEMA, RECORD, RECORD, other_record, STATE])
+
+            self.assertEqual({"SCHEMA": 1, "RECORD": 3, "STATE": 1}, message_list.count_by_type())
+            self.assertEqual({"things": 2, "others": 1}, message_list.count_by_stream())
+            self.assertEqual(3, len(message_list.by_stream("things")))
+            self.assertEqual(1, len(message_list.records("others")))
+            self.assertEqual([SCHEMA, RECORD, RECORD, other_record, STATE], message_list.to_dicts())
+
+    def test_lazy_run_sync(self):
+        def main():
+            for m in [SCHEMA, RECORD, STATE]:
+                print(json.dumps(m))
+
+        with patch_entry_point(main):
+            message_list = cli.run_sync("tap-fake", {}, None, {}, lazy=True)
+
+        self.assertIsInstance(message_list, messages.MessageList)
+        self.assertEqual([messages.SchemaMessage, messages.RecordMessage, messages.StateMessage],
+                         [type(m) for m in message_list])
+        self.assertEqual([SCHEMA, RECORD, STATE], message_list)
@@ -0,0 +1,49 @@
+import json
+import sys
+import unittest
+from singer_tap_tester import cli, metrics
+from helpers import patch_entry_point
+
+def main():
+    if '--discover' in sys.argv:
+        print(json.dumps({"streams": []}))
+        return
+    print(json.dumps({"type": "SCHEMA", "stream": "things", "schema": {}, "key_properties": ["id"]}))
+    for i in range(100):
+        print(json.dumps({"type": "RECORD", "stream": "things", "record": {"id": i}}))
+    print(json.dumps({"type": "STATE", "value": {}}))
+
+class TestRunMetrics(unittest.TestCase):
+    def test_phases_and_throughput_are_recorded(self):
+        run_metrics = metrics.RunMetrics("test")
+        with patch_entry_point(main):
+            cli.run_discovery("tap-fake", {}, metrics=run_metrics)
+            cli.run_sync("tap-fake", {}, {"streams": []}, {}, metrics=run_metrics)
+
+        results = run_metrics.to_dict()
+        self.assertEqual(["discovery", "check", "sync"], [p["name"] for p in results["phases"]])
+        self.assertTrue(all(p["wall_seconds"] >= 0 and p["cpu_seconds"] >= 0 for p in results["phases"]))
+        self.assertEqual(102, results["messages"])
+        self.assertEqual(100, results["streams"]["things"]["records"])
+        self.assertEqual(1, results["streams"]["None"]["messages"])
+        things_lines = [{"type": "SCHEMA", "stream": "things", "schema": {}, "key_properties": ["id"]}]
+        things_lines += [{"type": "RECORD", "stream": "things", "record": {"id": i}} for i in range(100)]
+        self.assertEqual(sum(len(json.dumps(m)) + 1 for m in things_lines), results["streams"]["things"]["bytes"])
+        self.assertGreater(results["messages_per_second"], 0)
+        self.assertIsNotNone(results["time_to_first_record_seconds"])
+        # Serializable, for the JSON artifact
+        json.loads(run_metrics.to_json())
+
+    def test_hooks_are_called_once_when_finished(self):
+        received = []
+        hook = metrics.register_hook(received.append)
+        self.addCleanup(metrics.unregister_hook, hook)
+
+        run_metrics = metrics.RunMetrics("test")
+        with run_metrics.phase("sync"):
+            pass
+        run_metrics.finish()
+        run_metrics.finish()
+
+        self.assertEqual(1, len(received))
+        self.assertEqual("test", received[0]["name"])
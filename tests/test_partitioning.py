@@ -0,0 +1,84 @@
+import os
+import unittest
+from datetime import timedelta
+from singer_tap_tester import cli, metrics, partitioning, user
+from helpers import synthetic_tap_installed
+
+# Record i of each stream is updated at epoch + i seconds
+CONFIG = {"streams": 2, "fields": 1, "records": 100, "state_every": 10, "epoch": "2021-01-01T00:00:00Z",
+          "start_date": "2021-01-01T00:00:00Z", "end_date": "2021-01-01T00:01:40Z"}
+
+def record(i, stream="s"):
+    return {"type": "RECORD", "stream": stream,
+            "record": {"id": i, "updated_at": f"2021-01-01T00:00:{i:02d}Z"}}
+
+class TestDateWindows(unittest.TestCase):
+    def test_edges_fall_on_whole_seconds(self):
+        start = partitioning.parse_datetime("2021-01-01T00:00:00Z")
+        windows = partitioning.date_windows(start, start + timedelta(seconds=10), 3)
+        self.assertEqual(["2021-01-01T00:00:00Z", "2021-01-01T00:00:03Z", "2021-01-01T00:00:06Z"],
+                         [partitioning.format_datetime(w[0]) for w in windows])
+        self.assertEqual(start + timedelta(seconds=10), windows[-1][1])
+        self.assertEqual(windows[0][1], windows[1][0])
+
+    def test_records_at_an_edge_are_deduplicated_on_their_keys(self):
+        deduplicator = partitioning.EdgeDeduplicator({"s": (["id"], "updated_at")}, timedelta(seconds=2))
+        start = partitioning.parse_datetime("2021-01-01T00:00:00Z")
+        edge = start + timedelta(seconds=10)
+        end = start + timedelta(seconds=20)
+
+        deduplicator.start_window()
+        first = [deduplicator.keep(record(i), start, edge, True, False) for i in range(11)]
+        deduplicator.start_window()
+        # The second window looks back 2 seconds and emits 8 to 10 again
+        second = [deduplicator.keep(record(i), edge, end, False, True) for i in range(7, 20)]
+
+        self.assertTrue(all(first))
+        self.assertEqual(list(range(11, 20)), [i for i, kept in zip(range(7, 20), second) if kept])
+        self.assertEqual(1, deduplicator.outside_window)
+        self.assertEqual(3, deduplicator.duplicates)
+
+    def test_streams_need_a_replication_key(self):
+        catalog = user.select_all_streams({"streams": [{"tap_stream_id": "s", "schema": {},
+                                                        "metadata": [{"breadcrumb": [], "metadata": {}}]}]})
+        with self.assertRaises(Exception):
+            partitioning.stream_keys(catalog)
+
+    def test_replication_keys_must_be_date_time_strings(self):
+        def catalog(updated_at):
+            return user.select_all_streams({"streams": [{
+                "tap_stream_id": "s", "schema": {"properties": {"id": {"type": "integer"}, "updated_at": updated_at}},
+                "metadata": [{"breadcrumb": [], "metadata": {"replication-key": "updated_at"}}]}]})
+
+        with self.assertRaisesRegex(Exception, "isn't a date-time string"):
+            partitioning.stream_keys(catalog({"type": "integer"}))
+        self.assertEqual({"s": ([], "updated_at")},
+                         partitioning.stream_keys(catalog({"type": ["null", "string"], "format": "date-time"})))
+
+@unittest.skipUnless(synthetic_tap_installed(), "tap-synthetic is not installed, run `pip install -e .`")
+class TestPartitionedSync(unittest.TestCase):
+    def setUp(self):
+        self.catalog = user.select_all_streams_and_fields(cli.run_discovery("tap-synthetic", CONFIG))
+        self.serial = cli.run_sync("tap-synthetic", CONFIG, self.catalog, {})
+
+    def records(self, output):
+        return [(m["stream"], m["record"]["id"]) for m in output if m["type"] == "RECORD"]
+
+    def test_partitioned_sync_matches_serial_sync(self):
+        run_metrics = metrics.RunMetrics()
+        with partitioning.run_partitioned_sync("tap-synthetic", CONFIG, self.catalog, {}, windows=4, max_workers=2,
+                                               metrics=run_metrics) as partitioned:
+            self.assertEqual(sorted(self.records(self.serial)), sorted(self.records(partitioned)))
+            self.assertEqual(4, len(partitioned.shard_states))
+            self.assertEqual(2, len(list(partitioned.of_type("SCHEMA"))))
+            self.assertEqual(self.serial[-1]["value"]["bookmarks"]["stream_1"], partitioned.shard_states[-1]["bookmarks"]["stream_1"])
+            directory = os.path.dirname(partitioned.path)
+
+        self.assertFalse(os.path.exists(directory))
+        self.assertEqual(100, run_metrics.to_dict()["streams"]["stream_0"]["records"])
+
+    def test_windows_of_taps_without_an_end_date_are_trimmed(self):
+        # Every window syncs to the end, the extra records are dropped
+        with partitioning.run_partitioned_sync("tap-synthetic", CONFIG, self.catalog, {"currently_syncing": "stream_0"},
+                                               windows=3, end_date_key=None) as partitioned:
+            self.assertEqual(sorted(self.records(self.serial)), sorted(self.records(partitioned)))
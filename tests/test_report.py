@@ -0,0 +1,40 @@
+import json
+import unittest
+from singer_tap_tester import report
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_count_is_approximately_right(self):
+        for cardinality in [10, 1000, 50000]:
+            sketch = report.HyperLogLog()
+            for i in range(cardinality):
+                sketch.add(i)
+                sketch.add(i)
+            self.assertAlmostEqual(cardinality, sketch.count(), delta=cardinality * 0.05)
+
+class TestSummaryReport(unittest.TestCase):
+    def test_report_profiles_streams(self):
+        summary = report.SummaryReport()
+        messages = [{"type": "SCHEMA", "stream": "things", "schema": {}, "key_properties": ["id"], "bookmark_properties": ["updated_at"]}]
+        messages += [{"type": "RECORD", "stream": "things",
+                      "record": {"id": i % 50, "updated_at": f"2021-01-{i % 28 + 1:02d}", "name": None if i % 4 else "x", "size": i if i % 2 else str(i)}}
+                     for i in range(100)]
+        messages.append({"type": "STATE", "value": {}})
+        self.assertEqual(messages, list(summary.profile(messages)))
+
+        result = json.loads(summary.to_json())
+        things = result["streams"]["things"]
+        self.assertEqual({"RECORD": 100, "SCHEMA": 1, "STATE": 1}, result["message_counts"])
+        self.assertEqual(100, things["record_count"])
+        self.assertEqual(50, things["approximate_distinct_keys"])
+        self.assertEqual("2021-01-01", things["replication_key_min"])
+        self.assertEqual("2021-01-28", things["replication_key_max"])
+        self.assertEqual(0.25, things["fields"]["name"]["non_null_rate"])
+        self.assertEqual({"null": 75, "string": 25}, things["fields"]["name"]["types"])
+        self.assertEqual({"integer": 50, "string": 50}, things["fields"]["size"]["types"])
+
+    def test_fields_beyond_budget_are_not_profiled(self):
+        summary = report.SummaryReport(max_fields=2)
+        summary.process({"type": "RECORD", "stream": "wide", "record": {"a": 1, "b": 2, "c": 3}})
+        wide = summary.to_dict()["streams"]["wide"]
+        self.assertEqual(["a", "b"], list(wide["fields"]))
+        self.assertEqual(["c"], wide["fields_not_profiled"])
@@ -0,0 +1,81 @@
+import json
+import time
+import unittest
+from singer_tap_tester import cli, sampling, user
+from helpers import patch_entry_point
+
+def catalog(*tap_stream_ids):
+    return user.select_all_streams({"streams": [{"tap_stream_id": s, "schema": {}, "metadata": [{"breadcrumb": [], "metadata": {}}]}
+                                                for s in tap_stream_ids]})
+
+def sequential_tap(records_per_stream, emitted):
+    "Syncs the selected streams one after the other, like most taps."
+    def main():
+        import sys
+        with open(sys.argv[sys.argv.index('--catalog') + 1]) as f:
+            selected = sampling.Sample.selected_streams(json.load(f))
+        for stream in selected:
+            for i in range(records_per_stream):
+                emitted.append((stream, i))
+                print(json.dumps({"type": "RECORD", "stream": stream, "record": {"id": i}}))
+    return main
+
+class TestSampling(unittest.TestCase):
+    def test_each_stream_is_sampled_by_its_own_run(self):
+        emitted = []
+        sample = sampling.Sample(records_per_stream=10, split_streams=True)
+        with patch_entry_point(sequential_tap(100000, emitted)):
+            result = cli.run_sync("tap-fake", {}, catalog("a", "b", "c"), {}, sample=sample)
+
+        self.assertTrue(result.sampled)
+        self.assertEqual({"a": 10, "b": 10, "c": 10}, result.count_by_stream())
+        # Each run was stopped long before syncing the whole stream
+        self.assertLess(len(emitted), 3 * 10000)
+        self.assertEqual({"a": 10, "b": 10, "c": 10}, sample.to_dict()["records"])
+
+    def test_single_run_stops_once_every_stream_has_its_quota(self):
+        emitted = []
+        def main():
+            for i in range(100000):
+                for stream in ["a", "b"]:
+                    emitted.append(i)
+                    print(json.dumps({"type": "RECORD", "stream": stream, "record": {"id": i}}))
+
+        sample = sampling.Sample(records_per_stream=5)
+        with patch_entry_point(main):
+            result = cli.run_sync("tap-fake", {}, catalog("a", "b"), {}, sample=sample)
+
+        self.assertTrue(result.sampled)
+        self.assertEqual({"a": 5, "b": 5}, result.count_by_stream())
+        self.assertLess(len(emitted), 100000)
+
+    def test_time_budget_stops_a_silent_tap(self):
+        def main():
+            print(json.dumps({"type": "RECORD", "stream": "a", "record": {"id": 1}}))
+            # Slow API, the tap is aborted on its next write
+            time.sleep(1)
+            for i in range(2, 100000):
+                print(json.dumps({"type": "RECORD", "stream": "a", "record": {"id": i}}))
+
+        sample = sampling.Sample(records_per_stream=10, time_budget=0.3)
+        with patch_entry_point(main):
+            result = cli.run_sync("tap-fake", {}, catalog("a"), {}, sample=sample)
+
+        self.assertTrue(result.sampled)
+        self.assertIn("time budget", sample.reason)
+        self.assertEqual(1, len(result))
+
+    def test_tap_that_finishes_first_is_not_sampled(self):
+        emitted = []
+        sample = sampling.Sample(records_per_stream=10)
+        with patch_entry_point(sequential_tap(3, emitted)):
+            result = cli.run_sync("tap-fake", {}, catalog("a", "b"), {}, sample=sample)
+        self.assertFalse(result.sampled)
+        self.assertEqual(6, len(result))
+
+    def test_child_streams_are_sampled_with_their_parent(self):
+        streams = catalog("orders", "order_items", "item_notes", "users")
+        for stream, parent in [(streams["streams"][1], "orders"), (streams["streams"][2], "order_items")]:
+            stream["metadata"][0]["metadata"]["parent-tap-stream-id"] = parent
+
+        self.assertEqual([["orders", "order_items", "item_notes"], ["users"]], sampling.Sample.stream_groups(streams))
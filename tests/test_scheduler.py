@@ -0,0 +1,41 @@
+import os
+import tempfile
+import time
+import unittest
+import unittest.mock
+import uuid
+from singer_tap_tester import scheduler
+
+class RendezvousScenario(unittest.TestCase):
+    # Only run through the scheduler
+    __test__ = False
+
+    def test_waits_for_the_others(self):
+        # Only passes if all four copies of this scenario run at the same time
+        directory = os.environ['SCHEDULER_TEST_RENDEZVOUS']
+        open(os.path.join(directory, uuid.uuid4().hex), 'w').close()
+        deadline = time.monotonic() + 10
+        while len(os.listdir(directory)) < 4:
+            if time.monotonic() > deadline:
+                self.fail("The scenarios did not run at the same time")
+            time.sleep(0.01)
+
+class FailingScenario(unittest.TestCase):
+    __test__ = False
+
+    def test_fails(self):
+        self.fail("This scenario fails")
+
+class TestRunScenarios(unittest.TestCase):
+    def test_scenarios_run_concurrently_and_report_in_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with unittest.mock.patch.dict(os.environ, {'SCHEDULER_TEST_RENDEZVOUS': directory}):
+                results = scheduler.run_scenarios([RendezvousScenario] * 4 + [FailingScenario], max_workers=5)
+
+        self.assertEqual([True] * 4 + [False], [r.was_successful() for r in results])
+        self.assertIn("This scenario fails", results[-1].failures[0][1])
+
+    def test_unloadable_scenario_is_reported_as_error(self):
+        result = scheduler.run_scenario(__name__, "DoesNotExist")
+        self.assertFalse(result.was_successful())
+        self.assertIn("AttributeError", result.errors[0][1])
@@ -0,0 +1,64 @@
+import os
+import unittest
+from singer_tap_tester import cli, messages, metrics, sharding, user
+from helpers import synthetic_tap_installed
+
+CONFIG = {"streams": 4, "fields": 2, "records": 30, "state_every": 10, "start_date": "2021-01-01T00:00:00Z"}
+
+def catalog(*tap_stream_ids):
+    return user.select_all_streams({"streams": [{"tap_stream_id": s, "schema": {}, "metadata": [{"breadcrumb": [], "metadata": {}}]}
+                                                for s in tap_stream_ids]})
+
+class TestShardStreams(unittest.TestCase):
+    def test_one_shard_per_stream(self):
+        self.assertEqual([["a"], ["b"], ["c"]], sharding.shard_streams(catalog("a", "b", "c")))
+
+    def test_streams_are_dealt_out_to_a_number_of_shards(self):
+        self.assertEqual([["a", "c"], ["b"]], sharding.shard_streams(catalog("a", "b", "c"), 2))
+        self.assertEqual([["a"], ["b"]], sharding.shard_streams(catalog("a", "b"), 5))
+
+    def test_explicit_groups_get_the_rest_of_the_streams_added(self):
+        self.assertEqual([["a", "c"], ["b"]], sharding.shard_streams(catalog("a", "b", "c"), [["a", "c"]]))
+        with self.assertRaises(Exception):
+            sharding.shard_streams(catalog("a"), [["z"]])
+
+    def test_merged_state_takes_each_streams_bookmark_from_its_shard(self):
+        class Result():
+            shard_states = [{"bookmarks": {"a": 1}, "currently_syncing": "a"}, None, {"bookmarks": {"b": 2}}]
+        self.assertEqual({"bookmarks": {"a": 1, "b": 2}, "currently_syncing": None}, sharding.merged_state(Result()))
+
+@unittest.skipUnless(synthetic_tap_installed(), "tap-synthetic is not installed, run `pip install -e .`")
+class TestShardedSync(unittest.TestCase):
+    def test_sharded_sync_matches_serial_sync(self):
+        selected = user.select_all_streams_and_fields(cli.run_discovery("tap-synthetic", CONFIG))
+        serial = cli.run_sync("tap-synthetic", CONFIG, selected, {})
+        run_metrics = metrics.RunMetrics()
+        with cli.run_sync("tap-synthetic", CONFIG, selected, {}, shards=True, max_workers=2, metrics=run_metrics) as sharded:
+            self.assertEqual([], sharding.differences(serial, sharded))
+            self.assertEqual(4, len(sharded.shard_states))
+            self.assertEqual(serial.count_by_stream(), sharded.count_by_stream())
+            # Every stream's state messages stay with its records
+            types = [m.type for m in sharded]
+            stream_0 = types[:[m.stream for m in sharded].index("stream_1")]
+            self.assertEqual(4, stream_0.count("STATE"))
+            directory = os.path.dirname(sharded.path)
+
+        self.assertFalse(os.path.exists(directory))
+        # Counted by the shards as the tap wrote them
+        self.assertEqual(len(serial), run_metrics.messages)
+        self.assertEqual(30, run_metrics.to_dict()["streams"]["stream_3"]["records"])
+        self.assertIsNotNone(run_metrics.time_to_first_record)
+
+    def test_differences_are_found(self):
+        selected = user.Catalog(cli.run_discovery("tap-synthetic", CONFIG)).select(["stream_0", "stream_1"])
+        serial = cli.run_sync("tap-synthetic", CONFIG, selected, {})
+        with cli.run_sync("tap-synthetic", CONFIG, selected, {}, shards=2) as result:
+            self.assertEqual([], sharding.differences(serial, result))
+            sharded = messages.MessageList(result)
+            sharded.shard_states = list(result.shard_states)
+
+        del sharded[5]
+        sharded.shard_states[0] = {}
+        found = sharding.differences(serial, sharded)
+        self.assertEqual(3, len(found))
+        self.assertIn("Final state differs", found[-1])
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+from singer_tap_tester import cli, metrics, sampling, store
+from helpers import patch_entry_point
+
+def main():
+    for stream in ["things", "others"]:
+        print(json.dumps({"type": "SCHEMA", "stream": stream, "schema": {}, "key_properties": ["id"]}))
+    for i in range(50):
+        stream = "things" if i % 5 else "others"
+        print(json.dumps({"type": "RECORD", "stream": stream, "record": {"id": i}}))
+        if i % 20 == 19:
+            print(json.dumps({"type": "STATE", "value": {"last": i}}))
+
+class TestSpilledSync(unittest.TestCase):
+    def test_spilled_sync_is_indexed_by_stream_and_type(self):
+        run_metrics = metrics.RunMetrics()
+        with patch_entry_point(main):
+            result = cli.run_sync("tap-fake", {}, None, {}, metrics=run_metrics, spill=True)
+
+        with result:
+            self.assertEqual(54, len(result))
+            self.assertEqual({"SCHEMA": 2, "RECORD": 50, "STATE": 2}, result.count_by_type())
+            self.assertEqual({"things": 40, "others": 10}, result.count_by_stream())
+            self.assertEqual({"id": 1}, result.record("things", 0).record)
+            self.assertEqual({"id": 49}, result.record("things", -1).record)
+            self.assertEqual([0, 5, 10], [m.record["id"] for m in result.records("others")][:3])
+            self.assertEqual("SCHEMA", result[1].type)
+            self.assertEqual({"id": 49}, result[-1].record)
+            self.assertEqual(["SCHEMA"] + ["RECORD"] * 10, [m.type for m in result.stream("others")])
+            self.assertEqual([{"last": 19}, {"last": 39}], [m.value for m in result.of_type("STATE")])
+            directory = os.path.dirname(result.path)
+
+        self.assertFalse(os.path.exists(directory))
+        self.assertEqual(40, run_metrics.to_dict()["streams"]["things"]["records"])
+
+    def test_index_takes_twelve_bytes_per_message(self):
+        index = store.SyncIndex()
+        index.add("RECORD", "things", 0)
+        self.assertEqual(12, index.offsets.itemsize + index.positions[("RECORD", "things")].itemsize)
+
+    def test_spilled_sync_can_not_be_sampled(self):
+        with self.assertRaises(Exception):
+            cli.run_sync("tap-fake", {}, None, {}, spill=True, sample=sampling.Sample(records_per_stream=1))
+
+    def test_saved_output_can_be_reopened_without_the_tap(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "output.jsonl")
+        with patch_entry_point(main):
+            cli.run_sync("tap-fake", {}, None, {}, spill=path).close()
+
+        self.assertTrue(os.path.exists(path))
+        with store.SyncResult.open(path) as reopened:
+            self.assertEqual(54, len(reopened))
+            self.assertEqual({"id": 48}, reopened.record("things", 38).record)
+
+        # Without the saved index, it's rebuilt from the output
+        os.remove(path + store.INDEX_SUFFIX)
+        with store.SyncResult.open(path) as rebuilt:
+            self.assertEqual({"things": 40, "others": 10}, rebuilt.count_by_stream())
+            self.assertEqual([m.to_dict() for m in rebuilt], [json.loads(line) for line in open(path)])
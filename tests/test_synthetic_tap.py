@@ -0,0 +1,43 @@
+import unittest
+from singer_tap_tester import StandardTests, benchmark, cli, user
+from helpers import synthetic_tap_installed
+
+CONFIG = {"streams": 2, "fields": 3, "records": 25, "state_every": 10, "start_date": "2021-01-01T00:00:00Z"}
+
+@unittest.skipUnless(synthetic_tap_installed(), "tap-synthetic is not installed, run `pip install -e .`")
+class TestSyntheticStandard(StandardTests):
+    tap_name = "tap-synthetic"
+
+    def config_environment(self):
+        return []
+
+    def get_config(self):
+        return CONFIG
+
+@unittest.skipUnless(synthetic_tap_installed(), "tap-synthetic is not installed, run `pip install -e .`")
+class TestSyntheticTap(unittest.TestCase):
+    def test_discovery_and_sync(self):
+        catalog = cli.run_discovery("tap-synthetic", CONFIG)
+        self.assertEqual(["stream_0", "stream_1"], [s["tap_stream_id"] for s in catalog["streams"]])
+
+        selected = user.Catalog(catalog).select("stream_1", fields="field_0")
+        messages = cli.run_sync("tap-synthetic", CONFIG, selected, {})
+        records = [m["record"] for m in messages if m["type"] == "RECORD"]
+        self.assertEqual(25, len(records))
+        self.assertEqual({"id", "updated_at", "field_0"}, set(records[0]))
+        self.assertEqual({"bookmarks": {"stream_1": {"updated_at": "2021-01-01T00:00:24.000000Z"}}}, messages[-1]["value"])
+
+    def test_sync_resumes_from_state(self):
+        catalog = user.select_all_streams_and_fields(cli.run_discovery("tap-synthetic", CONFIG))
+        state = {"bookmarks": {"stream_0": {"updated_at": "2021-01-01T00:00:19.000000Z"}}}
+        messages = cli.run_sync("tap-synthetic", CONFIG, catalog, state)
+        record_ids = [(m["stream"], m["record"]["id"]) for m in messages if m["type"] == "RECORD"]
+        self.assertEqual([("stream_0", i) for i in range(20, 25)] + [("stream_1", i) for i in range(25)], record_ids)
+
+    def test_benchmarks_run_and_compare(self):
+        results = benchmark.run([100], max_collected=100)
+        self.assertEqual(set(benchmark.BENCHMARKS), set(results["results"]))
+        self.assertEqual([], benchmark.compare(results, results))
+
+        slower = {"results": {"iter_sync": {"100": {"seconds": results["results"]["iter_sync"]["100"]["seconds"] * 2}}}}
+        self.assertEqual("iter_sync", benchmark.compare(results, slower)[0][0])
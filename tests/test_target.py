@@ -0,0 +1,33 @@
+import unittest
+from singer_tap_tester import target
+
+def target_output():
+    return iter([
+        {"table_name": "things", "schema": {"type": "object"}, "key_names": ["id"], "table_version": 1,
+         "messages": [{"action": "upsert", "data": {"id": 1, "name": "a"}},
+                      {"action": "upsert", "data": {"id": 2, "size": 3}}]},
+        {"table_name": "others", "schema": {}, "messages": [{"action": "activate_version"}]},
+        {"table_name": "things", "schema": {"type": "other"}, "table_version": 2,
+         "messages": [{"action": "upsert", "data": {"id": 3}}]},
+    ])
+
+class TestTargetOutput(unittest.TestCase):
+    def test_aggregate_target_output_in_one_pass(self):
+        summaries = target.aggregate_target_output(target_output())
+
+        self.assertEqual(3, summaries["things"].count)
+        self.assertEqual({"id", "name", "size"}, summaries["things"].fields)
+        self.assertEqual({"type": "object"}, summaries["things"].schema)
+        self.assertEqual(["id"], summaries["things"].key_names)
+        self.assertEqual(1, summaries["things"].table_version)
+        self.assertIsNone(summaries["things"].messages)
+        self.assertEqual(1, summaries["others"].count)
+
+    def test_get_records_from_target_output(self):
+        records = target.get_records_from_target_output(target_output())
+        self.assertEqual([1, 2, 3], [m["data"]["id"] for m in records["things"]["messages"]])
+        self.assertEqual(["id"], records["things"]["key_names"])
+
+    def test_examine_target_output(self):
+        self.assertEqual({"things": 3, "others": 1}, target.examine_target_output_file(target_output()))
+        self.assertEqual({"id", "name", "size"}, target.examine_target_output_for_fields(target_output())["things"])
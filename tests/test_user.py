@@ -133,3 +133,75 @@ class SelectAllStreamsAndFields(unittest.TestCase):
             for mdata in stream["metadata"]:
                 self.assertEqual({"other_key": 1, "selected": True}, mdata["metadata"])
         self.assertIsNot(catalog, new_catalog)
+
+class TestCatalog(unittest.TestCase):
+    def make_catalog(self):
+        def stream(tap_stream_id):
+            return {"tap_stream_id": tap_stream_id,
+                    "stream": tap_stream_id,
+                    "key_properties": ["id"],
+                    "schema": {"properties": {"id": {}, "name": {}, "secret": {}}},
+                    "metadata": [{"breadcrumb": [],
+                                  "metadata": {"other_key": 1}},
+                                 {"breadcrumb": ["properties", "id"],
+                                  "metadata": {"inclusion": "automatic"}},
+                                 {"breadcrumb": ["properties", "name"],
+                                  "metadata": {"inclusion": "available"}},
+                                 {"breadcrumb": ["properties", "secret"],
+                                  "metadata": {"inclusion": "unsupported"}}]}
+        return {"streams": [stream("orders"), stream("order_items"), stream("users")]}
+
+    def test_metadata_is_indexed_by_stream_and_breadcrumb(self):
+        catalog = user.Catalog(self.make_catalog())
+        self.assertEqual({"other_key": 1}, catalog.get_metadata("orders"))
+        self.assertEqual({"inclusion": "available"}, catalog.get_metadata("users", ["properties", "name"]))
+        self.assertIsNone(catalog.get_metadata("users", ["properties", "missing"]))
+
+    def test_select_by_glob_and_regex(self):
+        catalog = user.Catalog(self.make_catalog())
+        self.assertEqual(["orders", "order_items"], catalog.stream_ids("order*"))
+        self.assertEqual(["orders", "users"], catalog.stream_ids(["orders", r"u\w+"], regex=True))
+
+        new_catalog = user.Catalog(catalog.select("order*", fields="na*"))
+        self.assertTrue(new_catalog.get_metadata("orders")["selected"])
+        self.assertTrue(new_catalog.get_metadata("order_items", ["properties", "name"])["selected"])
+        self.assertNotIn("selected", new_catalog.get_metadata("order_items", ["properties", "id"]))
+        self.assertNotIn("selected", new_catalog.get_metadata("users"))
+
+    def test_select_respects_inclusion(self):
+        catalog = user.Catalog(self.make_catalog())
+
+        selected = user.Catalog(catalog.select())
+        self.assertNotIn("selected", selected.get_metadata("users", ["properties", "secret"]))
+        self.assertTrue(selected.get_metadata("users", ["properties", "name"])["selected"])
+
+        deselected = user.Catalog(selected.select(streams="users", selected=False))
+        self.assertFalse(deselected.get_metadata("users", ["properties", "name"])["selected"])
+        self.assertTrue(deselected.get_metadata("users", ["properties", "id"])["selected"])
+
+    def test_select_copies_on_write(self):
+        original = self.make_catalog()
+        new_catalog = user.Catalog(original).select("orders")
+
+        self.assertEqual(self.make_catalog(), original)
+        self.assertIsNot(original, new_catalog)
+        self.assertIsNot(original["streams"][0], new_catalog["streams"][0])
+        self.assertIs(original["streams"][0]["schema"], new_catalog["streams"][0]["schema"])
+        self.assertIs(original["streams"][0]["metadata"][3], new_catalog["streams"][0]["metadata"][3])
+        self.assertIs(original["streams"][2], new_catalog["streams"][2])
+
+    def test_exact_stream_names_are_looked_up(self):
+        catalog = user.Catalog(self.make_catalog())
+        self.assertEqual(["orders", "users"], catalog.stream_ids(["users", "orders", "missing"]))
+
+        new_catalog = catalog.select("users", fields=None)
+        self.assertIs(catalog.catalog["streams"][0], new_catalog["streams"][0])
+        self.assertTrue(user.Catalog(new_catalog).get_metadata("users")["selected"])
+
+    def test_streams_without_metadata_can_be_selected(self):
+        catalog = user.Catalog({"streams": [{"tap_stream_id": "bare", "schema": {}}]})
+        self.assertEqual(catalog.catalog, catalog.only([]))
+
+        new_catalog = user.Catalog(catalog.select())
+        self.assertEqual({"selected": True}, new_catalog.get_metadata("bare"))
+        self.assertFalse(user.Catalog(new_catalog.only([])).get_metadata("bare")["selected"])
@@ -0,0 +1,74 @@
+import unittest
+from singer_tap_tester import validation
+
+SCHEMA = {"type": "SCHEMA", "stream": "things", "key_properties": ["id"],
+          "schema": {"type": "object", "properties": {"id": {"type": "integer"},
+                                                      "updated_at": {"type": "string", "format": "date-time"}}}}
+
+def record(**data):
+    return {"type": "RECORD", "stream": "things", "record": data}
+
+class TestRecordValidator(unittest.TestCase):
+    def test_valid_records_pass(self):
+        validator = validation.RecordValidator(batch_size=2)
+        messages = [SCHEMA] + [record(id=i, updated_at="2021-06-17T00:00:00Z") for i in range(5)]
+        self.assertEqual(messages, list(validator.validate(messages)))
+        self.assertEqual([], validator.finish())
+        self.assertEqual(5, validator.records_validated)
+
+    def test_invalid_records_are_reported_with_position(self):
+        validator = validation.RecordValidator(batch_size=10)
+        for message in [SCHEMA, record(id=1), record(id="two"), record(id=3, updated_at=5)]:
+            validator.process(message)
+        errors = validator.finish()
+
+        self.assertEqual([3, 4], [e.position for e in errors])
+        self.assertIn("id", errors[0].message)
+        self.assertIn("updated_at", errors[1].message)
+
+    def test_records_are_validated_against_the_schema_they_were_emitted_under(self):
+        validator = validation.RecordValidator(batch_size=10)
+        new_schema = {**SCHEMA, "schema": {"type": "object", "properties": {"id": {"type": "string"}}}}
+        for message in [SCHEMA, record(id=1), new_schema, record(id="1")]:
+            validator.process(message)
+        self.assertEqual([], validator.finish())
+
+    def test_schemas_without_a_draft_are_draft_4(self):
+        # A boolean `exclusiveMaximum` is only valid in draft 4
+        schema = {"type": "object", "properties": {"id": {"type": "integer", "maximum": 10, "exclusiveMaximum": True}}}
+        validator = validation.RecordValidator()
+        for message in [{**SCHEMA, "schema": schema}, record(id=9), record(id=10)]:
+            validator.process(message)
+        errors = validator.finish()
+
+        self.assertEqual([3], [e.position for e in errors])
+        self.assertIn("id", errors[0].message)
+
+    def test_record_without_schema_is_an_error(self):
+        validator = validation.RecordValidator()
+        validator.process(record(id=1))
+        self.assertIn("before any SCHEMA", validator.finish()[0].message)
+
+class TestCompileFastCheck(unittest.TestCase):
+    def compile(self, schema):
+        import jsonschema
+        validator_class = validation.validator_class_for(schema)
+        return validation.compile_fast_check(schema, validator_class, jsonschema.FormatChecker())
+
+    def test_fast_check_agrees_with_jsonschema_on_common_schemas(self):
+        check = self.compile({"type": "object",
+                              "properties": {"id": {"type": "integer"},
+                                             "tags": {"type": ["null", "array"], "items": {"type": "string"}},
+                                             "amount": {"anyOf": [{"type": "number"}, {"type": "null"}]},
+                                             "name": {"type": "string", "maxLength": 3}}})
+        self.assertTrue(check({"id": 1, "tags": ["a"], "amount": 1.5, "name": "abc"}))
+        self.assertTrue(check({"id": 1, "tags": None, "amount": None}))
+        self.assertFalse(check({"id": True}))
+        self.assertFalse(check({"tags": [1]}))
+        self.assertFalse(check({"amount": "1.5"}))
+        # maxLength isn't compiled, that subschema is left to jsonschema
+        self.assertFalse(check({"name": "abcd"}))
+
+    def test_schemas_with_references_are_not_compiled(self):
+        self.assertIsNone(self.compile({"definitions": {"id": {"type": "integer"}},
+                                        "properties": {"id": {"$ref": "#/definitions/id"}}}))
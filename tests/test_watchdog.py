@@ -0,0 +1,120 @@
+import json
+import sys
+import threading
+import time
+import unittest
+import unittest.mock
+from singer_tap_tester import cli, metrics, watchdog
+from helpers import patch_entry_point
+
+def record(i):
+    return json.dumps({"type": "RECORD", "stream": "things", "record": {"id": i}})
+
+class TestWatchdog(unittest.TestCase):
+    def test_stalled_tap_is_stopped_with_its_partial_output(self):
+        def main():
+            for i in range(150):
+                print(record(i))
+            # Stuck on a slow API call, aborted on its next write
+            time.sleep(2)
+            print(record(150))
+
+        run_metrics = metrics.RunMetrics("stalled")
+        with patch_entry_point(main):
+            with self.assertRaises(watchdog.TapStalled) as context:
+                cli.run_sync("tap-fake", {}, None, {}, metrics=run_metrics, watchdog=watchdog.Watchdog(stall_seconds=0.5))
+
+        error = context.exception
+        self.assertIn("wrote nothing", error.reason)
+        self.assertEqual(150, len(error.partial_output))
+        self.assertEqual({"things": 150}, error.diagnosis["records"])
+        self.assertEqual(["sync"], [p["name"] for p in error.metrics["phases"]])
+        self.assertIn("Phases: sync", str(error))
+
+    def test_time_budget(self):
+        def main():
+            for i in range(10000000):
+                print(record(i))
+
+        with patch_entry_point(main):
+            with self.assertRaises(watchdog.TapStalled) as context:
+                for message in cli.iter_sync("tap-fake", {}, None, {}, watchdog=watchdog.Watchdog(time_budget=0.3)):
+                    pass
+        self.assertIn("time budget", context.exception.reason)
+        self.assertIsNone(context.exception.metrics)
+
+    def test_throughput_floor(self):
+        def main():
+            for i in range(10):
+                print(record(i))
+                time.sleep(0.1)
+
+        slow = watchdog.Watchdog(min_messages_per_second=100, slow_seconds=0.3)
+        with patch_entry_point(main):
+            with self.assertRaises(watchdog.TapStalled) as context:
+                cli.run_sync("tap-fake", {}, None, {}, watchdog=slow)
+        self.assertIn("below the floor of 100", context.exception.reason)
+        self.assertLess(len(context.exception.partial_output), 10)
+
+    def test_healthy_tap_is_left_alone(self):
+        def main():
+            for i in range(1000):
+                print(record(i))
+
+        with patch_entry_point(main):
+            output = cli.run_sync("tap-fake", {}, None, {},
+                                  watchdog=watchdog.Watchdog(stall_seconds=5, min_messages_per_second=1, time_budget=30))
+        self.assertEqual(1000, len(output))
+
+    def test_spilled_syncs_cant_be_watched(self):
+        with self.assertRaises(Exception):
+            cli.run_sync("tap-fake", {}, None, {}, spill=True, watchdog=watchdog.Watchdog(time_budget=1))
+
+    def test_sharded_syncs_cant_be_watched(self):
+        with self.assertRaisesRegex(Exception, "sharded sync"):
+            cli.run_sync("tap-fake", {}, None, {}, shards=2, watchdog=watchdog.Watchdog(time_budget=1))
+
+    def test_discovery_is_watched(self):
+        def main():
+            if '--discover' in sys.argv:
+                time.sleep(2)
+            print(json.dumps({"streams": []}))
+
+        with patch_entry_point(main):
+            with self.assertRaises(watchdog.TapStalled) as context:
+                cli.run_discovery("tap-fake", {}, watchdog=watchdog.Watchdog(stall_seconds=0.3))
+            self.assertIn("wrote nothing", context.exception.reason)
+            catalog = cli.run_discovery("tap-fake", {}, watchdog=watchdog.Watchdog(stall_seconds=5))
+        self.assertEqual({"streams": []}, catalog)
+
+    def test_abandoned_tap_cant_write_into_later_runs(self):
+        stale_errors = []
+        stale_wrote = threading.Event()
+        def stale():
+            print(record(0))
+            # Outlives the abort timeout, then writes during the next run
+            time.sleep(1.5)
+            try:
+                print(record(1))
+            except cli.TapRunAborted as ex:
+                stale_errors.append(ex)
+                raise
+            finally:
+                stale_wrote.set()
+
+        def fresh():
+            stale_wrote.wait(timeout=5)
+            print(json.dumps({"type": "RECORD", "stream": "fresh", "record": {"id": 0}}))
+
+        passed_through = []
+        with unittest.mock.patch.object(cli, 'ABORT_TIMEOUT_SECONDS', 0.2), \
+             unittest.mock.patch.object(cli.PatchStdOut, '_PatchStdOut__old_std_out_write', passed_through.append):
+            with patch_entry_point(stale):
+                with self.assertRaises(watchdog.TapStalled):
+                    cli.run_sync("tap-fake", {}, None, {}, watchdog=watchdog.Watchdog(stall_seconds=0.3))
+            with patch_entry_point(fresh):
+                output = cli.run_sync("tap-fake", {}, None, {})
+
+        self.assertEqual(["fresh"], [m["stream"] for m in output])
+        self.assertEqual(1, len(stale_errors))
+        self.assertFalse(any("things" in text for text in passed_through))